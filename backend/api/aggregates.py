@@ -0,0 +1,106 @@
+from django.db import IntegrityError, transaction
+from django.db.models import Count, F, Sum
+
+from .models import ChemicalData, ChemicalDataAggregate
+
+PARAMETERS = ChemicalDataAggregate.PARAMETERS
+
+
+def frame_deltas(df):
+    """Per-type count / sum / sum-of-squares of an upload, in one groupby pass."""
+    squares = df[PARAMETERS] ** 2
+    squares.columns = [f'sumsq_{param}' for param in PARAMETERS]
+    sums = df[PARAMETERS].rename(columns=lambda param: f'sum_{param}')
+    grouped = sums.join(squares).groupby(df['equipment_type']).sum()
+    counts = df.groupby('equipment_type').size()
+    return {
+        equipment_type: {'count': int(counts[equipment_type]), **{name: float(value) for name, value in row.items()}}
+        for equipment_type, row in grouped.iterrows()
+    }
+
+
+def merge_deltas(total, deltas):
+    """Add one chunk's ``frame_deltas`` into ``total`` (in place) and return it."""
+    for equipment_type, values in deltas.items():
+        current = total.setdefault(equipment_type, dict.fromkeys(values, 0))
+        for name, value in values.items():
+            current[name] += value
+    return total
+
+
+def apply_deltas(deltas):
+    """Add per-type deltas to the running aggregates. Call inside the upload's transaction."""
+    for equipment_type, values in deltas.items():
+        increments = {name: F(name) + value for name, value in values.items()}
+        if ChemicalDataAggregate.objects.filter(equipment_type=equipment_type).update(**increments):
+            continue
+        try:
+            with transaction.atomic():
+                ChemicalDataAggregate.objects.create(equipment_type=equipment_type, **values)
+        except IntegrityError:
+            # Another upload created the row first
+            ChemicalDataAggregate.objects.filter(equipment_type=equipment_type).update(**increments)
+
+
+def table_aggregates():
+    """Aggregates recomputed from ChemicalData with a single GROUP BY."""
+    annotations = {'count': Count('id')}
+    for param in PARAMETERS:
+        annotations[f'sum_{param}'] = Sum(param)
+        annotations[f'sumsq_{param}'] = Sum(F(param) * F(param))
+    rows = ChemicalData.objects.values('equipment_type').annotate(**annotations).order_by()
+    return {row.pop('equipment_type'): row for row in rows}
+
+
+def rebuild():
+    with transaction.atomic():
+        ChemicalDataAggregate.objects.all().delete()
+        ChemicalDataAggregate.objects.bulk_create(
+            ChemicalDataAggregate(equipment_type=equipment_type, **values)
+            for equipment_type, values in table_aggregates().items()
+        )
+
+
+def mismatches(rel_tol=1e-9):
+    """(equipment_type, field, stored, actual) for every aggregate that disagrees with the table."""
+    actual = table_aggregates()
+    stored = {agg.equipment_type: agg for agg in ChemicalDataAggregate.objects.all()}
+    problems = []
+    for equipment_type in sorted(set(actual) | set(stored)):
+        expected = actual.get(equipment_type)
+        agg = stored.get(equipment_type)
+        if expected is None:
+            if agg.count:
+                problems.append((equipment_type, 'count', agg.count, 0))
+            continue
+        if agg is None:
+            problems.append((equipment_type, 'count', 0, expected['count']))
+            continue
+        for name, value in expected.items():
+            current = getattr(agg, name)
+            if abs(current - value) > rel_tol * max(abs(current), abs(value), 1):
+                problems.append((equipment_type, name, current, value))
+    return problems
+
+
+def describe(agg):
+    stats = {}
+    for param in PARAMETERS:
+        stats[f'avg_{param}'] = agg.mean(param)
+        stats[f'variance_{param}'] = agg.variance(param)
+        stats[f'stddev_{param}'] = agg.stddev(param)
+    return stats
+
+
+def summarize(aggregates):
+    """Table-wide summary plus a per-type breakdown, read from O(types) aggregate rows."""
+    aggregates = [agg for agg in aggregates if agg.count]
+    total = ChemicalDataAggregate.combined(aggregates)
+    return {
+        'total_count': total.count,
+        **describe(total),
+        'by_type': [
+            {'equipment_type': agg.equipment_type, 'count': agg.count, **describe(agg)}
+            for agg in aggregates
+        ],
+    }
@@ -1,10 +1,16 @@
 import firebase_admin
 from firebase_admin import auth, credentials
 from django.contrib.auth.models import User
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
 from rest_framework import authentication
 from rest_framework import exceptions
 from django.conf import settings
+from collections import OrderedDict
+import hashlib
 import os
+import threading
+import time
 
 # Initialize Firebase Admin SDK
 try:
@@ -19,7 +25,155 @@ try:
 except Exception as e:
     print(f"Firebase Admin Init Error: {e}")
 
+class TokenCache:
+    """Bounded cache of verified token claims keyed by the token's SHA-256.
+
+    An entry lives for at most ``ttl`` seconds and never past the token's own
+    ``exp`` claim, so a cached token can't outlive its validity.
+    """
+
+    def __init__(self, maxsize=1024, ttl=300, clock=time.time):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def key(token):
+        return hashlib.sha256(token.encode()).hexdigest()
+
+    def get(self, token):
+        key = self.key(token)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and entry[0] > self.clock():
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry[1]
+            if entry is not None:
+                del self._entries[key]
+            self.misses += 1
+            return None
+
+    def put(self, token, claims):
+        expires = self.clock() + self.ttl
+        if 'exp' in claims:
+            expires = min(expires, claims['exp'])
+        with self._lock:
+            self._entries[self.key(token)] = (expires, claims)
+            self._entries.move_to_end(self.key(token))
+            while len(self._entries) > self.maxsize:
+                self._entries.popitem(last=False)
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.misses = 0
+
+
+class UserCache:
+    """Bounded uid -> User cache with a TTL, for resolving token subjects without a query.
+
+    Entries are dropped when the user is saved or deleted in this process
+    (see the signal handlers below); the TTL bounds how long a change made
+    by another process can go unseen. Field values are stored rather than
+    the instance, and every hit builds a fresh User, so request threads
+    never share one.
+    """
+
+    def __init__(self, maxsize=1024, ttl=60, clock=time.time):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.clock = clock
+        self.hits = 0
+        self.misses = 0
+        self._users = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, uid):
+        with self._lock:
+            entry = self._users.get(uid)
+            if entry is not None and entry[0] > self.clock():
+                self._users.move_to_end(uid)
+                self.hits += 1
+                return User.from_db(entry[1], self._field_names(), entry[2])
+            if entry is not None:
+                del self._users[uid]
+            self.misses += 1
+            return None
+
+    def put(self, uid, user):
+        values = [getattr(user, name) for name in self._field_names()]
+        with self._lock:
+            self._users[uid] = (self.clock() + self.ttl, user._state.db, values)
+            self._users.move_to_end(uid)
+            while len(self._users) > self.maxsize:
+                self._users.popitem(last=False)
+
+    def invalidate(self, uid):
+        with self._lock:
+            self._users.pop(uid, None)
+
+    def clear(self):
+        with self._lock:
+            self._users.clear()
+            self.hits = self.misses = 0
+
+    @staticmethod
+    def _field_names():
+        return [field.attname for field in User._meta.concrete_fields]
+
+
 class FirebaseAuthentication(authentication.BaseAuthentication):
+    token_cache = TokenCache(
+        maxsize=settings.FIREBASE_TOKEN_CACHE_SIZE,
+        ttl=settings.FIREBASE_TOKEN_CACHE_TTL,
+    )
+    user_cache = UserCache(
+        maxsize=settings.FIREBASE_USER_CACHE_SIZE,
+        ttl=settings.FIREBASE_USER_CACHE_TTL,
+    )
+
+    # Swappable so tests can verify tokens signed with a locally generated key
+    verify_token = staticmethod(auth.verify_id_token)
+
+    @classmethod
+    def cache_stats(cls):
+        return {
+            'token_hits': cls.token_cache.hits,
+            'token_misses': cls.token_cache.misses,
+            'user_hits': cls.user_cache.hits,
+            'user_misses': cls.user_cache.misses,
+        }
+
+    def verify(self, token):
+        decoded_token = self.token_cache.get(token)
+        if decoded_token is None:
+            # This will raise an error if the token is invalid, expired, or revoked
+            decoded_token = self.verify_token(token)
+            self.token_cache.put(token, decoded_token)
+        return decoded_token
+
+    def get_user(self, uid, email):
+        user = self.user_cache.get(uid)
+        if user is not None:
+            return user
+        # Get or create a user based on the Firebase UID
+        try:
+            user = User.objects.get(username=uid)
+        except User.DoesNotExist:
+            # Create a new user if they don't exist in Django yet
+            user = User.objects.create_user(
+                username=uid,
+                email=email,
+                password=None 
+            )
+        self.user_cache.put(uid, user)
+        return user
+
     def authenticate(self, request):
         auth_header = request.headers.get('Authorization')
         
@@ -32,24 +186,12 @@ class FirebaseAuthentication(authentication.BaseAuthentication):
             if prefix != 'Bearer':
                 return None
             
-            # Verify the ID token using Firebase Admin SDK
-            # This will raise an error if the token is invalid, expired, or revoked
-            decoded_token = auth.verify_id_token(token)
+            # Verify the ID token using Firebase Admin SDK (cached per token)
+            decoded_token = self.verify(token)
             uid = decoded_token['uid']
             email = decoded_token.get('email', '')
             
-            # Get or create a user based on the Firebase UID
-            try:
-                user = User.objects.get(username=uid)
-            except User.DoesNotExist:
-                # Create a new user if they don't exist in Django yet
-                user = User.objects.create_user(
-                    username=uid,
-                    email=email,
-                    password=None 
-                )
-                
-            return (user, None)
+            user = self.get_user(uid, email)
             
         except ValueError as e:
             # Token invalid
@@ -60,4 +202,14 @@ class FirebaseAuthentication(authentication.BaseAuthentication):
              raise exceptions.AuthenticationFailed('Token revoked')
         except Exception as e:
             print(f"Auth Error: {str(e)}")
-            raise exceptions.AuthenticationFailed('Authentication failed')
\ No newline at end of file
+            raise exceptions.AuthenticationFailed('Authentication failed')
+
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed('User is inactive')
+        return (user, None)
+
+
+@receiver([post_save, post_delete], sender=User)
+def drop_cached_user(sender, instance, **kwargs):
+    # Deleted or deactivated users must not keep authenticating from the cache
+    FirebaseAuthentication.user_cache.invalidate(instance.username)
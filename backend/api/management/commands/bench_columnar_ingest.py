@@ -0,0 +1,61 @@
+import time
+
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from api.models import ChemicalData
+from equipment.ingest import write_columns
+
+TYPES = ['Pump', 'Valve', 'Compressor', 'Heat Exchanger', 'Reactor', 'Condenser']
+COLUMNS = ['equipment_type', 'flowrate', 'pressure', 'temperature']
+
+
+def sample_frame(rows):
+    rng = np.random.default_rng(0)
+    return pd.DataFrame({
+        'equipment_type': rng.choice(TYPES, rows),
+        'flowrate': rng.uniform(0, 300, rows),
+        'pressure': rng.uniform(1, 20, rows),
+        'temperature': rng.uniform(20, 400, rows),
+    })
+
+
+def iterrows_ingest(df, batch_size):
+    instances = [
+        ChemicalData(
+            equipment_type=row['equipment_type'],
+            flowrate=row['flowrate'],
+            pressure=row['pressure'],
+            temperature=row['temperature']
+        )
+        for _, row in df.iterrows()
+    ]
+    ChemicalData.objects.bulk_create(instances)
+
+
+def columnar_ingest(df, batch_size):
+    columns = {col: df[col].to_numpy() for col in COLUMNS}
+    write_columns(ChemicalData, columns, constants={'created_at': timezone.now()}, batch_size=batch_size)
+
+
+class Command(BaseCommand):
+    help = 'Compares iterrows + bulk_create against the columnar batch writer (changes are rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[10_000, 100_000, 1_000_000])
+        parser.add_argument('--batch-size', type=int, default=None)
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'rows':>10} {'mode':>10} {'seconds':>8} {'rows/sec':>10}")
+        for rows in options['rows']:
+            df = sample_frame(rows)
+            for mode, func in (('iterrows', iterrows_ingest), ('columnar', columnar_ingest)):
+                with transaction.atomic():
+                    started = time.perf_counter()
+                    func(df, options['batch_size'])
+                    elapsed = time.perf_counter() - started
+                    transaction.set_rollback(True)
+                self.stdout.write(f'{rows:>10} {mode:>10} {elapsed:>8.2f} {rows / elapsed:>10.0f}')
@@ -0,0 +1,22 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from api.aggregates import mismatches, rebuild
+
+
+class Command(BaseCommand):
+    help = 'Rebuilds ChemicalDataAggregate from the ChemicalData table and verifies the result'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--check', action='store_true', help='Only verify the stored aggregates, do not rebuild')
+
+    def handle(self, *args, **options):
+        if not options['check']:
+            rebuild()
+            self.stdout.write('Rebuilt aggregates from ChemicalData')
+
+        problems = mismatches()
+        for equipment_type, field, stored, actual in problems:
+            self.stdout.write(self.style.ERROR(f'{equipment_type!r} {field}: stored {stored}, table {actual}'))
+        if problems:
+            raise CommandError(f'{len(problems)} aggregate value(s) disagree with ChemicalData')
+        self.stdout.write(self.style.SUCCESS('Aggregates match ChemicalData'))
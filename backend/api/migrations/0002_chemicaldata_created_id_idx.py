@@ -0,0 +1,17 @@
+# Generated by Django 6.0.2 on 2026-10-17 04:22
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0001_initial'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='chemicaldata',
+            index=models.Index(fields=['created_at', 'id'], name='chemicaldata_created_id_idx'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+# Generated by Django 6.0.2 on 2026-10-17 04:22
+
+from django.db import migrations, models
+from django.db.models import Count, F, Sum
+
+
+def build_aggregates(apps, schema_editor):
+    ChemicalData = apps.get_model('api', 'ChemicalData')
+    ChemicalDataAggregate = apps.get_model('api', 'ChemicalDataAggregate')
+    annotations = {'count': Count('id')}
+    for param in ('flowrate', 'pressure', 'temperature'):
+        annotations[f'sum_{param}'] = Sum(param)
+        annotations[f'sumsq_{param}'] = Sum(F(param) * F(param))
+    rows = ChemicalData.objects.values('equipment_type').annotate(**annotations).order_by()
+    ChemicalDataAggregate.objects.bulk_create(ChemicalDataAggregate(**row) for row in rows)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0002_chemicaldata_created_id_idx'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChemicalDataAggregate',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('equipment_type', models.CharField(max_length=100, unique=True)),
+                ('count', models.BigIntegerField(default=0)),
+                ('sum_flowrate', models.FloatField(default=0)),
+                ('sumsq_flowrate', models.FloatField(default=0)),
+                ('sum_pressure', models.FloatField(default=0)),
+                ('sumsq_pressure', models.FloatField(default=0)),
+                ('sum_temperature', models.FloatField(default=0)),
+                ('sumsq_temperature', models.FloatField(default=0)),
+            ],
+        ),
+        migrations.RunPython(build_aggregates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,23 @@
+# Generated by Django 6.0.2 on 2026-10-17 04:58
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('api', '0003_chemicaldataaggregate'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='ChemicalUpload',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('content_hash', models.CharField(max_length=64, unique=True)),
+                ('file_name', models.CharField(max_length=255)),
+                ('rows', models.BigIntegerField(default=0)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+            ],
+        ),
+    ]
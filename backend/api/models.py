@@ -7,5 +7,71 @@ class ChemicalData(models.Model):
     temperature = models.FloatField()
     created_at = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        indexes = [
+            # Keyset pagination in SummaryView seeks on (created_at, id)
+            models.Index(fields=['created_at', 'id'], name='chemicaldata_created_id_idx'),
+        ]
+
     def __str__(self):
         return f"{self.equipment_type} - {self.created_at}"
+
+
+class ChemicalDataAggregate(models.Model):
+    """Running count, sums and sums of squares of ChemicalData per equipment type.
+
+    Kept in step with the table by the upload path so summaries never scan it;
+    ``manage.py rebuild_chemical_aggregates`` recomputes it from scratch.
+    """
+    PARAMETERS = ['flowrate', 'pressure', 'temperature']
+
+    equipment_type = models.CharField(max_length=100, unique=True)
+    count = models.BigIntegerField(default=0)
+    sum_flowrate = models.FloatField(default=0)
+    sumsq_flowrate = models.FloatField(default=0)
+    sum_pressure = models.FloatField(default=0)
+    sumsq_pressure = models.FloatField(default=0)
+    sum_temperature = models.FloatField(default=0)
+    sumsq_temperature = models.FloatField(default=0)
+
+    def __str__(self):
+        return f"{self.equipment_type}: {self.count}"
+
+    def mean(self, param):
+        if not self.count:
+            return 0
+        return getattr(self, f'sum_{param}') / self.count
+
+    def variance(self, param):
+        # Sample variance (ddof=1), matching pandas' default
+        if self.count < 2:
+            return 0
+        total = getattr(self, f'sum_{param}')
+        spread = getattr(self, f'sumsq_{param}') - total * total / self.count
+        return max(spread, 0) / (self.count - 1)
+
+    def stddev(self, param):
+        return self.variance(param) ** 0.5
+
+    @classmethod
+    def combined(cls, aggregates):
+        """Fold several per-type rows into one unsaved all-types row."""
+        total = cls(equipment_type='')
+        for agg in aggregates:
+            total.count += agg.count
+            for param in cls.PARAMETERS:
+                for prefix in ('sum', 'sumsq'):
+                    name = f'{prefix}_{param}'
+                    setattr(total, name, getattr(total, name) + getattr(agg, name))
+        return total
+
+
+class ChemicalUpload(models.Model):
+    """One CSV loaded into ChemicalData, keyed by its content hash so a re-upload is skipped."""
+    content_hash = models.CharField(max_length=64, unique=True)
+    file_name = models.CharField(max_length=255)
+    rows = models.BigIntegerField(default=0)
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.file_name} ({self.rows} rows)"
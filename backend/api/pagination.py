@@ -0,0 +1,70 @@
+import base64
+import json
+
+from django.db.models import Q
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import NotFound
+from rest_framework.pagination import BasePagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
+
+
+def encode_cursor(created_at, pk):
+    raw = json.dumps([created_at.isoformat(), pk]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        created_at, pk = json.loads(base64.urlsafe_b64decode(padded))
+        created_at = parse_datetime(created_at)
+        if created_at is None:
+            raise ValueError(cursor)
+        return created_at, int(pk)
+    except (TypeError, ValueError):
+        raise NotFound('Invalid cursor')
+
+
+def after_cursor(queryset, cursor):
+    """Rows strictly after ``cursor`` in (created_at, id) order."""
+    if not cursor:
+        return queryset.order_by('created_at', 'id')
+    created_at, pk = decode_cursor(cursor)
+    return queryset.filter(
+        Q(created_at__gt=created_at) | Q(created_at=created_at, id__gt=pk)
+    ).order_by('created_at', 'id')
+
+
+class KeysetPagination(BasePagination):
+    """Seek pagination on (created_at, id) so every page costs one index range scan."""
+    cursor_query_param = 'cursor'
+    page_size_query_param = 'limit'
+    page_size = 1000
+    max_page_size = 10000
+
+    def get_page_size(self, request):
+        try:
+            size = int(request.query_params.get(self.page_size_query_param, self.page_size))
+        except ValueError:
+            size = self.page_size
+        return max(1, min(size, self.max_page_size))
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.request = request
+        size = self.get_page_size(request)
+        # Fetch one extra row to know whether another page exists
+        rows = list(after_cursor(queryset, request.query_params.get(self.cursor_query_param))[:size + 1])
+        self.has_next = len(rows) > size
+        self.page = rows[:size]
+        return self.page
+
+    def get_next_link(self):
+        if not self.has_next:
+            return None
+        last = self.page[-1]
+        url = self.request.build_absolute_uri()
+        return replace_query_param(url, self.cursor_query_param, encode_cursor(last.created_at, last.pk))
+
+    def get_paginated_response(self, data, **extra):
+        return Response({**extra, 'next': self.get_next_link(), 'data': data})
@@ -1,3 +1,304 @@
-from django.test import TestCase
+import functools
+import io
+import json
+import statistics
+import time
+from datetime import datetime, timedelta, timezone as dt_timezone
+from email.utils import formatdate
+from types import SimpleNamespace
+from unittest import mock
+from urllib.parse import parse_qs, urlparse
 
-# Create your tests here.
+import cachecontrol.controller
+import firebase_admin
+import jwt
+import urllib3
+from cryptography import x509
+from cryptography.hazmat.primitives import hashes, serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+from cryptography.x509.oid import NameOID
+from django.contrib.auth.models import User
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from firebase_admin import auth as firebase_auth, credentials
+from requests.adapters import HTTPAdapter
+from rest_framework.exceptions import AuthenticationFailed
+from rest_framework.test import APIClient, APIRequestFactory
+
+from . import aggregates, views
+from .authentication import FirebaseAuthentication
+from .models import ChemicalData, ChemicalDataAggregate, ChemicalUpload
+from .pagination import decode_cursor, encode_cursor
+
+
+def make_rows(count, created_at):
+    rows = ChemicalData.objects.bulk_create(
+        ChemicalData(equipment_type='Pump', flowrate=i, pressure=1, temperature=2) for i in range(count)
+    )
+    # auto_now_add ignores the value passed in, so timestamps are set afterwards
+    ChemicalData.objects.filter(pk__in=[row.pk for row in rows]).update(created_at=created_at)
+    return sorted(row.pk for row in rows)
+
+
+class SocketBody(io.BytesIO):
+    """Response body that closes once fully read, as a socket's does; the HTTP cache stores a body at that point."""
+
+    def read(self, *args):
+        data = super().read(*args)
+        if self.tell() == len(self.getbuffer()):
+            self.close()
+        return data
+
+
+class LocalCertServer:
+    """Google's public-certificate endpoint, served from keys generated here.
+
+    Replaces the HTTP send under firebase_admin's certificate fetcher, so
+    tokens go through the real ``auth.verify_id_token`` (header checks,
+    x509 signature check, cache-control caching of the certificates) with
+    nothing leaving the machine. ``now`` is the clock the cache sees.
+    """
+
+    def __init__(self, project_id, max_age=3600):
+        self.project_id = project_id
+        self.max_age = max_age
+        self.keys = {}
+        self.published = {}
+        self.fetches = 0
+        self.now = time.time()
+
+    def rotate(self, kid):
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        name = x509.Name([x509.NameAttribute(NameOID.COMMON_NAME, 'securetoken.system.gserviceaccount.com')])
+        cert = (x509.CertificateBuilder().subject_name(name).issuer_name(name).public_key(key.public_key())
+                .serial_number(x509.random_serial_number())
+                .not_valid_before(datetime.now(dt_timezone.utc) - timedelta(days=1))
+                .not_valid_after(datetime.now(dt_timezone.utc) + timedelta(days=1))
+                .sign(key, hashes.SHA256()))
+        self.keys[kid] = key
+        self.published[kid] = cert.public_bytes(serialization.Encoding.PEM).decode()
+        return kid
+
+    def sign(self, kid, uid, expires_in=3600):
+        now = int(time.time())
+        claims = {
+            'iss': f'https://securetoken.google.com/{self.project_id}', 'aud': self.project_id,
+            'sub': uid, 'auth_time': now, 'iat': now, 'exp': now + expires_in, 'email': f'{uid}@example.com',
+        }
+        return jwt.encode(claims, self.keys[kid], algorithm='RS256', headers={'kid': kid})
+
+    def send(self, adapter, request):
+        self.fetches += 1
+        raw = urllib3.HTTPResponse(
+            body=SocketBody(json.dumps(self.published).encode()), status=200, preload_content=False,
+            request_method='GET', headers={
+                'Content-Type': 'application/json', 'Date': formatdate(self.now, usegmt=True),
+                'Cache-Control': f'public, max-age={self.max_age}',
+            },
+        )
+        # The caching adapter's build_response stores the body once it has been read
+        return adapter.build_response(request, raw)
+
+
+class FirebaseAuthenticationTests(TestCase):
+    def setUp(self):
+        self.server = LocalCertServer('chemflow-test')
+        app = firebase_admin.initialize_app(self.service_account(), name=f'test-{id(self)}')
+        self.addCleanup(firebase_admin.delete_app, app)
+        for patcher in (
+            mock.patch.object(FirebaseAuthentication, 'verify_token',
+                              staticmethod(functools.partial(firebase_auth.verify_id_token, app=app))),
+            mock.patch.object(HTTPAdapter, 'send', lambda adapter, request, *args, **kwargs: self.server.send(adapter, request)),
+            mock.patch.object(cachecontrol.controller, 'time', SimpleNamespace(time=lambda: self.server.now)),
+        ):
+            patcher.start()
+            self.addCleanup(patcher.stop)
+        FirebaseAuthentication.token_cache.clear()
+        FirebaseAuthentication.user_cache.clear()
+        self.factory = APIRequestFactory()
+
+    def service_account(self):
+        # A credential of a made-up project; verifying tokens never uses its key
+        key = rsa.generate_private_key(public_exponent=65537, key_size=2048)
+        return credentials.Certificate({
+            'type': 'service_account', 'project_id': self.server.project_id,
+            'client_email': f'test@{self.server.project_id}.iam.gserviceaccount.com',
+            'token_uri': 'https://oauth2.googleapis.com/token',
+            'private_key': key.private_bytes(serialization.Encoding.PEM, serialization.PrivateFormat.PKCS8,
+                                             serialization.NoEncryption()).decode(),
+        })
+
+    def authenticate(self, token):
+        request = self.factory.get('/', HTTP_AUTHORIZATION=f'Bearer {token}')
+        return FirebaseAuthentication().authenticate(request)[0]
+
+    def test_tokens_verify_offline_and_are_cached(self):
+        token = self.server.sign(self.server.rotate('key-1'), 'uid-1')
+        user = self.authenticate(token)
+        self.assertEqual(user.username, 'uid-1')
+        with self.assertNumQueries(0):
+            self.assertEqual(self.authenticate(token).pk, user.pk)
+        self.assertEqual(FirebaseAuthentication.cache_stats()['user_hits'], 1)
+        # Another token is verified against the certificates the SDK already cached
+        self.authenticate(self.server.sign('key-1', 'uid-2'))
+        self.assertEqual(self.server.fetches, 1)
+
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(self.server.sign('key-1', 'uid-1', expires_in=-10))
+
+    def test_rotated_keys_are_picked_up_when_the_cached_certificates_expire(self):
+        self.server.rotate('key-1')
+        self.authenticate(self.server.sign('key-1', 'uid-1'))
+        rotated = self.server.sign(self.server.rotate('key-2'), 'uid-1')
+        # Google publishes new keys ahead of use; until the cached set expires the new kid is unknown
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(rotated)
+        self.assertEqual(self.server.fetches, 1)
+
+        self.server.now += self.server.max_age + 1
+        self.assertEqual(self.authenticate(rotated).username, 'uid-1')
+        self.assertEqual(self.server.fetches, 2)
+
+    def test_deleted_and_deactivated_users_are_not_served_from_cache(self):
+        token = self.server.sign(self.server.rotate('key-1'), 'uid-2')
+        first = self.authenticate(token)
+        self.assertIsNot(self.authenticate(token), self.authenticate(token))
+
+        first.delete()
+        again = self.authenticate(token)
+        self.assertNotEqual(again.pk, first.pk)
+        self.assertTrue(User.objects.filter(pk=again.pk).exists())
+
+        again.is_active = False
+        again.save(update_fields=['is_active'])
+        with self.assertRaises(AuthenticationFailed):
+            self.authenticate(token)
+
+
+# The api app isn't mounted by the project urlconf, so its tests route to it directly
+@override_settings(ROOT_URLCONF='api.urls')
+class SummaryPaginationTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('pager'))
+
+    def walk(self, url):
+        ids = []
+        while url:
+            response = self.client.get(url)
+            self.assertEqual(response.status_code, 200)
+            ids += [row['id'] for row in response.data['data']]
+            url = response.data['next']
+        return ids
+
+    def test_cursor_round_trip(self):
+        created_at = timezone.now().replace(microsecond=123456)
+        self.assertEqual(decode_cursor(encode_cursor(created_at, 42)), (created_at, 42))
+        response = self.client.get('/summary/', {'cursor': 'not-a-cursor'})
+        self.assertEqual(response.status_code, 404)
+
+    def test_pages_cover_every_row_once_across_timestamp_ties(self):
+        now = timezone.now()
+        # Page boundaries fall inside runs of identical created_at values
+        expected = make_rows(3, now - timedelta(hours=1)) + make_rows(5, now) + make_rows(1, now + timedelta(hours=1))
+
+        self.assertEqual(self.walk('/summary/?limit=2'), expected)
+        self.assertEqual(self.walk('/summary/?limit=100'), expected)
+
+    def test_ndjson_stream_resumes_from_a_cursor(self):
+        expected = make_rows(6, timezone.now())
+        first = self.client.get('/summary/', {'limit': 2})
+        cursor = parse_qs(urlparse(first.data['next']).query)['cursor'][0]
+
+        response = self.client.get('/summary/', {'stream': 'ndjson', 'cursor': cursor})
+        self.assertEqual(response['Content-Type'], 'application/x-ndjson')
+        lines = b''.join(response.streaming_content).decode().splitlines()
+        self.assertEqual([json.loads(line)['id'] for line in lines], expected[2:])
+
+
+@override_settings(ROOT_URLCONF='api.urls', INGEST_CHUNK_ROWS=2)
+class AggregateDeltaTests(TestCase):
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('aggregator'))
+
+    def upload(self, data):
+        return self.client.post('/upload/', {'file': SimpleUploadedFile('a.csv', data)}, format='multipart')
+
+    def test_deltas_match_a_full_recompute(self):
+        # Several chunks per file, so per-chunk deltas are merged before they are applied
+        self.upload(b'equipment_type,flowrate,pressure,temperature\nPump,1.5,2,3\nValve,4,5,6\nPump,2.5,8,9\n')
+        self.upload(b'equipment_type,flowrate,pressure,temperature\nPump,10,1,1\nHeater,7,7,7\n')
+
+        self.assertEqual(aggregates.mismatches(), [])
+        pump = ChemicalDataAggregate.objects.get(equipment_type='Pump')
+        self.assertEqual(pump.count, 3)
+        self.assertAlmostEqual(pump.mean('flowrate'), 14 / 3)
+        self.assertAlmostEqual(pump.variance('pressure'), statistics.variance([2, 8, 1]))
+        summary = self.client.get('/summary/').data['summary']
+        self.assertEqual(summary['total_count'], 5)
+        self.assertEqual([(row['equipment_type'], row['count']) for row in summary['by_type']],
+                         [('Heater', 1), ('Pump', 3), ('Valve', 1)])
+
+    def test_failed_write_rolls_back_rows_and_aggregates(self):
+        self.upload(b'equipment_type,flowrate,pressure,temperature\nPump,1,2,3\n')
+        before = list(ChemicalDataAggregate.objects.values())
+
+        real_write = views.write_columns
+        def write_then_fail(*args, **kwargs):
+            if write.call_count > 1:
+                raise RuntimeError('disk full')
+            return real_write(*args, **kwargs)
+
+        with mock.patch.object(views, 'write_columns', side_effect=write_then_fail) as write:
+            response = self.upload(b'equipment_type,flowrate,pressure,temperature\nPump,5,5,5\nValve,1,1,1\nPump,2,2,2\n')
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(list(ChemicalDataAggregate.objects.values()), before)
+        self.assertEqual(ChemicalData.objects.count(), 1)
+        self.assertEqual(ChemicalUpload.objects.count(), 1)
+
+
+@override_settings(ROOT_URLCONF='api.urls', INGEST_CHUNK_ROWS=2)
+class UploadValidationTests(TestCase):
+    CSV = b'equipment_type,flowrate,pressure,temperature\nPump,1,2,3\nValve,4,5,6\n'
+
+    def setUp(self):
+        self.client = APIClient()
+        self.client.force_authenticate(User.objects.create_user('uploader'))
+
+    def upload(self, data):
+        return self.client.post('/upload/', {'file': SimpleUploadedFile('a.csv', data)}, format='multipart')
+
+    def test_duplicate_files_are_answered_from_the_first_upload(self):
+        self.assertEqual(self.upload(self.CSV).status_code, 201)
+        self.assertEqual(self.upload(self.CSV).data['duplicate_of'], 'a.csv')
+
+        # A concurrent upload of the same file gets past the lookup and loses on the unique index
+        real_filter = ChemicalUpload.objects.filter
+        lookups = []
+        def miss_first_lookup(*args, **kwargs):
+            lookups.append(kwargs)
+            queryset = real_filter(*args, **kwargs)
+            return queryset.none() if len(lookups) == 1 else queryset
+
+        with mock.patch.object(ChemicalUpload.objects, 'filter', side_effect=miss_first_lookup):
+            response = self.upload(self.CSV)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['duplicate_of'], 'a.csv')
+        self.assertEqual(ChemicalData.objects.count(), 2)
+        self.assertEqual(aggregates.mismatches(), [])
+
+    def test_blank_cells_are_rejected_before_anything_is_written(self):
+        for data, error in [
+            (self.CSV + b'Pump,7,,9\n', 'Row 3: pressure is blank or not a number'),
+            (self.CSV + b',7,8,9\n', 'Row 3: equipment_type is blank or not a number'),
+            (b'equipment_type,flowrate,pressure,temperature\nPump,NaN,2,3\n', 'Row 1: flowrate is blank or not a number'),
+        ]:
+            with self.subTest(error=error):
+                response = self.upload(data)
+                self.assertEqual(response.status_code, 400)
+                self.assertEqual(response.data['error'], error)
+        self.assertFalse(ChemicalData.objects.exists())
+        self.assertFalse(ChemicalUpload.objects.exists())
+        self.assertFalse(ChemicalDataAggregate.objects.exists())
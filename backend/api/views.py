@@ -1,11 +1,35 @@
-import pandas as pd
+import json
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework import status, permissions
-from .models import ChemicalData
+from .models import ChemicalData, ChemicalDataAggregate, ChemicalUpload
+from .aggregates import apply_deltas, frame_deltas, merge_deltas, summarize
 from .serializers import ChemicalDataSerializer
-from django.db.models import Avg, Count
+from .pagination import KeysetPagination, after_cursor
+from django.db import IntegrityError, transaction
+from django.http import StreamingHttpResponse
+from django.utils import timezone
+from equipment.ingest import CsvSchema, IngestError, InvalidValuesError, iter_csv_chunks, write_columns
+from equipment.uploadhandlers import content_hash
+
+# Expected columns: equipment_type, flowrate, pressure, temperature
+CHEMICAL_SCHEMA = CsvSchema(
+    ['equipment_type', 'flowrate', 'pressure', 'temperature'],
+    numeric=['flowrate', 'pressure', 'temperature'],
+    categorical=['equipment_type'],
+)
+
+def check_required_values(chunk, first_row):
+    """Reject a chunk with a blank cell; every ChemicalData column is NOT NULL.
+
+    ``first_row`` is the chunk's first data row number in the file, for the message.
+    """
+    blank = chunk[CHEMICAL_SCHEMA.columns].isna().to_numpy()
+    if blank.any():
+        position = blank.any(axis=1).argmax()
+        column = CHEMICAL_SCHEMA.columns[blank[position].argmax()]
+        raise InvalidValuesError(f'Row {first_row + position}: {column} is blank or not a number')
 
 class UploadView(APIView):
     parser_classes = (MultiPartParser, FormParser)
@@ -15,55 +39,82 @@ class UploadView(APIView):
         file_obj = request.FILES['file']
         if not file_obj.name.endswith('.csv'):
             return Response({'error': 'File must be CSV'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # Identical content was already loaded; don't insert its rows twice
+        digest = content_hash(file_obj)
+        previous = ChemicalUpload.objects.filter(content_hash=digest).first()
+        if previous:
+            return self.duplicate_response(previous)
         
         try:
-            df = pd.read_csv(file_obj)
-            # Expected columns: equipment_type, flowrate, pressure, temperature
-            required_cols = ['equipment_type', 'flowrate', 'pressure', 'temperature']
-            if not all(col in df.columns for col in required_cols):
-                 return Response({'error': f'Missing columns. Required: {required_cols}'}, status=status.HTTP_400_BAD_REQUEST)
-
             # Clear old data for this demo (optional, but good for clean state)
             # ChemicalData.objects.all().delete() 
 
-            instances = [
-                ChemicalData(
-                    equipment_type=row['equipment_type'],
-                    flowrate=row['flowrate'],
-                    pressure=row['pressure'],
-                    temperature=row['temperature']
-                )
-                for _, row in df.iterrows()
-            ]
-            ChemicalData.objects.bulk_create(instances)
+            # Typed chunks (header checked first, extra columns skipped) go
+            # straight to the column writer instead of one model per row
+            rows, elapsed, deltas = 0, 0.0, {}
+            created_at = timezone.now()
+            with transaction.atomic():
+                # Claimed first, so a concurrent upload of the same file waits on the unique index.
+                # The savepoint confines the unique violation, so any other integrity error is a real failure
+                try:
+                    with transaction.atomic():
+                        upload = ChemicalUpload.objects.create(content_hash=digest, file_name=file_obj.name[:255])
+                except IntegrityError:
+                    previous = ChemicalUpload.objects.filter(content_hash=digest).first()
+                    if previous is None:
+                        raise
+                    return self.duplicate_response(previous)
+                for chunk in iter_csv_chunks(file_obj, schema=CHEMICAL_SCHEMA):
+                    check_required_values(chunk, first_row=rows + 1)
+                    columns = {col: chunk[col].to_numpy() for col in CHEMICAL_SCHEMA.columns}
+                    written, seconds = write_columns(ChemicalData, columns, constants={'created_at': created_at})
+                    rows += written
+                    elapsed += seconds
+                    merge_deltas(deltas, frame_deltas(chunk))
+                apply_deltas(deltas)
+                upload.rows = rows
+                upload.save(update_fields=['rows'])
             
-            return Response({'message': f'Uploaded {len(instances)} records successfully'}, status=status.HTTP_201_CREATED)
+            return Response({
+                'message': f'Uploaded {rows} records successfully',
+                'rows': rows,
+                'seconds': round(elapsed, 3),
+                'rows_per_sec': round(rows / elapsed) if elapsed else None,
+            }, status=status.HTTP_201_CREATED)
+        except IngestError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+    def duplicate_response(self, upload):
+        return Response({
+            'message': f'Already uploaded as {upload.file_name} ({upload.rows} records)',
+            'rows': 0,
+            'duplicate_of': upload.file_name,
+        }, status=status.HTTP_200_OK)
+
 class SummaryView(APIView):
     permission_classes = [permissions.IsAuthenticated]
+    pagination_class = KeysetPagination
 
     def get(self, request):
         data = ChemicalData.objects.all()
-        serializer = ChemicalDataSerializer(data, many=True)
-        
-        # Calculate summary
-        total_count = data.count()
-        aggs = data.aggregate(
-            avg_flow=Avg('flowrate'),
-            avg_press=Avg('pressure'),
-            avg_temp=Avg('temperature')
-        )
-        
-        summary = {
-            'total_count': total_count,
-            'avg_flowrate': aggs['avg_flow'] or 0,
-            'avg_pressure': aggs['avg_press'] or 0,
-            'avg_temperature': aggs['avg_temp'] or 0,
-        }
+
+        # ?stream=ndjson: one JSON object per line, read through a server-side cursor
+        if request.query_params.get('stream') == 'ndjson':
+            rows = after_cursor(data, request.query_params.get('cursor'))
+            return StreamingHttpResponse(self.stream_rows(rows), content_type='application/x-ndjson')
         
-        return Response({
-            'summary': summary,
-            'data': serializer.data
-        })
+        # Summary comes from the running per-type aggregates, not a table scan
+        summary = summarize(ChemicalDataAggregate.objects.order_by('equipment_type'))
+
+        paginator = self.pagination_class()
+        page = paginator.paginate_queryset(data, request, view=self)
+        serializer = ChemicalDataSerializer(page, many=True)
+        return paginator.get_paginated_response(serializer.data, summary=summary)
+
+    def stream_rows(self, queryset):
+        serializer = ChemicalDataSerializer()
+        for obj in queryset.iterator(chunk_size=2000):
+            yield json.dumps(serializer.to_representation(obj)) + '\n'
@@ -11,6 +11,8 @@ https://docs.djangoproject.com/en/6.0/ref/settings/
 """
 
 import os
+import sys
+import tempfile
 import dj_database_url
 from pathlib import Path
 from dotenv import load_dotenv
@@ -18,6 +20,11 @@ from dotenv import load_dotenv
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# The statistics kernel (chemflow_stats) is shared with the desktop client and lives beside both
+SHARED_DIR = BASE_DIR.parent / 'shared'
+if str(SHARED_DIR) not in sys.path:
+    sys.path.append(str(SHARED_DIR))
+
 load_dotenv(BASE_DIR / '.env')
 
 
@@ -156,3 +163,76 @@ REST_FRAMEWORK = {
         'rest_framework.permissions.IsAuthenticated',
     ],
 }
+
+# Upload ingestion
+# Uploads are parsed in chunks of this many rows so worker memory stays flat
+INGEST_CHUNK_ROWS = int(os.environ.get('INGEST_CHUNK_ROWS', 100_000))
+# Rows per COPY / multi-row INSERT when writing parsed columns to the database
+INGEST_WRITE_BATCH_ROWS = int(os.environ.get('INGEST_WRITE_BATCH_ROWS', 5_000))
+
+# Firebase token verification caches
+FIREBASE_TOKEN_CACHE_SIZE = int(os.environ.get('FIREBASE_TOKEN_CACHE_SIZE', 4096))
+# Seconds a verified token is trusted before re-checking its signature (never past its exp)
+FIREBASE_TOKEN_CACHE_TTL = int(os.environ.get('FIREBASE_TOKEN_CACHE_TTL', 300))
+FIREBASE_USER_CACHE_SIZE = int(os.environ.get('FIREBASE_USER_CACHE_SIZE', 4096))
+# Seconds a resolved user is reused; saves and deletes in this process drop it at once
+FIREBASE_USER_CACHE_TTL = int(os.environ.get('FIREBASE_USER_CACHE_TTL', 60))
+
+# Rendered PDF reports, cached on local disk by content hash
+REPORT_CACHE_DIR = os.environ.get('REPORT_CACHE_DIR', os.path.join(tempfile.gettempdir(), 'chemflow-reports'))
+REPORT_CACHE_MAX_BYTES = int(os.environ.get('REPORT_CACHE_MAX_BYTES', 256 * 1024 * 1024))
+# Background threads that pre-render reports right after an upload
+REPORT_RENDER_WORKERS = int(os.environ.get('REPORT_RENDER_WORKERS', 2))
+# Optional cap on the per-equipment rows in a PDF report, the rest summarised by a
+# note. Unset renders every row: pages are streamed to disk, so memory stays flat,
+# but a cache miss on a huge upload renders inside the request
+REPORT_MAX_DETAIL_ROWS = int(os.environ['REPORT_MAX_DETAIL_ROWS']) if os.environ.get('REPORT_MAX_DETAIL_ROWS') else None
+
+# Asynchronous uploads: the request spools the file here and a worker
+# (manage.py run_upload_workers) processes it
+UPLOAD_SPOOL_DIR = os.environ.get('UPLOAD_SPOOL_DIR', os.path.join(tempfile.gettempdir(), 'chemflow-uploads'))
+# Process every upload asynchronously unless the request passes ?async=false
+UPLOAD_ASYNC = os.environ.get('UPLOAD_ASYNC') == 'True'
+# Seconds between a worker's heartbeats on its running job, and seconds without
+# one after which the worker is presumed dead and the job is queued again
+UPLOAD_JOB_HEARTBEAT_SECONDS = int(os.environ.get('UPLOAD_JOB_HEARTBEAT_SECONDS', 15))
+UPLOAD_JOB_LEASE_SECONDS = int(os.environ.get('UPLOAD_JOB_LEASE_SECONDS', 120))
+# Claims of one job before it is failed (each earlier claim's worker died on it)
+UPLOAD_JOB_MAX_ATTEMPTS = int(os.environ.get('UPLOAD_JOB_MAX_ATTEMPTS', 3))
+
+# Seconds a serialized summary/history response stays in the per-user cache
+# (entries are also keyed on the latest summary id, so uploads never serve stale data)
+SUMMARY_CACHE_TIMEOUT = int(os.environ.get('SUMMARY_CACHE_TIMEOUT', 300))
+
+# Retention: raw summaries kept per user (older uploads survive only as rollups)
+SUMMARY_RETENTION = int(os.environ.get('SUMMARY_RETENTION', 5))
+# Days of hourly rollups kept; daily rollups are kept indefinitely
+ROLLUP_HOURLY_RETENTION_DAYS = int(os.environ.get('ROLLUP_HOURLY_RETENTION_DAYS', 31))
+
+# Batch uploads: CSVs are parsed in parallel on this many worker processes
+BATCH_UPLOAD_WORKERS = int(os.environ.get('BATCH_UPLOAD_WORKERS', os.cpu_count() or 1))
+# Most CSVs (including ZIP members) and uncompressed bytes accepted in one batch
+BATCH_UPLOAD_MAX_FILES = int(os.environ.get('BATCH_UPLOAD_MAX_FILES', 100))
+BATCH_UPLOAD_MAX_BYTES = int(os.environ.get('BATCH_UPLOAD_MAX_BYTES', 2 * 1024 * 1024 * 1024))
+
+# CSV parser: 'c' (pandas, row-sized chunks) or 'pyarrow' (multi-threaded, needs pyarrow)
+INGEST_CSV_ENGINE = os.environ.get('INGEST_CSV_ENGINE', 'c')
+# dtype numeric upload columns are parsed as; float32 halves memory but rounds stored readings
+INGEST_FLOAT_DTYPE = os.environ.get('INGEST_FLOAT_DTYPE', 'float64')
+
+# Upload files are hashed as they stream in, so re-uploads of identical content are recognised without parsing
+FILE_UPLOAD_HANDLERS = [
+    'equipment.uploadhandlers.HashingMemoryFileUploadHandler',
+    'equipment.uploadhandlers.HashingTemporaryFileUploadHandler',
+]
+
+# Chunked (resumable) uploads: chunk size handed to clients, largest file accepted,
+# and hours an unfinished upload is kept before its spooled chunks are discarded
+# (by the upload workers, or the expire_chunked_uploads command)
+CHUNKED_UPLOAD_CHUNK_BYTES = int(os.environ.get('CHUNKED_UPLOAD_CHUNK_BYTES', 8 * 1024 * 1024))
+CHUNKED_UPLOAD_MAX_BYTES = int(os.environ.get('CHUNKED_UPLOAD_MAX_BYTES', 20 * 1024 * 1024 * 1024))
+CHUNKED_UPLOAD_EXPIRY_HOURS = int(os.environ.get('CHUNKED_UPLOAD_EXPIRY_HOURS', 24))
+# Unfinished uploads a user may hold at once, and their combined reserved size
+CHUNKED_UPLOAD_MAX_OPEN_PER_USER = int(os.environ.get('CHUNKED_UPLOAD_MAX_OPEN_PER_USER', 4))
+CHUNKED_UPLOAD_MAX_OPEN_BYTES_PER_USER = int(os.environ.get('CHUNKED_UPLOAD_MAX_OPEN_BYTES_PER_USER',
+                                                            40 * 1024 * 1024 * 1024))
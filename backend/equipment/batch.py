@@ -0,0 +1,219 @@
+import hashlib
+import multiprocessing
+import os
+import pickle
+import shutil
+import tempfile
+import time
+import zipfile
+from concurrent.futures import ProcessPoolExecutor, wait
+
+import django
+from django.conf import settings
+from django.db import transaction
+
+from .ingest import REQUIRED_COLUMNS, IngestError, SummaryAccumulator, iter_upload_chunks, upload_format, write_columns
+from .models import EquipmentRecord
+from .pipeline import (DuplicateUploadError, EmptyUploadError, find_duplicate, new_summary, prune_history,
+                       record_columns, save_summary)
+from .reports import warm_report
+from .uploadhandlers import CONTENT_HASH
+
+_parse_pool = None
+
+
+class BatchLimitError(IngestError):
+    pass
+
+
+def parse_pool():
+    """Process pool shared by batch uploads, started on first use.
+
+    Workers are spawned rather than forked: a fork of a threaded server
+    process can inherit locks held by other threads (and open database
+    connections). Each worker sets Django up once, then only runs pandas.
+    """
+    global _parse_pool
+    if _parse_pool is None:
+        _parse_pool = ProcessPoolExecutor(
+            max_workers=max(1, settings.BATCH_UPLOAD_WORKERS),
+            mp_context=multiprocessing.get_context('spawn'),
+            initializer=django.setup,
+        )
+    return _parse_pool
+
+
+def parse_file(path, fmt, chunk_size):
+    """Worker: parse one spooled upload into ``(stats, chunks_path, seconds)``.
+
+    Each chunk's required columns are pickled in turn to ``chunks_path``
+    rather than sent back, so neither the worker nor the parent ever holds
+    more than one chunk of a file; numeric readings stay floats, which
+    pickle far cheaper than object arrays.
+    """
+    started = time.perf_counter()
+    stats = SummaryAccumulator()
+    chunks_path = f'{path}.chunks'
+    with open(path, 'rb') as f, open(chunks_path, 'wb') as out:
+        for chunk in iter_upload_chunks(f, fmt, chunk_size):
+            stats.update(chunk)
+            pickle.dump(chunk[REQUIRED_COLUMNS], out, protocol=pickle.HIGHEST_PROTOCOL)
+    return stats, chunks_path, time.perf_counter() - started
+
+
+def iter_parsed_chunks(chunks_path):
+    """Read back the chunks parse_file pickled, one at a time."""
+    with open(chunks_path, 'rb') as f:
+        while True:
+            try:
+                yield pickle.load(f)
+            except EOFError:
+                return
+
+
+def spool_batch(uploads, directory):
+    """Write the uploaded files, and the accepted members of uploaded ZIPs, into ``directory``.
+
+    Returns ``[(name, path, size, content_hash)]`` in upload order, each
+    file hashed as it is copied. Limits are checked against ZIP headers
+    before anything is extracted.
+    """
+    spooled = []
+    total = 0
+
+    def add(name, source):
+        nonlocal total
+        if len(spooled) >= settings.BATCH_UPLOAD_MAX_FILES:
+            raise BatchLimitError(f'At most {settings.BATCH_UPLOAD_MAX_FILES} files per batch')
+        path = os.path.join(directory, str(len(spooled)))
+        hasher = hashlib.new(CONTENT_HASH)
+        with open(path, 'wb') as out:
+            for block in iter(lambda: source.read(shutil.COPY_BUFSIZE), b''):
+                hasher.update(block)
+                out.write(block)
+        size = os.path.getsize(path)
+        total += size
+        if total > settings.BATCH_UPLOAD_MAX_BYTES:
+            raise BatchLimitError(f'Batch exceeds {settings.BATCH_UPLOAD_MAX_BYTES} bytes')
+        spooled.append((name, path, size, hasher.hexdigest()))
+
+    for upload in uploads:
+        if upload.name.lower().endswith('.zip'):
+            try:
+                archive = zipfile.ZipFile(upload)
+            except zipfile.BadZipFile:
+                raise BatchLimitError(f'{upload.name} is not a valid ZIP archive')
+            with archive:
+                members = [
+                    info for info in archive.infolist()
+                    if not info.is_dir() and upload_format(info.filename)
+                    and not info.filename.startswith('__MACOSX/')
+                ]
+                if total + sum(info.file_size for info in members) > settings.BATCH_UPLOAD_MAX_BYTES:
+                    raise BatchLimitError(f'Batch exceeds {settings.BATCH_UPLOAD_MAX_BYTES} bytes')
+                for info in members:
+                    with archive.open(info) as source:
+                        add(f'{upload.name}/{info.filename}', source)
+        else:
+            add(upload.name, upload)
+    return spooled
+
+
+def process_batch(uploads, owner, combined=False):
+    """Parse many uploads in parallel and persist one summary per file in a single transaction.
+
+    ``combined`` adds one more summary aggregating every file (totals and
+    distribution only; its rows already belong to the per-file summaries).
+    Returns ``(files, combined_summary, seconds)`` where ``files`` carries
+    per-file timing for the response. A file's records are written as soon
+    as its worker finishes, while later files are still parsing. A file the
+    owner already uploaded is answered with its existing summary, like a
+    single upload. A file with missing columns or no rows aborts the whole
+    batch with its name in the error.
+    """
+    started = time.perf_counter()
+    os.makedirs(settings.UPLOAD_SPOOL_DIR, exist_ok=True)
+    with tempfile.TemporaryDirectory(dir=settings.UPLOAD_SPOOL_DIR) as directory:
+        spooled = spool_batch(uploads, directory)
+        if not spooled:
+            raise EmptyUploadError('No data files provided')
+        duplicates = [find_duplicate(owner, digest) for _, _, _, digest in spooled]
+        pool = parse_pool()
+        # A duplicate's rows are already stored; it is only parsed for the combined totals
+        futures = [
+            pool.submit(parse_file, path, upload_format(name), settings.INGEST_CHUNK_ROWS)
+            if combined or duplicate is None else None
+            for (name, path, _, _), duplicate in zip(spooled, duplicates)
+        ]
+        try:
+            with transaction.atomic():
+                files, combined_summary = write_batch(owner, spooled, futures, duplicates, combined)
+        except Exception:
+            running = [future for future in futures if future is not None]
+            for future in running:
+                future.cancel()
+            # The pool is shared, so rather than shutting it down wait for
+            # this batch's running parses, which still use the directory
+            wait(running)
+            raise
+    return files, combined_summary, time.perf_counter() - started
+
+
+def write_batch(owner, spooled, futures, duplicates, combined):
+    """Write each file's records as its worker finishes, a chunk at a time, and save the summaries.
+
+    ``futures`` holds None for a file in ``duplicates`` that needn't be parsed.
+    """
+    files = []
+    totals = SummaryAccumulator()
+    newest = None
+    for (name, _, size, digest), future, duplicate in zip(spooled, futures, duplicates):
+        stats = chunks_path = None
+        if future is not None:
+            try:
+                stats, chunks_path, parse_seconds = future.result()
+            except IngestError as e:
+                raise type(e)(f'{name}: {e}') from e
+            if not stats.count:
+                raise EmptyUploadError(f'{name}: File contains no data rows')
+            totals.merge(stats)
+        if duplicate is None:
+            try:
+                summary = new_summary(owner, digest)
+            except DuplicateUploadError as e:
+                # Earlier in this batch, or saved meanwhile by another upload
+                duplicate = e.summary
+        if duplicate is not None:
+            if chunks_path:
+                os.remove(chunks_path)
+            files.append({'name': name, 'summary': duplicate.pk, 'rows': 0, 'bytes': size, 'duplicate': True})
+            continue
+        rows = write_seconds = 0
+        for chunk in iter_parsed_chunks(chunks_path):
+            written, seconds = write_columns(
+                EquipmentRecord, record_columns(chunk), constants={'summary_id': summary.pk}
+            )
+            rows += written
+            write_seconds += seconds
+        os.remove(chunks_path)
+        newest = save_summary(summary, stats, prune=False, warm=False)
+        files.append({
+            'name': name,
+            'summary': summary.pk,
+            'rows': rows,
+            'bytes': size,
+            'duplicate': False,
+            'parse_seconds': round(parse_seconds, 4),
+            'write_seconds': round(write_seconds, 4),
+            'rows_per_sec': int(rows / parse_seconds) if parse_seconds else None,
+        })
+    combined_summary = None
+    if combined:
+        combined_summary = save_summary(new_summary(owner), totals, prune=False, rollup=False, warm=False)
+        newest = combined_summary
+    # Keep the whole batch even if it is larger than the usual retention
+    prune_history(owner, keep=max(settings.SUMMARY_RETENTION, len(files) + bool(combined)))
+    # Only the newest summary's report can be downloaded, so only it is pre-rendered
+    if newest is not None:
+        transaction.on_commit(lambda: warm_report(newest.id))
+    return files, combined_summary
@@ -0,0 +1,49 @@
+from django.conf import settings
+from django.core.cache import cache
+from rest_framework import status
+from rest_framework.response import Response
+
+from .models import EquipmentSummary
+
+
+def summary_version(user):
+    """Id of the user's newest summary: the only thing that changes what the read views return."""
+    return EquipmentSummary.objects.owned_by(user).newest_first().values_list('id', flat=True).first() or 0
+
+
+def _generation_key(user):
+    return f'equipment:generation:{user.pk}'
+
+
+def invalidate_summary_cache(user):
+    """Drop a user's cached summary/history responses (called after an upload commits)."""
+    try:
+        cache.incr(_generation_key(user))
+    except ValueError:
+        # Nothing cached for this user yet
+        pass
+
+
+def cached_response(request, name, build):
+    """Serve ``build()`` through a per-user response cache with a strong ETag.
+
+    The ETag is derived from the latest summary id, so an unchanged poll is
+    answered with 304 after a single indexed lookup and no serialization.
+    ``build`` returns a Response; its data and status are what get cached.
+    """
+    version = summary_version(request.user)
+    etag = f'"{name}-{version}"'
+    if etag in request.headers.get('If-None-Match', ''):
+        response = Response(status=status.HTTP_304_NOT_MODIFIED)
+    else:
+        generation = cache.get_or_set(_generation_key(request.user), 0, None)
+        key = f'equipment:{name}:{request.user.pk}:{generation}:{version}'
+        cached = cache.get(key)
+        if cached is None:
+            built = build()
+            cached = (built.status_code, built.data)
+            cache.set(key, cached, settings.SUMMARY_CACHE_TIMEOUT)
+        response = Response(cached[1], status=cached[0])
+    response['ETag'] = etag
+    response['Cache-Control'] = 'private, no-cache'
+    return response
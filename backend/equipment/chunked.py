@@ -0,0 +1,132 @@
+import hashlib
+import os
+import uuid
+from datetime import timedelta
+
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.db.models import Count, Sum
+from django.utils import timezone
+
+from .ingest import IngestError
+from .models import ChunkedUpload
+from .uploadhandlers import CONTENT_HASH
+
+# Header carrying the hex SHA-256 of a chunk's bytes
+CHUNK_CHECKSUM_HEADER = 'X-Chunk-SHA256'
+READ_BYTES = 256 * 1024
+
+
+class ChunkError(IngestError):
+    pass
+
+
+def start_upload(owner, file_name, file_size):
+    """Reserve a spool file for a chunked upload and return its ChunkedUpload.
+
+    Each user may hold CHUNKED_UPLOAD_MAX_OPEN_PER_USER unfinished uploads
+    reserving at most CHUNKED_UPLOAD_MAX_OPEN_BYTES_PER_USER between them.
+    """
+    if file_size <= 0:
+        raise ChunkError('file_size must be positive')
+    if file_size > settings.CHUNKED_UPLOAD_MAX_BYTES:
+        raise ChunkError(f'Files are limited to {settings.CHUNKED_UPLOAD_MAX_BYTES} bytes')
+    expire_uploads(owner)
+    with transaction.atomic():
+        # The owner's row serializes their starts, so concurrent ones can't both fit under the caps
+        User.objects.select_for_update().filter(pk=owner.pk).first()
+        held = ChunkedUpload.objects.filter(owner=owner).aggregate(uploads=Count('id'), bytes=Sum('file_size'))
+        if held['uploads'] >= settings.CHUNKED_UPLOAD_MAX_OPEN_PER_USER:
+            raise ChunkError(f'At most {settings.CHUNKED_UPLOAD_MAX_OPEN_PER_USER} chunked uploads may be open '
+                             'at once; finish or delete one first')
+        if (held['bytes'] or 0) + file_size > settings.CHUNKED_UPLOAD_MAX_OPEN_BYTES_PER_USER:
+            raise ChunkError(f'Open chunked uploads are limited to {settings.CHUNKED_UPLOAD_MAX_OPEN_BYTES_PER_USER} '
+                             'bytes in total; finish or delete one first')
+        os.makedirs(settings.UPLOAD_SPOOL_DIR, exist_ok=True)
+        path = os.path.join(settings.UPLOAD_SPOOL_DIR, f'{uuid.uuid4().hex}.upload')
+        with open(path, 'wb') as f:
+            # Sparse until the chunks arrive; each one is written at its own offset
+            f.truncate(file_size)
+        return ChunkedUpload.objects.create(
+            owner=owner,
+            file_name=os.path.basename(file_name)[:255],
+            file_path=path,
+            file_size=file_size,
+            chunk_size=settings.CHUNKED_UPLOAD_CHUNK_BYTES,
+        )
+
+
+def write_chunk(upload, index, stream, checksum):
+    """Verify chunk ``index`` read from ``stream`` against ``checksum`` and write it in place.
+
+    A chunk that is short, long or corrupt is rejected before it touches the
+    file, so the client can simply send it again. Returns the refreshed upload.
+    """
+    if not 0 <= index < upload.total_chunks:
+        raise ChunkError(f'Chunk {index} is out of range (0-{upload.total_chunks - 1})')
+    if not checksum:
+        raise ChunkError(f'{CHUNK_CHECKSUM_HEADER} header is required')
+    expected = min(upload.chunk_size, upload.file_size - index * upload.chunk_size)
+    hasher = hashlib.sha256()
+    data = bytearray()
+    while len(data) <= expected:
+        piece = stream.read(min(READ_BYTES, expected + 1 - len(data)))
+        if not piece:
+            break
+        hasher.update(piece)
+        data += piece
+    if len(data) != expected:
+        raise ChunkError(f'Chunk {index} should be {expected} bytes')
+    if hasher.hexdigest() != checksum.lower():
+        raise ChunkError(f'Chunk {index} failed its checksum')
+
+    with open(upload.file_path, 'r+b') as f:
+        f.seek(index * upload.chunk_size)
+        f.write(data)
+    # Chunks may arrive concurrently, so the acknowledgement is a locked read-modify-write
+    with transaction.atomic():
+        upload = ChunkedUpload.objects.select_for_update().get(pk=upload.pk)
+        if index not in upload.received:
+            upload.received.append(index)
+            upload.save(update_fields=['received', 'updated_at'])
+    return upload
+
+
+def finish_upload(upload):
+    """Check every chunk arrived and return the assembled file's content hash."""
+    missing = upload.missing
+    if missing:
+        raise ChunkError(f'{len(missing)} chunks are missing, starting with chunk {missing[0]}')
+    hasher = hashlib.new(CONTENT_HASH)
+    with open(upload.file_path, 'rb') as f:
+        for block in iter(lambda: f.read(READ_BYTES), b''):
+            hasher.update(block)
+    return hasher.hexdigest()
+
+
+def discard_upload(upload, keep_file=False):
+    if not keep_file:
+        try:
+            os.remove(upload.file_path)
+        except FileNotFoundError:
+            pass
+    upload.delete()
+
+
+def expire_uploads(owner=None):
+    """Drop chunked uploads idle past CHUNKED_UPLOAD_EXPIRY_HOURS, everyone's or only ``owner``'s.
+
+    Uploads locked by a request completing them are skipped. Returns the
+    number dropped.
+    """
+    cutoff = timezone.now() - timedelta(hours=settings.CHUNKED_UPLOAD_EXPIRY_HOURS)
+    uploads = ChunkedUpload.objects.filter(updated_at__lt=cutoff)
+    if owner is not None:
+        uploads = uploads.filter(owner=owner)
+    expired = 0
+    with transaction.atomic():
+        for upload in uploads.select_for_update(skip_locked=True):
+            discard_upload(upload)
+            expired += 1
+    return expired
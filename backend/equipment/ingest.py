@@ -0,0 +1,403 @@
+import csv
+import io
+import os
+import time
+
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.db import connection
+
+from chemflow_stats import (DIGEST_COMPRESSION, NUMERIC_COLUMNS, STATE_VERSION as SUMMARY_STATE_VERSION,
+                            TYPE_AGGREGATES, Accumulator, ColumnStats)
+
+try:
+    import pyarrow as pa
+    import pyarrow.csv as pacsv
+    import pyarrow.parquet as pq
+except ImportError:
+    pa = pacsv = pq = None
+
+# Expected columns: Equipment Name, Type, Flowrate, Pressure, Temperature
+REQUIRED_COLUMNS = ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']
+
+# Accepted upload extensions and the reader each one uses
+UPLOAD_FORMATS = {
+    '.csv': 'csv',
+    '.parquet': 'parquet',
+    '.arrow': 'ipc',
+    '.ipc': 'ipc',
+    '.feather': 'ipc',
+}
+
+
+# Most bytes read while looking for the header line
+MAX_HEADER_BYTES = 64 * 1024
+# Bytes of CSV the pyarrow engine converts per batch
+PYARROW_BLOCK_BYTES = 16 * 1024 * 1024
+# NULL marker in the CSV sent to PostgreSQL's COPY
+COPY_NULL = '\\N'
+
+
+class IngestError(ValueError):
+    """An upload that can't be ingested because of its contents (reported as a 400)."""
+
+
+class MissingColumnsError(IngestError):
+    pass
+
+
+class UnsupportedFormatError(IngestError):
+    pass
+
+
+class InvalidValuesError(IngestError):
+    pass
+
+
+class CsvSchema:
+    """The columns an upload must have and the dtypes to parse them with.
+
+    Only these columns are read, whatever else the export carries. Numeric
+    columns are pinned to ``float_dtype`` (INGEST_FLOAT_DTYPE by default),
+    ``categorical`` columns are read as categories and the rest as strings,
+    so pandas never has to infer a type.
+    """
+
+    def __init__(self, columns, numeric=(), categorical=(), float_dtype=None):
+        self.columns = list(columns)
+        self.numeric = list(numeric)
+        self.categorical = list(categorical)
+        self.float_dtype = float_dtype
+
+    def dtypes(self):
+        float_dtype = self.float_dtype or settings.INGEST_FLOAT_DTYPE
+        return {
+            col: float_dtype if col in self.numeric else 'category' if col in self.categorical else str
+            for col in self.columns
+        }
+
+    def arrow_types(self):
+        float_type = pa.from_numpy_dtype(self.float_dtype or settings.INGEST_FLOAT_DTYPE)
+        return {
+            col: float_type if col in self.numeric
+            else pa.dictionary(pa.int32(), pa.string()) if col in self.categorical else pa.string()
+            for col in self.columns
+        }
+
+    def validate(self, header):
+        missing = [col for col in self.columns if col not in header]
+        if missing:
+            raise MissingColumnsError(f'Missing columns. Required: {self.columns}')
+
+
+EQUIPMENT_SCHEMA = CsvSchema(REQUIRED_COLUMNS, numeric=NUMERIC_COLUMNS, categorical=['Type'])
+
+
+class SummaryAccumulator(Accumulator):
+    """The shared chemflow_stats accumulator, with validated state loading and the summary's derived fields.
+
+    The desktop folds files through the same Accumulator, so a state it
+    sends matches what the server would build from the file.
+    """
+
+    @classmethod
+    def from_state(cls, state):
+        """Rebuild an accumulator from ``to_state()`` output; malformed state raises InvalidValuesError.
+
+        State from a different layout version, or with digests built at a
+        different compression, is rejected rather than silently misread.
+        """
+        if not isinstance(state, dict):
+            raise InvalidValuesError('Invalid summary state: expected an object')
+        expected = (SUMMARY_STATE_VERSION, DIGEST_COMPRESSION)
+        if (state.get('version'), state.get('compression')) != expected:
+            raise InvalidValuesError(
+                f"Summary state version {state.get('version')} with compression {state.get('compression')} "
+                f'is not supported (expected version {expected[0]} with compression {expected[1]}); '
+                'update the client'
+            )
+        accumulator = cls()
+        try:
+            accumulator.count = int(state['count'])
+            for col in NUMERIC_COLUMNS:
+                column = state['columns'][col]
+                accumulator.sums[col] = float(column['sum'])
+                accumulator.non_null[col] = int(column['non_null'])
+                accumulator.column_stats[col] = ColumnStats.from_state(column)
+            types = state['types']
+            if types:
+                frame = pd.DataFrame.from_records(types, columns=['equipment_type', *TYPE_AGGREGATES])
+                frame['equipment_type'] = frame['equipment_type'].astype(str)
+                frame = frame.set_index('equipment_type').astype('float64')
+                frame.index = frame.index.astype(object)
+                frame['count'] = frame['count'].astype('int64')
+                for col in NUMERIC_COLUMNS:
+                    frame[f'{col}_n'] = frame[f'{col}_n'].astype('int64')
+                # Repeated names are folded together like chunks of one file
+                accumulator._fold_types(frame.groupby(level=0, sort=False).agg(TYPE_AGGREGATES))
+        except (KeyError, TypeError, ValueError) as e:
+            raise InvalidValuesError(f'Invalid summary state: {e}')
+        if accumulator.count < 0 or any(n < 0 or n > accumulator.count for n in accumulator.non_null.values()):
+            raise InvalidValuesError('Invalid summary state: counts are inconsistent')
+        return accumulator
+
+    def describe(self):
+        """Extended per-column metrics, keyed by lower-case column name."""
+        return {col.lower(): self.column_stats[col].describe() for col in NUMERIC_COLUMNS}
+
+    def sorted_type_counts(self):
+        # Same ordering as Series.value_counts(): most frequent first
+        return sorted(self.type_counts.items(), key=lambda item: item[1], reverse=True)
+
+    def type_frame(self):
+        """Per-type aggregates as columns: ``equipment_type``, ``count``, ``avg_``/``min_``/``max_<param>``.
+
+        Most frequent type first; means, minimums and maximums are None for a
+        type with no readings of that parameter.
+        """
+        fields = ['equipment_type', 'count'] + [f'{stat}_{col.lower()}' for col in NUMERIC_COLUMNS
+                                                 for stat in ('avg', 'min', 'max')]
+        if self.by_type is None:
+            return pd.DataFrame(columns=fields, dtype=object)
+        frame = self.by_type.sort_values('count', ascending=False, kind='stable')
+        columns = {'equipment_type': frame.index, 'count': frame['count'].astype(int)}
+        for col in NUMERIC_COLUMNS:
+            param = col.lower()
+            with np.errstate(invalid='ignore', divide='ignore'):
+                columns[f'avg_{param}'] = frame[f'{col}_sum'] / frame[f'{col}_n'].where(frame[f'{col}_n'] > 0)
+            columns[f'min_{param}'] = frame[f'{col}_min']
+            columns[f'max_{param}'] = frame[f'{col}_max']
+        breakdown = pd.DataFrame(columns).reset_index(drop=True)[fields].astype(object)
+        return breakdown.where(breakdown.notna(), None)
+
+    def type_breakdown(self):
+        """``type_frame()`` as a list of dicts."""
+        return self.type_frame().to_dict('records')
+
+
+def read_header(file_obj):
+    """Column names from a CSV's first line, leaving the file where it was."""
+    start = file_obj.tell()
+    line = file_obj.readline(MAX_HEADER_BYTES)
+    file_obj.seek(start)
+    if isinstance(line, bytes):
+        line = line.decode('utf-8-sig', errors='replace')
+    return next(csv.reader([line]), [])
+
+
+def iter_csv_chunks(file_obj, chunk_size=None, schema=EQUIPMENT_SCHEMA, engine=None):
+    """Yield DataFrame chunks of at most ``chunk_size`` rows from an uploaded CSV.
+
+    The header line is checked against ``schema`` before the body is
+    touched, so a file with the wrong columns is rejected without parsing.
+    Only the schema's columns are read, with pinned dtypes. ``engine`` is
+    ``'c'`` (pandas) or ``'pyarrow'`` (multi-threaded, batches sized by
+    bytes rather than rows); INGEST_CSV_ENGINE by default.
+    """
+    schema.validate(read_header(file_obj))
+    chunk_size = chunk_size or settings.INGEST_CHUNK_ROWS
+    engine = engine or settings.INGEST_CSV_ENGINE
+    try:
+        if engine == 'pyarrow':
+            yield from _iter_pyarrow_csv(file_obj, schema)
+            return
+        with pd.read_csv(file_obj, usecols=schema.columns, dtype=schema.dtypes(), chunksize=chunk_size) as reader:
+            yield from reader
+    except ValueError as e:
+        if isinstance(e, IngestError):
+            raise
+        raise InvalidValuesError(f'Could not parse file: {e}') from e
+
+
+def _iter_pyarrow_csv(file_obj, schema):
+    if pacsv is None:
+        raise UnsupportedFormatError('The pyarrow CSV engine requires pyarrow')
+    reader = pacsv.open_csv(
+        file_obj,
+        read_options=pacsv.ReadOptions(block_size=PYARROW_BLOCK_BYTES),
+        convert_options=pacsv.ConvertOptions(include_columns=schema.columns, column_types=schema.arrow_types()),
+    )
+    for batch in reader:
+        yield batch.to_pandas()
+
+
+def upload_format(name):
+    """Reader name for an uploaded file name, or None if the extension isn't accepted."""
+    return UPLOAD_FORMATS.get(os.path.splitext(name or '')[1].lower())
+
+
+def local_path(file_obj):
+    """Path of an upload that already lives on disk (so it can be memory-mapped), else None."""
+    if hasattr(file_obj, 'temporary_file_path'):
+        return file_obj.temporary_file_path()
+    if isinstance(file_obj, io.BufferedReader):
+        return file_obj.name
+    return None
+
+
+def iter_columnar_chunks(file_obj, fmt, chunk_size=None):
+    """Yield DataFrame chunks of the required columns from a Parquet or Arrow IPC/Feather upload.
+
+    Only the five required columns are decoded. Files already on disk are
+    memory-mapped, so pages are read lazily rather than copied in up front.
+    The schema is checked before any data is read.
+    """
+    if pa is None:
+        raise UnsupportedFormatError('Parquet and Arrow uploads require pyarrow')
+    chunk_size = chunk_size or settings.INGEST_CHUNK_ROWS
+    path = local_path(file_obj)
+    source = pa.memory_map(path) if path else pa.PythonFile(file_obj, mode='r')
+    with source:
+        if fmt == 'parquet':
+            reader = pq.ParquetFile(source)
+            names = reader.schema_arrow.names
+            batches = lambda: reader.iter_batches(batch_size=chunk_size, columns=REQUIRED_COLUMNS)
+        else:
+            try:
+                reader = pa.ipc.open_file(source)
+                batches = lambda: (reader.get_batch(i).select(REQUIRED_COLUMNS) for i in range(reader.num_record_batches))
+            except pa.ArrowInvalid:
+                # Arrow IPC stream format rather than the (Feather v2) file format
+                source.seek(0)
+                reader = pa.ipc.open_stream(source)
+                batches = lambda: (batch.select(REQUIRED_COLUMNS) for batch in reader)
+            names = reader.schema.names
+
+        EQUIPMENT_SCHEMA.validate(names)
+        for batch in batches():
+            # IPC batches can be larger than a chunk; slicing is zero-copy
+            for start in range(0, batch.num_rows, chunk_size):
+                yield batch.slice(start, chunk_size).to_pandas()
+
+
+def upload_row_count(file_obj, fmt):
+    """Rows in a Parquet or Arrow IPC file on disk, from its footer; None if unknown (CSV, IPC streams)."""
+    path = local_path(file_obj)
+    if fmt == 'csv' or pa is None or not path:
+        return None
+    try:
+        with pa.memory_map(path) as source:
+            if fmt == 'parquet':
+                return pq.ParquetFile(source).metadata.num_rows
+            reader = pa.ipc.open_file(source)
+            return sum(reader.get_batch(i).num_rows for i in range(reader.num_record_batches))
+    except (pa.ArrowInvalid, OSError):
+        # An IPC stream has no footer; a broken file is reported by the reader
+        return None
+
+
+def iter_upload_chunks(file_obj, fmt='csv', chunk_size=None):
+    """Yield DataFrame chunks from an upload in any of the UPLOAD_FORMATS."""
+    if fmt == 'csv':
+        return iter_csv_chunks(file_obj, chunk_size)
+    return iter_columnar_chunks(file_obj, fmt, chunk_size)
+
+
+def accumulate_csv(file_obj, chunk_size=None, engine=None):
+    accumulator = SummaryAccumulator()
+    for chunk in iter_csv_chunks(file_obj, chunk_size, engine=engine):
+        accumulator.update(chunk)
+    return accumulator
+
+
+def write_columns(model, columns, constants=None, batch_size=None):
+    """Insert rows given as equal-length column arrays, ``batch_size`` rows at a time.
+
+    ``columns`` maps field names to NumPy arrays (or anything ``pd.Series``
+    accepts); ``constants`` maps field names to a value shared by every row.
+    PostgreSQL gets a ``COPY ... FROM STDIN`` per batch, other backends a
+    multi-row ``INSERT``. Returns ``(rows, seconds)``.
+    """
+    batch_size = batch_size or settings.INGEST_WRITE_BATCH_ROWS
+    frame, constants, fields = _prepare_columns(model, columns, constants)
+
+    started = time.perf_counter()
+    if connection.vendor == 'postgresql':
+        _copy_frame(model, fields, frame, constants, batch_size)
+    else:
+        _insert_frame(model, fields, frame, constants, batch_size)
+    return len(frame), time.perf_counter() - started
+
+
+def upsert_columns(model, columns, conflict_fields, updates, constants=None, batch_size=None):
+    """``write_columns``, but rows that collide on ``conflict_fields`` are merged instead.
+
+    ``updates`` maps field names to SQL expressions for ``ON CONFLICT DO
+    UPDATE SET``, where the stored row is referenced by table name and the
+    new one as ``EXCLUDED``. Always a multi-row ``INSERT``, as COPY can't
+    resolve conflicts. Returns ``(rows, seconds)``.
+    """
+    batch_size = batch_size or settings.INGEST_WRITE_BATCH_ROWS
+    frame, constants, fields = _prepare_columns(model, columns, constants)
+    qn = connection.ops.quote_name
+    suffix = ' ON CONFLICT ({}) DO UPDATE SET {}'.format(
+        ', '.join(qn(model._meta.get_field(name).column) for name in conflict_fields),
+        ', '.join(f'{qn(model._meta.get_field(name).column)} = {sql}' for name, sql in updates.items()),
+    )
+
+    started = time.perf_counter()
+    _insert_frame(model, fields, frame, constants, batch_size, suffix)
+    return len(frame), time.perf_counter() - started
+
+
+def _prepare_columns(model, columns, constants):
+    frame = pd.DataFrame(columns, copy=False)
+    constants = {
+        name: model._meta.get_field(name).get_db_prep_save(value, connection)
+        for name, value in (constants or {}).items()
+    }
+    fields = [model._meta.get_field(name) for name in list(frame.columns) + list(constants)]
+    return frame, constants, fields
+
+
+def _column_list(model, fields):
+    qn = connection.ops.quote_name
+    return '{} ({})'.format(qn(model._meta.db_table), ', '.join(qn(f.column) for f in fields))
+
+
+def _copy_sql(model, fields):
+    # An unquoted empty field would read as NULL in CSV format, so NULLs get
+    # their own marker, and NOT NULL columns never match it (a name of \N is text)
+    qn = connection.ops.quote_name
+    options = [f"FORMAT csv, NULL '{COPY_NULL}'"]
+    not_null = [qn(f.column) for f in fields if not f.null]
+    if not_null:
+        options.append(f'FORCE_NOT_NULL ({", ".join(not_null)})')
+    return f'COPY {_column_list(model, fields)} FROM STDIN WITH ({", ".join(options)})'
+
+
+def _copy_data(batch):
+    """CSV body for COPY: None/NaN as COPY_NULL, empty strings as empty fields."""
+    return batch.to_csv(header=False, index=False, na_rep=COPY_NULL)
+
+
+def _copy_frame(model, fields, frame, constants, batch_size):
+    sql = _copy_sql(model, fields)
+    with connection.cursor() as cursor:
+        raw = cursor.cursor
+        for start in range(0, len(frame), batch_size):
+            batch = frame.iloc[start:start + batch_size].assign(**constants)
+            data = _copy_data(batch)
+            if hasattr(raw, 'copy'):
+                # psycopg 3
+                with raw.copy(sql) as copy:
+                    copy.write(data)
+            else:
+                raw.copy_expert(sql, io.StringIO(data))
+
+
+def _insert_frame(model, fields, frame, constants, batch_size, suffix=''):
+    # Stay under the backend's bound-parameter limit (999 on old SQLite builds)
+    max_params = connection.features.max_query_params
+    if max_params:
+        batch_size = max(1, min(batch_size, max_params // len(fields)))
+    row_sql = '({})'.format(', '.join(['%s'] * len(fields)))
+    prefix = f'INSERT INTO {_column_list(model, fields)} VALUES '
+    column_values = [frame[name].tolist() for name in frame.columns]
+    constant_values = list(constants.values())
+    with connection.cursor() as cursor:
+        for start in range(0, len(frame), batch_size):
+            rows = list(zip(*(values[start:start + batch_size] for values in column_values)))
+            params = [value for row in rows for value in (*row, *constant_values)]
+            cursor.execute(prefix + ', '.join([row_sql] * len(rows)) + suffix, params)
@@ -0,0 +1,219 @@
+import json
+import os
+import threading
+import time
+import uuid
+from datetime import datetime, timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import close_old_connections, transaction
+from django.db.models import F
+from django.utils import timezone
+
+from .caching import invalidate_summary_cache
+from .chunked import expire_uploads
+from .ingest import IngestError, upload_format
+from .models import UploadJob
+from .pipeline import DuplicateUploadError, process_upload
+
+
+def spool_upload(file_obj, owner, content_hash=''):
+    """Copy an uploaded file to the spool directory and queue a job for it."""
+    os.makedirs(settings.UPLOAD_SPOOL_DIR, exist_ok=True)
+    path = os.path.join(settings.UPLOAD_SPOOL_DIR, f'{uuid.uuid4().hex}.upload')
+    with open(path, 'wb') as out:
+        for chunk in file_obj.chunks():
+            out.write(chunk)
+    return queue_spooled(owner, file_obj.name, path, file_obj.size or 0, content_hash)
+
+
+def queue_spooled(owner, file_name, path, file_size, content_hash=''):
+    """Queue a job for a file already in the spool directory; the worker deletes it when done."""
+    return UploadJob.objects.create(
+        owner=owner,
+        file_name=os.path.basename(file_name)[:255],
+        file_path=path,
+        file_size=file_size,
+        content_hash=content_hash,
+    )
+
+
+def claim_next_job():
+    """Atomically move the oldest queued job to running and return it, or None.
+
+    Jobs abandoned by dead workers are queued again first.
+    """
+    reclaim_stale_jobs()
+    while True:
+        job = UploadJob.objects.filter(status=UploadJob.QUEUED).order_by('created_at').first()
+        if job is None:
+            return None
+        # Only one worker's conditional UPDATE can win the row
+        claimed = UploadJob.objects.filter(pk=job.pk, status=UploadJob.QUEUED).update(
+            status=UploadJob.RUNNING, started_at=timezone.now(), attempts=F('attempts') + 1
+        )
+        if claimed:
+            job.refresh_from_db()
+            return job
+
+
+def claimed(job):
+    """The job's row, only while it is still the claim this worker took."""
+    return UploadJob.objects.filter(pk=job.pk, status=UploadJob.RUNNING, attempts=job.attempts)
+
+
+def last_heartbeat(job):
+    """When the job's worker last proved it was alive: its progress file's mtime, else the claim time."""
+    try:
+        return max(job.started_at, datetime.fromtimestamp(os.path.getmtime(progress_path(job)), tz=dt_timezone.utc))
+    except FileNotFoundError:
+        return job.started_at
+
+
+def reclaim_stale_jobs():
+    """Queue again running jobs whose worker stopped heartbeating, or fail them after UPLOAD_JOB_MAX_ATTEMPTS.
+
+    The dead worker's transaction was rolled back with its connection, so a
+    re-queued job starts over from its spooled file; a failed one's files
+    are deleted. Returns the number of jobs reclaimed.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.UPLOAD_JOB_LEASE_SECONDS)
+    reclaimed = 0
+    for job in UploadJob.objects.filter(status=UploadJob.RUNNING, started_at__lt=cutoff):
+        if last_heartbeat(job) >= cutoff:
+            continue
+        if job.attempts >= settings.UPLOAD_JOB_MAX_ATTEMPTS:
+            fields = {
+                'status': UploadJob.FAILED, 'finished_at': timezone.now(),
+                'error': f'The worker processing this upload stopped responding ({job.attempts} attempts)',
+            }
+        else:
+            fields = {'status': UploadJob.QUEUED, 'started_at': None, 'rows_processed': 0, 'bytes_processed': 0}
+        # Conditional on the claim we looked at, in case another worker reclaimed it first
+        if claimed(job).update(**fields):
+            reclaimed += 1
+            remove_files(progress_path(job), *([job.file_path] if fields['status'] == UploadJob.FAILED else []))
+    return reclaimed
+
+
+def remove_files(*paths):
+    for path in paths:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+
+
+def progress_path(job):
+    return f'{job.file_path}.progress'
+
+
+def load_live_progress(job):
+    """Overlay a running job's counters with the worker's latest progress file.
+
+    The worker ingests inside a single transaction, so per-chunk progress is
+    published through a sidecar file next to the spooled upload rather than
+    through the (not yet committed) database row.
+    """
+    if job.status != UploadJob.RUNNING:
+        return job
+    try:
+        with open(progress_path(job)) as f:
+            live = json.load(f)
+    except (FileNotFoundError, ValueError):
+        return job
+    job.rows_processed = live['rows']
+    job.bytes_processed = live['bytes']
+    return job
+
+
+def write_progress(job, rows, fraction):
+    tmp_path = f'{progress_path(job)}.tmp'
+    with open(tmp_path, 'w') as f:
+        json.dump({'rows': rows, 'bytes': round(fraction * job.file_size) if fraction is not None else 0}, f)
+    os.replace(tmp_path, progress_path(job))
+
+
+class Heartbeat(threading.Thread):
+    """Touches a running job's progress file every UPLOAD_JOB_HEARTBEAT_SECONDS.
+
+    A thread rather than a per-chunk write, so a chunk or a final save that
+    takes a long time doesn't look like a dead worker. The file, not the job
+    row, because the ingest holds the database in one long transaction.
+    """
+
+    def __init__(self, job):
+        super().__init__(name=f'heartbeat-{job.pk}', daemon=True)
+        self.path = progress_path(job)
+        self.stopped = threading.Event()
+
+    def run(self):
+        while not self.stopped.wait(settings.UPLOAD_JOB_HEARTBEAT_SECONDS):
+            try:
+                os.utime(self.path)
+            except FileNotFoundError:
+                pass
+
+    def stop(self):
+        self.stopped.set()
+        self.join()
+
+
+class LostClaim(Exception):
+    """The job was reclaimed from this worker while it ran."""
+
+
+def run_job(job):
+    write_progress(job, 0, 0.0)
+    heartbeat = Heartbeat(job)
+    heartbeat.start()
+    try:
+        # The summary commits together with the job row that reports it, so a
+        # crash in between can't leave a finished summary behind a running
+        # job that a reclaim would then ingest a second time
+        with open(job.file_path, 'rb') as f, transaction.atomic():
+            try:
+                summary = process_upload(f, job.owner,
+                                         lambda stats, fraction: write_progress(job, stats.count, fraction),
+                                         upload_format(job.file_name), job.content_hash)
+            except DuplicateUploadError as e:
+                # The same file was saved meanwhile, by another job or request; the job reports that summary
+                summary = e.summary
+            done = claimed(job).update(
+                status=UploadJob.DONE, summary=summary, finished_at=timezone.now(),
+                rows_processed=summary.total_count, bytes_processed=job.file_size,
+            )
+            if not done:
+                raise LostClaim
+    except LostClaim:
+        # Rolled back; the spooled file now belongs to whoever reclaimed the job
+        heartbeat.stop()
+        return
+    except IngestError as e:
+        error = str(e)
+    except Exception as e:
+        error = f'{type(e).__name__}: {e}'
+    else:
+        error = None
+        invalidate_summary_cache(job.owner)
+    heartbeat.stop()
+    remove_files(job.file_path, progress_path(job))
+    if error is not None:
+        claimed(job).update(status=UploadJob.FAILED, error=error, finished_at=timezone.now())
+
+
+def worker_loop(poll_interval=1.0, once=False):
+    """Process queued jobs until interrupted (or until the queue is empty if ``once``).
+
+    While idle, abandoned chunked uploads of every user are expired.
+    """
+    while True:
+        close_old_connections()
+        job = claim_next_job()
+        if job is not None:
+            run_job(job)
+            continue
+        expire_uploads()
+        if once:
+            return
+        time.sleep(poll_interval)
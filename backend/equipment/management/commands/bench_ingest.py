@@ -0,0 +1,85 @@
+import os
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand
+
+from equipment.ingest import REQUIRED_COLUMNS, CsvSchema, MissingColumnsError, accumulate_csv, iter_csv_chunks, pa
+
+TYPES = ['Pump', 'Valve', 'Compressor', 'Heat Exchanger', 'Reactor', 'Condenser']
+
+
+def write_sample_csv(path, rows, chunk_size=500_000):
+    rng = np.random.default_rng(0)
+    with open(path, 'w', newline='') as f:
+        f.write(','.join(REQUIRED_COLUMNS) + '\n')
+        for start in range(0, rows, chunk_size):
+            n = min(chunk_size, rows - start)
+            pd.DataFrame({
+                'Equipment Name': [f'EQ-{i}' for i in range(start, start + n)],
+                'Type': rng.choice(TYPES, n),
+                'Flowrate': rng.uniform(0, 300, n).round(2),
+                'Pressure': rng.uniform(1, 20, n).round(2),
+                'Temperature': rng.uniform(20, 400, n).round(2),
+            }).to_csv(f, header=False, index=False)
+
+
+def full_read(path):
+    df = pd.read_csv(path)
+    return len(df), df['Flowrate'].mean(), df['Type'].value_counts()
+
+
+def streaming_read(path, engine='c'):
+    with open(path, 'rb') as f:
+        stats = accumulate_csv(f, engine=engine)
+    return stats.count, stats.mean('Flowrate'), stats.type_counts
+
+
+def pyarrow_read(path):
+    return streaming_read(path, engine='pyarrow')
+
+
+def header_reject(path):
+    # A file with the wrong columns is refused after reading one line
+    with open(path, 'rb') as f:
+        try:
+            next(iter_csv_chunks(f, schema=CsvSchema(['Not A Column'])))
+        except MissingColumnsError:
+            pass
+
+
+def measure(func, path):
+    tracemalloc.start()
+    started = time.perf_counter()
+    func(path)
+    elapsed = time.perf_counter() - started
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+class Command(BaseCommand):
+    help = 'Compares time and peak memory of whole-file, chunked and pyarrow CSV ingestion'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[100_000, 1_000_000, 3_000_000])
+
+    def handle(self, *args, **options):
+        self.stdout.write(f"{'rows':>10} {'file MB':>8} {'mode':>10} {'seconds':>8} {'peak MB':>8}")
+        for rows in options['rows']:
+            fd, path = tempfile.mkstemp(suffix='.csv')
+            os.close(fd)
+            try:
+                write_sample_csv(path, rows)
+                size_mb = os.path.getsize(path) / 2**20
+                modes = [('full', full_read), ('streaming', streaming_read), ('reject', header_reject)]
+                if pa is not None:
+                    modes.insert(2, ('pyarrow', pyarrow_read))
+                for mode, func in modes:
+                    elapsed, peak = measure(func, path)
+                    self.stdout.write(f'{rows:>10} {size_mb:>8.1f} {mode:>10} {elapsed:>8.2f} {peak / 2**20:>8.1f}')
+            finally:
+                os.remove(path)
@@ -0,0 +1,55 @@
+import time
+
+import numpy as np
+import pandas as pd
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import connection, transaction
+from django.test.utils import CaptureQueriesContext
+
+from equipment.ingest import SummaryAccumulator
+from equipment.pipeline import new_summary, save_summary
+
+
+def accumulator(types, rows_per_type):
+    rows = types * rows_per_type
+    rng = np.random.default_rng(0)
+    stats = SummaryAccumulator()
+    stats.update(pd.DataFrame({
+        'Equipment Name': [f'EQ-{i}' for i in range(rows)],
+        'Type': [f'Type-{i % types}' for i in range(rows)],
+        'Flowrate': rng.uniform(0, 300, rows),
+        'Pressure': rng.uniform(1, 20, rows),
+        'Temperature': rng.uniform(20, 400, rows),
+    }))
+    return stats
+
+
+class Command(BaseCommand):
+    help = 'Times the summary persistence stage (distribution, rollups, pruning) by number of types (rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--types', type=int, nargs='+', default=[10, 1_000, 50_000])
+        parser.add_argument('--rows-per-type', type=int, default=2)
+        parser.add_argument('--rtt-ms', type=float, default=1.0,
+                            help='Network round-trip added per statement for the remote-database estimate')
+
+    def handle(self, *args, **options):
+        rtt = options['rtt_ms'] / 1000
+        self.stdout.write(f'{connection.vendor}: {"types":>8} {"statements":>10} {"seconds":>8} {"est. remote s":>13}')
+        for types in options['types']:
+            stats = accumulator(types, options['rows_per_type'])
+            with transaction.atomic():
+                owner = User.objects.create_user(f'bench-persist-{types}')
+                # Enough history that the upload also prunes
+                for _ in range(6):
+                    save_summary(new_summary(owner), accumulator(3, 1))
+                summary = new_summary(owner)
+                started = time.perf_counter()
+                with CaptureQueriesContext(connection) as queries:
+                    save_summary(summary, stats)
+                elapsed = time.perf_counter() - started
+                transaction.set_rollback(True)
+            statements = len(queries)
+            self.stdout.write(f'{connection.vendor}: {types:>8} {statements:>10} {elapsed:>8.3f} '
+                              f'{elapsed + statements * rtt:>13.3f}')
@@ -0,0 +1,50 @@
+import os
+import resource
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from equipment.models import EquipmentSummary
+from equipment.reports import render_summary_pdf
+
+
+def synthetic_rows(rows, types):
+    rng = np.random.default_rng(0)
+    for i in range(rows):
+        yield (f'EQ-{i}', f'Type-{i % types}', *rng.uniform(0, 300, 3))
+
+
+class Command(BaseCommand):
+    help = ('Renders synthetic multi-page reports and reports the detail rows actually drawn, time, file size, '
+            'peak traced memory and the process peak RSS')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[1_000, 10_000, 100_000])
+        parser.add_argument('--types', type=int, default=200)
+
+    def handle(self, *args, **options):
+        types = options['types']
+        summary = EquipmentSummary(
+            created_at=timezone.now(), total_count=0,
+            avg_flowrate=0, avg_pressure=0, avg_temperature=0,
+        )
+        distribution = [(f'Type-{i}', i) for i in range(types)]
+        # ru_maxrss is the process high-water mark (KiB on Linux), so sizes run smallest first
+        self.stdout.write(f"{'rows':>8} {'rendered':>9} {'seconds':>8} {'PDF MB':>7} {'peak MB':>8} {'RSS MB':>7}")
+        for rows in sorted(options['rows']):
+            summary.total_count = rows
+            with tempfile.TemporaryFile() as out:
+                tracemalloc.start()
+                started = time.perf_counter()
+                rendered = render_summary_pdf(summary, out, distribution, synthetic_rows(rows, types))
+                elapsed = time.perf_counter() - started
+                _, peak = tracemalloc.get_traced_memory()
+                tracemalloc.stop()
+                size = out.seek(0, os.SEEK_END)
+            rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+            self.stdout.write(f'{rows:>8} {rendered:>9} {elapsed:>8.2f} {size / 2**20:>7.2f} '
+                              f'{peak / 2**20:>8.1f} {rss / 2**10:>7.1f}')
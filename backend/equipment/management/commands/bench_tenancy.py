@@ -0,0 +1,58 @@
+import random
+import time
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from equipment.models import EquipmentSummary
+from equipment.pipeline import prune_history
+
+
+def timed(func, repeat):
+    started = time.perf_counter()
+    for _ in range(repeat):
+        func()
+    return (time.perf_counter() - started) / repeat * 1000
+
+
+class Command(BaseCommand):
+    help = 'Times per-user latest/history lookups and pruning with many users (changes are rolled back)'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=10_000)
+        parser.add_argument('--history', type=int, default=6, help='Summaries per user (one more than is kept)')
+        parser.add_argument('--samples', type=int, default=500)
+
+    def handle(self, *args, **options):
+        with transaction.atomic():
+            self.run(options['users'], options['history'], options['samples'])
+            transaction.set_rollback(True)
+
+    def run(self, users, history, samples):
+        started = time.perf_counter()
+        User.objects.bulk_create(User(username=f'bench-tenant-{i}') for i in range(users))
+        owners = list(User.objects.filter(username__startswith='bench-tenant-'))
+        EquipmentSummary.objects.bulk_create(
+            (
+                EquipmentSummary(owner=owner, total_count=1, avg_flowrate=0, avg_pressure=0,
+                                 avg_temperature=0, distribution_json=[])
+                for owner in owners for _ in range(history)
+            ),
+            batch_size=5_000,
+        )
+        self.stdout.write(f'Seeded {users} users x {history} summaries in {time.perf_counter() - started:.1f}s')
+
+        sample = random.Random(0).sample(owners, min(samples, len(owners)))
+        queries = {
+            'latest': lambda owner: EquipmentSummary.objects.denormalized().owned_by(owner).newest_first().first(),
+            'last 5': lambda owner: list(EquipmentSummary.objects.owned_by(owner).newest_first()[:5]),
+            'prune': prune_history,
+        }
+        for name, query in queries.items():
+            per_call = timed(lambda: [query(owner) for owner in sample], 1) / len(sample)
+            self.stdout.write(f'{name:>8}: {per_call:.3f} ms per user')
+
+        latest = EquipmentSummary.objects.denormalized().owned_by(sample[0]).newest_first()[:1]
+        self.stdout.write('Plan for per-user latest:')
+        self.stdout.write(latest.explain())
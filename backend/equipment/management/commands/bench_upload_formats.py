@@ -0,0 +1,125 @@
+import multiprocessing
+import os
+import resource
+import shutil
+import tempfile
+import time
+
+import numpy as np
+import pandas as pd
+from django.core.management.base import BaseCommand, CommandError
+
+from equipment.ingest import SummaryAccumulator, iter_upload_chunks, pa, pq, upload_format
+
+TYPES = ['Pump', 'Valve', 'Compressor', 'Heat Exchanger', 'Reactor', 'Condenser']
+FORMATS = ['csv', 'parquet', 'arrow', 'feather']
+
+
+def sample_frames(rows, extra_columns, chunk_size=500_000):
+    rng = np.random.default_rng(0)
+    for start in range(0, rows, chunk_size):
+        n = min(chunk_size, rows - start)
+        frame = pd.DataFrame({
+            'Equipment Name': [f'EQ-{i}' for i in range(start, start + n)],
+            'Type': rng.choice(TYPES, n),
+            'Flowrate': rng.uniform(0, 300, n).round(2),
+            'Pressure': rng.uniform(1, 20, n).round(2),
+            'Temperature': rng.uniform(20, 400, n).round(2),
+        })
+        for i in range(extra_columns):
+            frame[f'Extra {i}'] = rng.uniform(0, 1, n).round(4)
+        yield frame
+
+
+def write_sample(path, fmt, rows, extra_columns):
+    """Write the same generated rows as CSV, Parquet, Arrow IPC or Feather (LZ4 IPC)."""
+    frames = sample_frames(rows, extra_columns)
+    if fmt == 'csv':
+        with open(path, 'w', newline='') as f:
+            for i, frame in enumerate(frames):
+                frame.to_csv(f, header=i == 0, index=False)
+        return
+    writer = None
+    try:
+        for frame in frames:
+            table = pa.Table.from_pandas(frame, preserve_index=False)
+            if writer is None:
+                if fmt == 'parquet':
+                    writer = pq.ParquetWriter(path, table.schema)
+                else:
+                    options = pa.ipc.IpcWriteOptions(compression='lz4' if fmt == 'feather' else None)
+                    writer = pa.ipc.new_file(path, table.schema, options=options)
+            writer.write_table(table)
+    finally:
+        if writer is not None:
+            writer.close()
+
+
+def peak_rss():
+    """High-water RSS in bytes of this process image.
+
+    ru_maxrss survives exec, so a spawned child would report the parent's
+    peak; Linux's VmHWM starts afresh with the new image.
+    """
+    try:
+        with open('/proc/self/status') as f:
+            for line in f:
+                if line.startswith('VmHWM:'):
+                    return int(line.split()[1]) * 1024
+    except OSError:
+        pass
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def parse(path, chunk_size, results):
+    """Runs in a fresh child so the peak RSS is this parse's alone."""
+    # The baseline is the interpreter plus Django, pandas and pyarrow imports
+    baseline = peak_rss()
+    started = time.perf_counter()
+    stats = SummaryAccumulator()
+    with open(path, 'rb') as f:
+        for chunk in iter_upload_chunks(f, upload_format(path), chunk_size):
+            stats.update(chunk)
+    elapsed = time.perf_counter() - started
+    results.put((elapsed, baseline, peak_rss(),
+                 stats.count, stats.mean('Flowrate'), stats.sorted_type_counts()))
+
+
+class Command(BaseCommand):
+    help = 'Compares parse time and peak RSS of CSV, Parquet, Arrow IPC and Feather uploads'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--rows', type=int, nargs='+', default=[1_000_000, 10_000_000])
+        parser.add_argument('--formats', nargs='+', choices=FORMATS, default=FORMATS)
+        parser.add_argument('--extra-columns', type=int, default=0,
+                            help='Unused columns added to every file to show the effect of projection')
+        parser.add_argument('--chunk-size', type=int, default=100_000)
+
+    def handle(self, *args, **options):
+        if pa is None:
+            raise CommandError('pyarrow is not installed')
+        # spawn, not fork: a forked child would start with this process's RSS
+        context = multiprocessing.get_context('spawn')
+        self.stdout.write(f"{'rows':>10} {'format':>8} {'file MB':>8} {'seconds':>8} {'rows/s':>10} {'base RSS MB':>12} {'peak RSS MB':>12}")
+        for rows in options['rows']:
+            directory = tempfile.mkdtemp()
+            try:
+                reference = None
+                for fmt in options['formats']:
+                    path = os.path.join(directory, f'sample.{fmt}')
+                    write_sample(path, fmt, rows, options['extra_columns'])
+                    results = context.Queue()
+                    child = context.Process(target=parse, args=(path, options['chunk_size'], results))
+                    child.start()
+                    elapsed, baseline, peak, count, mean, type_counts = results.get()
+                    child.join()
+                    size_mb = os.path.getsize(path) / 2**20
+                    self.stdout.write(f'{rows:>10} {fmt:>8} {size_mb:>8.1f} {elapsed:>8.2f} '
+                                      f'{int(rows / elapsed):>10} {baseline / 2**20:>12.1f} {peak / 2**20:>12.1f}')
+                    if reference is None:
+                        reference = (count, mean, type_counts)
+                    elif (count, round(mean, 6), type_counts) != (reference[0], round(reference[1], 6), reference[2]):
+                        self.stderr.write(f'{fmt} stats differ from {options["formats"][0]}')
+                    os.remove(path)
+            finally:
+                shutil.rmtree(directory)
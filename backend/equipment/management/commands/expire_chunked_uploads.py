@@ -0,0 +1,10 @@
+from django.core.management.base import BaseCommand
+
+from equipment.chunked import expire_uploads
+
+
+class Command(BaseCommand):
+    help = 'Discards chunked uploads idle past CHUNKED_UPLOAD_EXPIRY_HOURS (the upload workers also do this when idle)'
+
+    def handle(self, *args, **options):
+        self.stdout.write(f'Expired {expire_uploads()} chunked uploads')
@@ -0,0 +1,39 @@
+import multiprocessing
+from concurrent.futures import ProcessPoolExecutor
+
+import django
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from equipment.jobs import worker_loop
+
+
+class Command(BaseCommand):
+    help = 'Runs a pool of worker processes that process queued upload jobs'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--workers', type=int, default=multiprocessing.cpu_count())
+        parser.add_argument('--poll-interval', type=float, default=1.0)
+        parser.add_argument('--once', action='store_true', help='Exit once the queue is empty')
+
+    def handle(self, *args, **options):
+        workers = max(1, options['workers'])
+        if workers == 1:
+            worker_loop(options['poll_interval'], options['once'])
+            return
+
+        # Spawned, like the batch parse pool, so no worker inherits this
+        # process's connections or locks; each sets Django up for itself
+        connections.close_all()
+        pool = ProcessPoolExecutor(
+            max_workers=workers, mp_context=multiprocessing.get_context('spawn'), initializer=django.setup,
+        )
+        futures = [pool.submit(worker_loop, options['poll_interval'], options['once']) for _ in range(workers)]
+        self.stdout.write(f'Started {workers} upload workers')
+        try:
+            for future in futures:
+                future.result()
+        except KeyboardInterrupt:
+            pool.shutdown(wait=False, cancel_futures=True)
+        else:
+            pool.shutdown()
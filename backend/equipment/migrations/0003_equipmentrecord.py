@@ -0,0 +1,29 @@
+# Generated by Django 6.0.2 on 2026-10-17 04:30
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0002_uploadjob'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='EquipmentRecord',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('name', models.CharField(max_length=255)),
+                ('equipment_type', models.CharField(max_length=100)),
+                ('flowrate', models.FloatField(null=True)),
+                ('pressure', models.FloatField(null=True)),
+                ('temperature', models.FloatField(null=True)),
+                ('summary', models.ForeignKey(db_index=False, on_delete=django.db.models.deletion.CASCADE, related_name='equipment', to='equipment.equipmentsummary')),
+            ],
+            options={
+                'indexes': [models.Index(fields=['summary', 'equipment_type'], name='record_summary_type_idx'), models.Index(fields=['summary', 'name'], name='record_summary_name_idx')],
+            },
+        ),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 6.0.2 on 2026-10-17 04:32
+
+from django.db import migrations, models
+
+
+def fill_distribution_json(apps, schema_editor):
+    EquipmentSummary = apps.get_model('equipment', 'EquipmentSummary')
+    for summary in EquipmentSummary.objects.prefetch_related('type_distribution'):
+        summary.distribution_json = [
+            {'equipment_type': dist.equipment_type, 'count': dist.count}
+            for dist in summary.type_distribution.all()
+        ]
+        summary.save(update_fields=['distribution_json'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0003_equipmentrecord'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipmentsummary',
+            name='distribution_json',
+            field=models.JSONField(blank=True, null=True),
+        ),
+        migrations.RunPython(fill_distribution_json, migrations.RunPython.noop),
+    ]
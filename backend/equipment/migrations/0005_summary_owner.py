@@ -0,0 +1,25 @@
+# Generated by Django 6.0.2 on 2026-10-17 04:33
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0004_summary_distribution_json'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipmentsummary',
+            name='owner',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, related_name='equipment_summaries', to=settings.AUTH_USER_MODEL),
+        ),
+        migrations.AddIndex(
+            model_name='equipmentsummary',
+            index=models.Index(fields=['owner', '-created_at', '-id'], name='summary_owner_created_idx'),
+        ),
+    ]
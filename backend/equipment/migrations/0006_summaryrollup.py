@@ -0,0 +1,41 @@
+# Generated by Django 6.0.2 on 2026-10-17 04:36
+
+import django.db.models.deletion
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0005_summary_owner'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='SummaryRollup',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('granularity', models.CharField(choices=[('hour', 'Hourly'), ('day', 'Daily')], max_length=4)),
+                ('bucket_start', models.DateTimeField()),
+                ('equipment_type', models.CharField(blank=True, max_length=100)),
+                ('uploads', models.IntegerField(default=0)),
+                ('count', models.BigIntegerField(default=0)),
+                ('flowrate_mean', models.FloatField(null=True)),
+                ('flowrate_min', models.FloatField(null=True)),
+                ('flowrate_max', models.FloatField(null=True)),
+                ('pressure_mean', models.FloatField(null=True)),
+                ('pressure_min', models.FloatField(null=True)),
+                ('pressure_max', models.FloatField(null=True)),
+                ('temperature_mean', models.FloatField(null=True)),
+                ('temperature_min', models.FloatField(null=True)),
+                ('temperature_max', models.FloatField(null=True)),
+                ('owner', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='summary_rollups', to=settings.AUTH_USER_MODEL)),
+            ],
+            options={
+                'ordering': ['bucket_start'],
+                'constraints': [models.UniqueConstraint(fields=('owner', 'granularity', 'equipment_type', 'bucket_start'), name='rollup_unique_bucket')],
+            },
+        ),
+    ]
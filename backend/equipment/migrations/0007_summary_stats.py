@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-17 04:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0006_summaryrollup'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipmentsummary',
+            name='stats',
+            field=models.JSONField(blank=True, null=True),
+        ),
+    ]
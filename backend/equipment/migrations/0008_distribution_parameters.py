@@ -0,0 +1,58 @@
+# Generated by Django 6.0.2 on 2026-10-17 04:48
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0007_summary_stats'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipmenttypedistribution',
+            name='avg_flowrate',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='equipmenttypedistribution',
+            name='avg_pressure',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='equipmenttypedistribution',
+            name='avg_temperature',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='equipmenttypedistribution',
+            name='max_flowrate',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='equipmenttypedistribution',
+            name='max_pressure',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='equipmenttypedistribution',
+            name='max_temperature',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='equipmenttypedistribution',
+            name='min_flowrate',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='equipmenttypedistribution',
+            name='min_pressure',
+            field=models.FloatField(null=True),
+        ),
+        migrations.AddField(
+            model_name='equipmenttypedistribution',
+            name='min_temperature',
+            field=models.FloatField(null=True),
+        ),
+    ]
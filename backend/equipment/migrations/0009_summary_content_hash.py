@@ -0,0 +1,29 @@
+# Generated by Django 6.0.2 on 2026-10-17 04:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0008_distribution_parameters'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='equipmentsummary',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddField(
+            model_name='uploadjob',
+            name='content_hash',
+            field=models.CharField(blank=True, default='', max_length=64),
+        ),
+        migrations.AddIndex(
+            model_name='equipmentsummary',
+            index=models.Index(fields=['owner', 'content_hash'], name='summary_owner_hash_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.0.2 on 2026-10-17 05:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0010_chunkedupload'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='uploadjob',
+            name='attempts',
+            field=models.IntegerField(default=0),
+        ),
+    ]
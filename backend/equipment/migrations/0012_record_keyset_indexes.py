@@ -0,0 +1,49 @@
+# Generated by Django 6.0.2 on 2026-10-17 05:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0011_uploadjob_attempts'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='equipmentrecord',
+            name='record_summary_type_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='equipmentrecord',
+            name='record_summary_name_idx',
+        ),
+        migrations.AddIndex(
+            model_name='equipmentrecord',
+            index=models.Index(fields=['summary', 'id'], name='record_summary_id_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipmentrecord',
+            index=models.Index(fields=['summary', 'equipment_type', 'id'], name='record_summary_type_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipmentrecord',
+            index=models.Index(fields=['summary', 'name', 'id'], name='record_summary_name_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipmentrecord',
+            index=models.Index(fields=['summary', 'flowrate', 'id'], name='record_summary_flowrate_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipmentrecord',
+            index=models.Index(fields=['summary', 'pressure', 'id'], name='record_summary_pressure_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipmentrecord',
+            index=models.Index(fields=['summary', 'temperature', 'id'], name='record_summary_temp_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='equipmentrecord',
+            index=models.Index(fields=['summary', 'name'], name='record_summary_name_like_idx', opclasses=['int8_ops', 'varchar_pattern_ops']),
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 6.0.2 on 2026-10-17 05:39
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_parameter_counts(apps, schema_editor):
+    # Readings weren't counted before; the row count is the closest weight for existing buckets
+    SummaryRollup = apps.get_model('equipment', 'SummaryRollup')
+    for param in ('flowrate', 'pressure', 'temperature'):
+        SummaryRollup.objects.filter(**{f'{param}_mean__isnull': False}).update(**{f'{param}_n': F('count')})
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0012_record_keyset_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='summaryrollup',
+            name='flowrate_n',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='summaryrollup',
+            name='pressure_n',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='summaryrollup',
+            name='temperature_n',
+            field=models.BigIntegerField(default=0),
+        ),
+        migrations.RunPython(fill_parameter_counts, migrations.RunPython.noop),
+    ]
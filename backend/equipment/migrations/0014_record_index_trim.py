@@ -0,0 +1,33 @@
+# Generated by Django 6.0.2 on 2026-10-17 05:45
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0013_rollup_parameter_counts'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='equipmentrecord',
+            name='record_summary_name_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='equipmentrecord',
+            name='record_summary_flowrate_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='equipmentrecord',
+            name='record_summary_pressure_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='equipmentrecord',
+            name='record_summary_temp_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='equipmentrecord',
+            name='record_summary_name_like_idx',
+        ),
+    ]
@@ -0,0 +1,37 @@
+# Generated by Django 6.0.2 on 2026-10-17 05:51
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Max
+
+
+def forget_older_duplicates(apps, schema_editor):
+    # Uploads that raced each other left several summaries of one file; the newest keeps the hash
+    EquipmentSummary = apps.get_model('equipment', 'EquipmentSummary')
+    repeated = (
+        EquipmentSummary.objects.exclude(content_hash='').values('owner_id', 'content_hash')
+        .annotate(copies=Count('id'), newest=Max('id')).filter(copies__gt=1)
+    )
+    for group in repeated:
+        (EquipmentSummary.objects.filter(owner_id=group['owner_id'], content_hash=group['content_hash'])
+         .exclude(id=group['newest']).update(content_hash=''))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('equipment', '0014_record_index_trim'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(forget_older_duplicates, migrations.RunPython.noop),
+        migrations.RemoveIndex(
+            model_name='equipmentsummary',
+            name='summary_owner_hash_idx',
+        ),
+        migrations.AddConstraint(
+            model_name='equipmentsummary',
+            constraint=models.UniqueConstraint(condition=models.Q(('content_hash', ''), _negated=True), fields=('owner', 'content_hash'), name='summary_owner_hash_uniq'),
+        ),
+    ]
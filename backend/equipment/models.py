@@ -1,14 +1,57 @@
+import math
+import uuid
+
+from django.contrib.auth.models import User
 from django.db import models
+from django.utils import timezone
+
+class EquipmentSummaryQuerySet(models.QuerySet):
+    def with_distribution(self):
+        return self.prefetch_related('type_distribution')
+
+    def denormalized(self):
+        """Skip the distribution prefetch; serializers read ``distribution_json`` instead."""
+        return self.prefetch_related(None)
+
+    def owned_by(self, user):
+        return self.filter(owner=user)
+
+    def newest_first(self):
+        # Matches the (owner, -created_at, -id) index, so per-user "latest" / "last N" are index scans
+        return self.order_by('-created_at', '-id')
+
+class EquipmentSummaryManager(models.Manager.from_queryset(EquipmentSummaryQuerySet)):
+    # Every summary read fetches its distribution in one extra query instead of one per summary
+    def get_queryset(self):
+        return super().get_queryset().with_distribution()
 
 class EquipmentSummary(models.Model):
+    # Nullable only for summaries uploaded before ownership existed
+    owner = models.ForeignKey(User, null=True, related_name='equipment_summaries', on_delete=models.CASCADE)
     created_at = models.DateTimeField(auto_now_add=True)
     total_count = models.IntegerField()
     avg_flowrate = models.FloatField()
     avg_pressure = models.FloatField()
     avg_temperature = models.FloatField()
+    # Serialized type_distribution, so single-summary reads need no join or prefetch
+    distribution_json = models.JSONField(null=True, blank=True)
+    # Per-parameter count/mean/variance/stddev/min/max/percentiles; null for older uploads
+    stats = models.JSONField(null=True, blank=True)
+    # SHA-256 of the uploaded file, so a re-upload returns this summary; blank for older uploads
+    content_hash = models.CharField(max_length=64, blank=True, default='')
+
+    objects = EquipmentSummaryManager()
 
     class Meta:
         ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['owner', '-created_at', '-id'], name='summary_owner_created_idx'),
+        ]
+        constraints = [
+            # One summary per file and owner, so concurrent uploads of a file can't both be ingested
+            models.UniqueConstraint(fields=['owner', 'content_hash'], condition=~models.Q(content_hash=''),
+                                    name='summary_owner_hash_uniq'),
+        ]
 
     def __str__(self):
         return f"Summary {self.created_at}"
@@ -17,6 +60,174 @@ class EquipmentTypeDistribution(models.Model):
     summary = models.ForeignKey(EquipmentSummary, related_name='type_distribution', on_delete=models.CASCADE)
     equipment_type = models.CharField(max_length=100)
     count = models.IntegerField()
+    # Per-type readings; null when the type has none (or for older uploads)
+    avg_flowrate = models.FloatField(null=True)
+    min_flowrate = models.FloatField(null=True)
+    max_flowrate = models.FloatField(null=True)
+    avg_pressure = models.FloatField(null=True)
+    min_pressure = models.FloatField(null=True)
+    max_pressure = models.FloatField(null=True)
+    avg_temperature = models.FloatField(null=True)
+    min_temperature = models.FloatField(null=True)
+    max_temperature = models.FloatField(null=True)
 
     def __str__(self):
         return f"{self.equipment_type}: {self.count}"
+
+class EquipmentRecord(models.Model):
+    """One row of an uploaded CSV, kept so the tables can drill into an upload."""
+    # The composite indexes below lead with summary, so the FK needs no index of its own
+    summary = models.ForeignKey(EquipmentSummary, related_name='equipment', on_delete=models.CASCADE, db_index=False)
+    name = models.CharField(max_length=255)
+    equipment_type = models.CharField(max_length=100)
+    flowrate = models.FloatField(null=True)
+    pressure = models.FloatField(null=True)
+    temperature = models.FloatField(null=True)
+
+    class Meta:
+        # Only the scans the tables page through: an upload in id order, whole
+        # or filtered to one type. Other orderings sort the upload's rows found
+        # by the first; an index per sortable column cost more on every ingest
+        # than it saved on the rarely sorted views
+        indexes = [
+            models.Index(fields=['summary', 'id'], name='record_summary_id_idx'),
+            models.Index(fields=['summary', 'equipment_type', 'id'], name='record_summary_type_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.equipment_type})"
+
+class SummaryRollup(models.Model):
+    """Hourly or daily downsample of a user's uploads, per equipment type.
+
+    Every upload is folded in as it is saved, so trends survive after the raw
+    summaries are pruned. ``equipment_type`` is blank for the all-types row.
+    """
+    HOUR = 'hour'
+    DAY = 'day'
+    GRANULARITY_CHOICES = [
+        (HOUR, 'Hourly'),
+        (DAY, 'Daily'),
+    ]
+    PARAMETERS = ['flowrate', 'pressure', 'temperature']
+
+    owner = models.ForeignKey(User, related_name='summary_rollups', on_delete=models.CASCADE)
+    granularity = models.CharField(max_length=4, choices=GRANULARITY_CHOICES)
+    bucket_start = models.DateTimeField()
+    equipment_type = models.CharField(max_length=100, blank=True)
+    uploads = models.IntegerField(default=0)
+    count = models.BigIntegerField(default=0)
+    flowrate_mean = models.FloatField(null=True)
+    # Readings behind flowrate_mean (blank cells excluded), its weight when buckets merge
+    flowrate_n = models.BigIntegerField(default=0)
+    flowrate_min = models.FloatField(null=True)
+    flowrate_max = models.FloatField(null=True)
+    pressure_mean = models.FloatField(null=True)
+    pressure_n = models.BigIntegerField(default=0)
+    pressure_min = models.FloatField(null=True)
+    pressure_max = models.FloatField(null=True)
+    temperature_mean = models.FloatField(null=True)
+    temperature_n = models.BigIntegerField(default=0)
+    temperature_min = models.FloatField(null=True)
+    temperature_max = models.FloatField(null=True)
+
+    class Meta:
+        ordering = ['bucket_start']
+        constraints = [
+            models.UniqueConstraint(
+                fields=['owner', 'granularity', 'equipment_type', 'bucket_start'],
+                name='rollup_unique_bucket',
+            ),
+        ]
+
+    def __str__(self):
+        return f"{self.granularity} {self.bucket_start} {self.equipment_type or 'all'}"
+
+class UploadJob(models.Model):
+    """An upload spooled to disk and waiting for (or being processed by) a worker.
+
+    The table doubles as the work queue: workers claim the oldest queued job
+    with a conditional UPDATE, so no external broker is needed. A running
+    job whose worker stops heartbeating is handed back to the queue.
+    """
+    QUEUED = 'queued'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (QUEUED, 'Queued'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(User, related_name='upload_jobs', on_delete=models.CASCADE)
+    file_name = models.CharField(max_length=255)
+    file_path = models.CharField(max_length=500)
+    file_size = models.BigIntegerField(default=0)
+    content_hash = models.CharField(max_length=64, blank=True, default='')
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=QUEUED)
+    # Times a worker has claimed the job; more than one means an earlier worker died
+    attempts = models.IntegerField(default=0)
+    # Estimated from rows read for memory-mapped Parquet/Arrow input
+    bytes_processed = models.BigIntegerField(default=0)
+    rows_processed = models.BigIntegerField(default=0)
+    summary = models.ForeignKey(EquipmentSummary, null=True, blank=True, related_name='+', on_delete=models.SET_NULL)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(null=True, blank=True)
+    finished_at = models.DateTimeField(null=True, blank=True)
+
+    class Meta:
+        ordering = ['-created_at']
+        indexes = [
+            models.Index(fields=['status', 'created_at'], name='uploadjob_queue_idx'),
+        ]
+
+    def __str__(self):
+        return f"{self.file_name} ({self.status})"
+
+    @property
+    def progress(self):
+        if self.status == self.DONE:
+            return 100.0
+        if not self.file_size:
+            return 0.0
+        return round(min(self.bytes_processed / self.file_size, 1) * 100, 1)
+
+    @property
+    def rows_per_sec(self):
+        if not self.started_at:
+            return None
+        end = self.finished_at or timezone.now()
+        elapsed = (end - self.started_at).total_seconds()
+        return round(self.rows_processed / elapsed) if elapsed > 0 else None
+
+class ChunkedUpload(models.Model):
+    """A large upload sent as numbered, checksummed chunks and assembled in the spool directory.
+
+    A dropped connection only costs the chunk in flight: the client asks
+    which chunks were acknowledged and sends the rest.
+    """
+    id = models.UUIDField(primary_key=True, default=uuid.uuid4, editable=False)
+    owner = models.ForeignKey(User, related_name='chunked_uploads', on_delete=models.CASCADE)
+    file_name = models.CharField(max_length=255)
+    file_path = models.CharField(max_length=500)
+    file_size = models.BigIntegerField()
+    chunk_size = models.IntegerField()
+    # Acknowledged chunk numbers
+    received = models.JSONField(default=list)
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    def __str__(self):
+        return f"{self.file_name} ({len(self.received)}/{self.total_chunks} chunks)"
+
+    @property
+    def total_chunks(self):
+        return math.ceil(self.file_size / self.chunk_size)
+
+    @property
+    def missing(self):
+        return sorted(set(range(self.total_chunks)) - set(self.received))
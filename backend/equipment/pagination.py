@@ -0,0 +1,56 @@
+import base64
+import json
+
+from django.db.models import F, Q
+from rest_framework.exceptions import NotFound
+
+
+def encode_cursor(value, pk):
+    raw = json.dumps([value, pk]).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip('=')
+
+
+def decode_cursor(cursor):
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        value, pk = json.loads(base64.urlsafe_b64decode(padded))
+        return value, int(pk)
+    except (TypeError, ValueError):
+        raise NotFound('Invalid cursor')
+
+
+def keyset_order(queryset, ordering):
+    """Order by ``ordering`` (a field, '-' for descending) then id, nulls last ascending and first descending.
+
+    That is PostgreSQL's own null placement, so an index on (summary, field,
+    id), should one be added, serves the scan in either direction.
+    """
+    field = ordering.lstrip('-')
+    descending = ordering.startswith('-')
+    if field == 'id':
+        return queryset.order_by(ordering)
+    column = F(field).desc(nulls_first=True) if descending else F(field).asc(nulls_last=True)
+    return queryset.order_by(column, '-id' if descending else 'id')
+
+
+def after_cursor(queryset, ordering, cursor):
+    """Rows strictly after ``cursor`` in keyset_order(ordering)."""
+    queryset = keyset_order(queryset, ordering)
+    if not cursor:
+        return queryset
+    value, pk = decode_cursor(cursor)
+    field = ordering.lstrip('-')
+    descending = ordering.startswith('-')
+    after_id = Q(id__lt=pk) if descending else Q(id__gt=pk)
+    if field == 'id':
+        return queryset.filter(after_id)
+    if value is None:
+        # Nulls come last ascending, so only later nulls follow; descending, every value does
+        if descending:
+            return queryset.filter(Q(**{f'{field}__isnull': True}) & after_id | Q(**{f'{field}__isnull': False}))
+        return queryset.filter(Q(**{f'{field}__isnull': True}) & after_id)
+    beyond = Q(**{f'{field}__lt' if descending else f'{field}__gt': value})
+    tied = Q(**{field: value}) & after_id
+    if descending:
+        return queryset.filter(beyond | tied)
+    return queryset.filter(beyond | tied | Q(**{f'{field}__isnull': True}))
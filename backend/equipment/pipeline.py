@@ -0,0 +1,200 @@
+import os
+
+from django.conf import settings
+from django.db import IntegrityError, connection, models, transaction
+
+from .ingest import IngestError, SummaryAccumulator, iter_upload_chunks, upload_row_count, write_columns
+from .models import EquipmentRecord, EquipmentSummary, EquipmentTypeDistribution
+from .reports import warm_report
+from .rollups import fold_summary
+
+
+# Most stale summaries removed per upload; each upload adds one, so a few suffice
+PRUNE_BATCH = 100
+
+
+class EmptyUploadError(IngestError):
+    pass
+
+
+class DuplicateUploadError(Exception):
+    """The owner already has a summary of this file; it is ``summary``."""
+
+    def __init__(self, summary):
+        super().__init__(f'Already uploaded as summary {summary.pk}')
+        self.summary = summary
+
+
+def record_columns(chunk):
+    """EquipmentRecord column arrays for one parsed chunk."""
+    columns = {
+        'name': chunk['Equipment Name'].astype(object).fillna('').astype(str).str.slice(0, 255),
+        'equipment_type': chunk['Type'].astype(object).fillna('').astype(str).str.slice(0, 100),
+    }
+    for field, col in (('flowrate', 'Flowrate'), ('pressure', 'Pressure'), ('temperature', 'Temperature')):
+        values = chunk[col]
+        # Missing readings are stored as NULL rather than NaN
+        columns[field] = values.astype(object).where(values.notna(), None)
+    return columns
+
+
+def new_summary(owner, content_hash=''):
+    """Placeholder summary that records can point at while a file is ingested.
+
+    Created before any rows are written, so it claims ``content_hash``: a
+    concurrent upload of the same file waits on the unique constraint until
+    this one commits, then raises DuplicateUploadError with its summary.
+    """
+    try:
+        # The savepoint confines the unique violation, so any other integrity error is a real failure
+        with transaction.atomic():
+            return EquipmentSummary.objects.create(
+                owner=owner, total_count=0, avg_flowrate=0, avg_pressure=0, avg_temperature=0,
+                distribution_json=[], content_hash=content_hash,
+            )
+    except IntegrityError:
+        duplicate = find_duplicate(owner, content_hash)
+        if duplicate is None:
+            raise
+        raise DuplicateUploadError(duplicate)
+
+
+def find_duplicate(owner, content_hash):
+    """The owner's newest retained summary of a file with this content hash, or None."""
+    if not content_hash:
+        return None
+    return (
+        EquipmentSummary.objects.denormalized().owned_by(owner)
+        .filter(content_hash=content_hash).newest_first().first()
+    )
+
+
+def save_summary(summary, stats, prune=True, rollup=True, warm=True):
+    """Fill in a placeholder summary from ``stats``.
+
+    Batch uploads pass ``prune=False`` and prune once at the end, skip the
+    rollup for a combined summary whose files were already folded in, and
+    pre-render (``warm``) only the report of the newest summary.
+    The statement count doesn't grow with the number of types, bar bound-
+    parameter batching on SQLite.
+    """
+    # One unit of work on its own; no extra savepoint when the caller already holds a transaction
+    with transaction.atomic(savepoint=False):
+        summary.total_count = stats.count
+        summary.avg_flowrate = stats.mean('Flowrate')
+        summary.avg_pressure = stats.mean('Pressure')
+        summary.avg_temperature = stats.mean('Temperature')
+        summary.stats = stats.describe()
+
+        # Save Distribution, with each type's per-parameter aggregates; the
+        # columnar writer keeps thousands of types to a handful of statements
+        breakdown = stats.type_frame()
+        write_columns(EquipmentTypeDistribution, breakdown, constants={'summary_id': summary.pk})
+        summary.distribution_json = breakdown.to_dict('records')
+        summary.save(update_fields=[
+            'total_count', 'avg_flowrate', 'avg_pressure', 'avg_temperature', 'stats', 'distribution_json',
+        ])
+
+        # Fold into the trend rollups before old raw summaries are pruned
+        if rollup:
+            fold_summary(summary, stats, breakdown)
+        if prune:
+            prune_history(summary.owner)
+
+        # Pre-render the PDF report so the first download is already warm
+        if warm:
+            transaction.on_commit(lambda: warm_report(summary.id))
+    return summary
+
+
+def prune_history(owner, keep=None):
+    """Delete the owner's summaries beyond the newest ``keep`` (SUMMARY_RETENTION by default).
+
+    Walks the owner's slice of the (owner, -created_at, -id) index and deletes
+    at most PRUNE_BATCH rows, so the cost never depends on other users' data.
+    On PostgreSQL the summaries and everything hanging off them go in a
+    single statement; elsewhere the ORM's collector issues one per table.
+    """
+    keep = settings.SUMMARY_RETENTION if keep is None else keep
+    stale = (
+        EquipmentSummary.objects.denormalized().owned_by(owner).newest_first()
+        .values('id')[keep:keep + PRUNE_BATCH]
+    )
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(*_prune_sql(stale))
+        return
+    stale_ids = [row['id'] for row in stale]
+    if stale_ids:
+        EquipmentSummary.objects.denormalized().filter(id__in=stale_ids).delete()
+
+
+def _prune_sql(stale):
+    """One data-modifying CTE that applies every relation's on_delete to the ``stale`` summaries."""
+    qn = connection.ops.quote_name
+    sql, params = stale.query.sql_with_params()
+    steps = [f'stale AS ({sql})']
+    # include_hidden picks up relations with related_name='+' (UploadJob.summary)
+    relations = [f for f in EquipmentSummary._meta.get_fields(include_hidden=True) if f.one_to_many and f.auto_created]
+    for i, rel in enumerate(relations):
+        table, column = qn(rel.related_model._meta.db_table), qn(rel.field.column)
+        if rel.on_delete is models.CASCADE:
+            action = f'DELETE FROM {table}'
+        elif rel.on_delete is models.SET_NULL:
+            action = f'UPDATE {table} SET {column} = NULL'
+        else:
+            raise NotImplementedError(f'{rel.related_model.__name__}.{rel.field.name}: {rel.on_delete.__name__}')
+        steps.append(f'related_{i} AS ({action} WHERE {column} IN (SELECT id FROM stale))')
+    # Foreign keys are checked at commit, so the order within the statement doesn't matter
+    sql = 'WITH {} DELETE FROM {} WHERE id IN (SELECT id FROM stale)'.format(
+        ', '.join(steps), qn(EquipmentSummary._meta.db_table)
+    )
+    return sql, params
+
+
+def process_upload(file_obj, owner, progress=None, fmt='csv', content_hash=''):
+    """Parse, aggregate and persist one uploaded file; returns the new EquipmentSummary.
+
+    Each chunk is folded into running totals and its rows are bulk-written as
+    EquipmentRecords, so peak memory stays flat no matter how large the file
+    is. Everything happens in one transaction, so readers never see a
+    half-ingested summary. ``progress`` is called after every chunk with the
+    accumulator and the fraction of the file done so far, or None if that
+    isn't known. ``content_hash`` is recorded so a later upload of the same
+    file can be answered from it; DuplicateUploadError is raised if one was
+    saved first.
+    """
+    stats = SummaryAccumulator()
+    done = _progress_fraction(file_obj, fmt) if progress else None
+    with transaction.atomic():
+        summary = new_summary(owner, content_hash)
+        for chunk in iter_upload_chunks(file_obj, fmt):
+            stats.update(chunk)
+            write_columns(EquipmentRecord, record_columns(chunk), constants={'summary_id': summary.pk})
+            if progress:
+                progress(stats, done(stats))
+        if not stats.count:
+            raise EmptyUploadError('File contains no data rows')
+        return save_summary(summary, stats)
+
+
+def _progress_fraction(file_obj, fmt):
+    """Function of the accumulator giving the fraction of ``file_obj`` processed, or None.
+
+    CSV is read through the file object, so its position tells; memory-mapped
+    Parquet/Arrow input never moves it, so rows are counted against the total
+    in the file's footer instead.
+    """
+    if fmt != 'csv':
+        total = upload_row_count(file_obj, fmt)
+        return lambda stats: min(stats.count / total, 1.0) if total else None
+    size = getattr(file_obj, 'size', None) or os.fstat(file_obj.fileno()).st_size
+    return lambda stats: min(file_obj.tell() / size, 1.0) if size else None
+
+
+def ingest_summary(stats, owner, content_hash=''):
+    """Persist a summary a client aggregated itself; no raw rows are stored for it."""
+    if not stats.count:
+        raise EmptyUploadError('File contains no data rows')
+    with transaction.atomic():
+        return save_summary(new_summary(owner, content_hash), stats)
@@ -0,0 +1,336 @@
+import hashlib
+import itertools
+import json
+import logging
+import os
+import tempfile
+import threading
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.db import close_old_connections, connections
+from reportlab.lib.pagesizes import letter
+from reportlab.pdfbase.pdfmetrics import stringWidth
+
+from .models import EquipmentSummary
+
+logger = logging.getLogger(__name__)
+
+# Bump when the layout changes so cached reports are re-rendered
+REPORT_VERSION = 4
+
+
+PAGE_WIDTH, PAGE_HEIGHT = letter
+MARGIN = 50
+LINE_HEIGHT = 14
+
+EQUIPMENT_COLUMNS = [
+    # (heading, x, right aligned)
+    ('Equipment Name', MARGIN, False),
+    ('Type', 220, False),
+    ('Flowrate', 410, True),
+    ('Pressure', 485, True),
+    ('Temperature', PAGE_WIDTH - MARGIN, True),
+]
+
+
+def _number(value):
+    return '' if value is None else f"{value:.2f}"
+
+
+class StreamingCanvas:
+    """The part of ReportLab's Canvas that ReportWriter draws with, writing each page out as it ends.
+
+    ReportLab's own canvas keeps every finished page until ``save()``, so
+    memory grows with the report. Here ``showPage()`` compresses the page's
+    content stream and writes it (with its page object) straight to ``out``,
+    keeping only object offsets for the cross-reference table written by
+    ``save()``. Text is set in the standard, non-embedded Helvetica fonts,
+    measured with ReportLab's metrics.
+    """
+    # Object numbers: 1 catalog, 2 page tree (both written last), then the fonts
+    FONTS = {'Helvetica': 3, 'Helvetica-Bold': 4}
+    FIRST_PAGE_OBJECT = 5
+
+    def __init__(self, out, pagesize=letter):
+        self.out = out
+        self.pagesize = pagesize
+        self.written = 0
+        self.offsets = {}
+        self.page_objects = []
+        self.next_object = self.FIRST_PAGE_OBJECT
+        self.operations = []
+        self.font = ('Helvetica', 12)
+        self._write(b'%PDF-1.4\n%\xe2\xe3\xcf\xd3\n')
+        for name, number in self.FONTS.items():
+            self._object(number, f'<< /Type /Font /Subtype /Type1 /BaseFont /{name} /Encoding /WinAnsiEncoding >>'.encode())
+
+    def setFont(self, name, size):
+        self.font = (name, size)
+
+    def drawString(self, x, y, text):
+        name, size = self.font
+        encoded = text.encode('cp1252', errors='replace')
+        escaped = encoded.replace(b'\\', b'\\\\').replace(b'(', b'\\(').replace(b')', b'\\)')
+        self.operations.append(b'BT /F%d %g Tf %.2f %.2f Td (%s) Tj ET' % (self.FONTS[name], size, x, y, escaped))
+
+    def drawRightString(self, x, y, text):
+        name, size = self.font
+        self.drawString(x - stringWidth(text, name, size), y, text)
+
+    def showPage(self):
+        content = zlib.compress(b'\n'.join(self.operations))
+        self.operations = []
+        content_number, page_number = self.next_object, self.next_object + 1
+        self.next_object += 2
+        self._object(content_number, b'<< /Length %d /Filter /FlateDecode >>\nstream\n%s\nendstream' % (len(content), content))
+        width, height = self.pagesize
+        fonts = ' '.join(f'/F{number} {number} 0 R' for number in self.FONTS.values())
+        self._object(page_number, (
+            f'<< /Type /Page /Parent 2 0 R /MediaBox [0 0 {width:g} {height:g}] '
+            f'/Resources << /Font << {fonts} >> >> /Contents {content_number} 0 R >>'
+        ).encode())
+        self.page_objects.append(page_number)
+
+    def save(self):
+        if self.operations:
+            self.showPage()
+        kids = ' '.join(f'{number} 0 R' for number in self.page_objects)
+        self._object(2, f'<< /Type /Pages /Kids [{kids}] /Count {len(self.page_objects)} >>'.encode())
+        self._object(1, b'<< /Type /Catalog /Pages 2 0 R >>')
+        xref = self.written
+        size = self.next_object
+        entries = [b'0000000000 65535 f \n'] + [b'%010d 00000 n \n' % self.offsets[n] for n in range(1, size)]
+        self._write(b'xref\n0 %d\n%s' % (size, b''.join(entries)))
+        self._write(b'trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n' % (size, xref))
+
+    def _object(self, number, body):
+        self.offsets[number] = self.written
+        self._write(b'%d 0 obj\n%s\nendobj\n' % (number, body))
+
+    def _write(self, data):
+        self.out.write(data)
+        self.written += len(data)
+
+
+class ReportWriter:
+    """Draws lines top to bottom, starting a new page (and repeating the
+    current table header) whenever the cursor reaches the bottom margin."""
+
+    def __init__(self, out, title):
+        self.canvas = StreamingCanvas(out)
+        self.title = title
+        self.page = 1
+        self.header = None
+        self.y = PAGE_HEIGHT - MARGIN
+
+    def ensure_space(self, lines=1):
+        if self.y - lines * LINE_HEIGHT < MARGIN:
+            self.new_page()
+
+    def new_page(self):
+        self.footer()
+        self.canvas.showPage()
+        self.page += 1
+        self.y = PAGE_HEIGHT - MARGIN
+        if self.header:
+            self.table_header(self.header)
+
+    def footer(self):
+        self.canvas.setFont("Helvetica", 8)
+        self.canvas.drawString(MARGIN, MARGIN / 2, self.title)
+        self.canvas.drawRightString(PAGE_WIDTH - MARGIN, MARGIN / 2, f"Page {self.page}")
+
+    def text(self, value, font="Helvetica", size=12, x=MARGIN, gap=20):
+        self.ensure_space()
+        self.canvas.setFont(font, size)
+        self.canvas.drawString(x, self.y, value)
+        self.y -= gap
+
+    def section(self, title):
+        # Keep a heading together with at least its first few rows
+        self.header = None
+        self.ensure_space(4)
+        self.y -= 10
+        self.text(title, font="Helvetica-Bold", size=13)
+
+    def table_header(self, columns):
+        self.header = columns
+        self.canvas.setFont("Helvetica-Bold", 9)
+        self.draw_row(columns, [heading for heading, _, _ in columns])
+        self.canvas.setFont("Helvetica", 9)
+
+    def table_row(self, columns, values):
+        self.ensure_space()
+        self.draw_row(columns, values)
+
+    def draw_row(self, columns, values):
+        for (_, x, right), value in zip(columns, values):
+            if right:
+                self.canvas.drawRightString(x, self.y, value)
+            else:
+                self.canvas.drawString(x, self.y, value)
+        self.y -= LINE_HEIGHT
+
+    def finish(self):
+        self.footer()
+        self.canvas.showPage()
+        self.canvas.save()
+
+
+def render_summary_pdf(summary, out, distribution=None, equipment_rows=(), max_detail_rows=None):
+    """Write the report for ``summary`` to ``out``, a page at a time; returns the detail rows drawn.
+
+    ``distribution`` defaults to the summary's stored type counts;
+    ``equipment_rows`` is an iterable of (name, type, flowrate, pressure,
+    temperature) tuples consumed lazily, one table row at a time, so memory
+    stays flat however many rows there are. ``max_detail_rows`` optionally
+    cuts the detail table short with a note.
+    """
+    if distribution is None:
+        distribution = ((dist.equipment_type, dist.count) for dist in summary.type_distribution.all())
+
+    report = ReportWriter(out, "Chemical Equipment Parameter Report")
+
+    # Header
+    report.text("Chemical Equipment Parameter Report", font="Helvetica-Bold", size=16, gap=30)
+    report.text(f"Date: {summary.created_at.strftime('%Y-%m-%d %H:%M:%S')}", gap=40)
+
+    # Stats
+    report.text(f"Total Equipment Count: {summary.total_count}")
+    report.text(f"Average Flowrate: {summary.avg_flowrate:.2f}")
+    report.text(f"Average Pressure: {summary.avg_pressure:.2f}")
+    report.text(f"Average Temperature: {summary.avg_temperature:.2f}")
+
+    # Distribution
+    columns = [('Equipment Type', MARGIN, False), ('Count', PAGE_WIDTH - MARGIN, True)]
+    report.section("Equipment Type Distribution")
+    report.table_header(columns)
+    for equipment_type, count in distribution:
+        report.table_row(columns, [str(equipment_type)[:80], str(count)])
+
+    # Per-equipment detail
+    rows = itertools.islice(equipment_rows, max_detail_rows)
+    first = next(rows, None)
+    shown = 0
+    if first is not None:
+        report.section("Equipment Details")
+        report.table_header(EQUIPMENT_COLUMNS)
+        for name, equipment_type, flowrate, pressure, temperature in itertools.chain([first], rows):
+            report.table_row(EQUIPMENT_COLUMNS, [
+                str(name)[:34], str(equipment_type)[:30],
+                _number(flowrate), _number(pressure), _number(temperature),
+            ])
+            shown += 1
+        if max_detail_rows is not None and shown < summary.total_count:
+            report.header = None
+            report.text(f"Showing the first {shown} of {summary.total_count} equipment rows.", size=9)
+
+    report.finish()
+    return shown
+
+
+def report_key(summary):
+    """Content address of a summary's report: a hash of everything the PDF shows."""
+    content = {
+        'version': REPORT_VERSION,
+        'id': summary.pk,
+        'created_at': summary.created_at.isoformat(),
+        'total_count': summary.total_count,
+        'avg_flowrate': summary.avg_flowrate,
+        'avg_pressure': summary.avg_pressure,
+        'avg_temperature': summary.avg_temperature,
+        'type_distribution': [
+            [dist.equipment_type, dist.count] for dist in summary.type_distribution.all()
+        ],
+    }
+    return hashlib.sha256(json.dumps(content, sort_keys=True).encode()).hexdigest()
+
+
+class ReportCache:
+    """Rendered PDFs on local disk, named by content hash, evicted least recently used first."""
+
+    def __init__(self, directory, max_bytes):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._lock = threading.Lock()
+
+    def path(self, key):
+        return os.path.join(self.directory, f'{key}.pdf')
+
+    def open(self, summary, key=None):
+        """Return the summary's report as an open file, rendering it on a miss.
+
+        Pass ``key`` when the caller already has ``report_key(summary)``.
+        """
+        key = key or report_key(summary)
+        try:
+            f = open(self.path(key), 'rb')
+        except FileNotFoundError:
+            self.render(summary, key)
+            return open(self.path(key), 'rb')
+        # mtime doubles as the last-access time for LRU eviction
+        try:
+            os.utime(self.path(key))
+        except FileNotFoundError:
+            # Evicted since it was opened; the open handle still reads it
+            pass
+        return f
+
+    def render(self, summary, key=None):
+        key = key or report_key(summary)
+        os.makedirs(self.directory, exist_ok=True)
+        fd, tmp_path = tempfile.mkstemp(dir=self.directory, suffix='.tmp')
+        try:
+            limit = settings.REPORT_MAX_DETAIL_ROWS
+            rows = summary.equipment.order_by('id').values_list(
+                'name', 'equipment_type', 'flowrate', 'pressure', 'temperature'
+            )[:limit].iterator(chunk_size=2000)
+            with os.fdopen(fd, 'wb') as out:
+                render_summary_pdf(summary, out, equipment_rows=rows, max_detail_rows=limit)
+            # Atomic so readers never see a half-written report
+            os.replace(tmp_path, self.path(key))
+        except BaseException:
+            os.remove(tmp_path)
+            raise
+        self.evict()
+        return key
+
+    def evict(self):
+        with self._lock:
+            entries = []
+            for entry in os.scandir(self.directory):
+                if entry.name.endswith('.pdf'):
+                    stat = entry.stat()
+                    entries.append((stat.st_mtime, stat.st_size, entry.path))
+            total = sum(size for _, size, _ in entries)
+            for _, size, path in sorted(entries):
+                if total <= self.max_bytes:
+                    break
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+                total -= size
+
+
+report_cache = ReportCache(settings.REPORT_CACHE_DIR, settings.REPORT_CACHE_MAX_BYTES)
+_render_pool = ThreadPoolExecutor(max_workers=settings.REPORT_RENDER_WORKERS, thread_name_prefix='report')
+
+
+def _warm(summary_id):
+    close_old_connections()
+    try:
+        summary = EquipmentSummary.objects.filter(pk=summary_id).first()
+        if summary is not None:
+            report_cache.render(summary)
+    except Exception:
+        logger.exception('Report pre-render failed for summary %s', summary_id)
+    finally:
+        connections.close_all()
+
+
+def warm_report(summary_id):
+    """Render a summary's report in the background so the first download is a cache hit."""
+    return _render_pool.submit(_warm, summary_id)
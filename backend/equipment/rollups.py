@@ -0,0 +1,111 @@
+import math
+from datetime import timedelta, timezone as dt_timezone
+
+from django.conf import settings
+from django.db import connection
+from django.utils import timezone
+
+from .ingest import upsert_columns
+from .models import SummaryRollup
+
+PARAMETERS = SummaryRollup.PARAMETERS
+
+
+def bucket_start(moment, granularity):
+    moment = moment.astimezone(dt_timezone.utc).replace(minute=0, second=0, microsecond=0)
+    if granularity == SummaryRollup.DAY:
+        moment = moment.replace(hour=0)
+    return moment
+
+
+def summary_contributions(summary, stats, breakdown):
+    """Column arrays of what one summary adds to its buckets: the all-types row, then one per type.
+
+    Extremes come from the summary's stats and the per-type ``breakdown``
+    (``stats.type_frame()``); summaries saved before those existed fall back
+    to their means. ``<param>_n`` is the number of readings of each
+    parameter in ``stats``, which weights the means when buckets merge.
+    """
+    column_stats = summary.stats or {}
+    overall = {'equipment_type': '', 'count': summary.total_count}
+    for param in PARAMETERS:
+        mean = getattr(summary, f'avg_{param}')
+        if mean is None or math.isnan(mean):
+            mean = None
+        column = column_stats.get(param, {})
+        overall[f'{param}_mean'] = mean
+        overall[f'{param}_n'] = stats.non_null[param.capitalize()]
+        overall[f'{param}_min'] = column.get('min', mean) if mean is not None else None
+        overall[f'{param}_max'] = column.get('max', mean) if mean is not None else None
+    columns = {name: [value] for name, value in overall.items()}
+    columns['equipment_type'] += list(breakdown['equipment_type'])
+    columns['count'] += list(breakdown['count'])
+    for param in PARAMETERS:
+        for stat, source in (('mean', 'avg'), ('min', 'min'), ('max', 'max')):
+            columns[f'{param}_{stat}'] += list(breakdown[f'{source}_{param}'])
+        if len(breakdown):
+            readings = stats.by_type[f'{param.capitalize()}_n'].reindex(breakdown['equipment_type'])
+            columns[f'{param}_n'] += [int(n) for n in readings]
+    return columns
+
+
+def merge_sql():
+    """``ON CONFLICT DO UPDATE`` expressions that fold a new contribution into a stored bucket.
+
+    Running means weighted by each side's readings of that parameter (not its
+    row count, which includes blank cells), and min/max that ignore a
+    missing side.
+    """
+    qn = connection.ops.quote_name
+    table = qn(SummaryRollup._meta.db_table)
+    # SQLite's two-argument MIN/MAX are PostgreSQL's LEAST/GREATEST
+    least, greatest = ('LEAST', 'GREATEST') if connection.vendor == 'postgresql' else ('MIN', 'MAX')
+
+    def old(name):
+        return f'{table}.{qn(name)}'
+
+    def new(name):
+        return f'EXCLUDED.{qn(name)}'
+
+    updates = {
+        'uploads': f"{old('uploads')} + {new('uploads')}",
+        'count': f"{old('count')} + {new('count')}",
+    }
+    for param in PARAMETERS:
+        mean, n, low, high = f'{param}_mean', f'{param}_n', f'{param}_min', f'{param}_max'
+        updates[mean] = (
+            f'CASE WHEN {old(mean)} IS NULL THEN {new(mean)} WHEN {new(mean)} IS NULL THEN {old(mean)} '
+            f'ELSE ({old(mean)} * {old(n)} + {new(mean)} * {new(n)}) / ({old(n)} + {new(n)}) END'
+        )
+        updates[n] = f'{old(n)} + {new(n)}'
+        updates[low] = f'COALESCE({least}({old(low)}, {new(low)}), {old(low)}, {new(low)})'
+        updates[high] = f'COALESCE({greatest}({old(high)}, {new(high)}), {old(high)}, {new(high)})'
+    return updates
+
+
+def fold_summary(summary, stats, breakdown):
+    """Add a freshly saved summary to its owner's hourly and daily rollups.
+
+    One upsert per granularity merges the new contribution into the stored
+    bucket inside the database, so no rows are read or locked and the
+    statement count doesn't grow with the number of types (bar SQLite's
+    bound-parameter batching).
+    """
+    columns = summary_contributions(summary, stats, breakdown)
+    updates = merge_sql()
+    for granularity, _ in SummaryRollup.GRANULARITY_CHOICES:
+        upsert_columns(
+            SummaryRollup, columns, ['owner', 'granularity', 'equipment_type', 'bucket_start'], updates,
+            constants={
+                'owner_id': summary.owner_id,
+                'granularity': granularity,
+                'bucket_start': bucket_start(summary.created_at, granularity),
+                'uploads': 1,
+            },
+        )
+
+    # Hourly detail is only kept for a limited window; daily rows stay
+    cutoff = timezone.now() - timedelta(days=settings.ROLLUP_HOURLY_RETENTION_DAYS)
+    SummaryRollup.objects.filter(
+        owner=summary.owner, granularity=SummaryRollup.HOUR, bucket_start__lt=cutoff
+    ).delete()
@@ -1,6 +1,6 @@
 from rest_framework import serializers
 from django.contrib.auth.models import User
-from .models import EquipmentSummary, EquipmentTypeDistribution
+from .models import ChunkedUpload, EquipmentRecord, EquipmentSummary, EquipmentTypeDistribution, SummaryRollup, UploadJob
 
 class UserSerializer(serializers.ModelSerializer):
     class Meta:
@@ -15,11 +15,57 @@ class UserSerializer(serializers.ModelSerializer):
 class EquipmentTypeDistributionSerializer(serializers.ModelSerializer):
     class Meta:
         model = EquipmentTypeDistribution
-        fields = ['equipment_type', 'count']
+        fields = ['equipment_type', 'count',
+                  'avg_flowrate', 'min_flowrate', 'max_flowrate',
+                  'avg_pressure', 'min_pressure', 'max_pressure',
+                  'avg_temperature', 'min_temperature', 'max_temperature']
 
 class EquipmentSummarySerializer(serializers.ModelSerializer):
-    type_distribution = EquipmentTypeDistributionSerializer(many=True, read_only=True)
+    type_distribution = serializers.SerializerMethodField()
 
     class Meta:
         model = EquipmentSummary
-        fields = ['id', 'created_at', 'total_count', 'avg_flowrate', 'avg_pressure', 'avg_temperature', 'type_distribution']
+        fields = ['id', 'created_at', 'total_count', 'avg_flowrate', 'avg_pressure', 'avg_temperature', 'stats',
+                  'content_hash', 'type_distribution']
+
+    def get_type_distribution(self, obj):
+        # Prefer rows that were prefetched; otherwise use the denormalized copy
+        # rather than issuing a query per summary
+        prefetched = getattr(obj, '_prefetched_objects_cache', {})
+        if 'type_distribution' not in prefetched and obj.distribution_json is not None:
+            return obj.distribution_json
+        return EquipmentTypeDistributionSerializer(obj.type_distribution.all(), many=True).data
+
+
+class EquipmentRecordSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = EquipmentRecord
+        fields = ['id', 'name', 'equipment_type', 'flowrate', 'pressure', 'temperature']
+
+
+class UploadJobSerializer(serializers.ModelSerializer):
+    progress = serializers.FloatField(read_only=True)
+    rows_per_sec = serializers.IntegerField(read_only=True)
+
+    class Meta:
+        model = UploadJob
+        fields = ['id', 'status', 'file_name', 'file_size', 'progress', 'bytes_processed', 'rows_processed',
+                  'rows_per_sec', 'summary', 'error', 'created_at', 'started_at', 'finished_at']
+
+
+class SummaryRollupSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = SummaryRollup
+        fields = ['granularity', 'bucket_start', 'equipment_type', 'uploads', 'count',
+                  'flowrate_mean', 'flowrate_n', 'flowrate_min', 'flowrate_max',
+                  'pressure_mean', 'pressure_n', 'pressure_min', 'pressure_max',
+                  'temperature_mean', 'temperature_n', 'temperature_min', 'temperature_max']
+
+
+class ChunkedUploadSerializer(serializers.ModelSerializer):
+    total_chunks = serializers.IntegerField(read_only=True)
+    missing = serializers.ListField(child=serializers.IntegerField(), read_only=True)
+
+    class Meta:
+        model = ChunkedUpload
+        fields = ['id', 'file_name', 'file_size', 'chunk_size', 'total_chunks', 'missing', 'created_at', 'updated_at']
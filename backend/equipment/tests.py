@@ -1,3 +1,867 @@
-from django.test import TestCase
+import hashlib
+import importlib.util
+import io
+import math
+import os
+import tempfile
+import time
+import unittest
+import zipfile
+from concurrent.futures import ThreadPoolExecutor
+from datetime import timedelta
+from unittest import mock
 
-# Create your tests here.
+import numpy as np
+import pandas as pd
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.db import connection
+from django.db.models import F
+from django.test import TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from chemflow_stats import PERCENTILES, ColumnStats
+
+from . import jobs
+from .batch import iter_parsed_chunks, parse_file, process_batch
+from .ingest import (EQUIPMENT_SCHEMA, SUMMARY_STATE_VERSION, MissingColumnsError, SummaryAccumulator, _copy_data,
+                     _copy_sql, iter_csv_chunks, pa, write_columns)
+from .models import ChunkedUpload, EquipmentRecord, EquipmentSummary, EquipmentTypeDistribution, SummaryRollup, UploadJob
+from .pipeline import new_summary, process_upload, prune_history, record_columns, save_summary
+from .reports import EQUIPMENT_COLUMNS, ReportWriter, render_summary_pdf, report_cache
+from .views import EquipmentRecordListView
+
+# Queries each read endpoint may issue, independent of how many summaries or
+# distribution rows exist. Raising a number here needs a reason in review.
+QUERY_BUDGETS = {
+    'summary': 2,           # version check + latest summary (distribution is denormalized)
+    'summary_cached': 1,    # version check only
+    'summary_not_modified': 1,
+    'history': 3,           # version check + summaries + one distribution prefetch
+    'generate_pdf': 3,      # summary + distribution prefetch + equipment rows for the render
+}
+
+
+def make_summary(owner, types=3):
+    summary = EquipmentSummary.objects.create(
+        owner=owner,
+        total_count=types * 2, avg_flowrate=1.0, avg_pressure=2.0, avg_temperature=3.0,
+    )
+    distribution = EquipmentTypeDistribution.objects.bulk_create(
+        EquipmentTypeDistribution(summary=summary, equipment_type=f'Type-{i}', count=2)
+        for i in range(types)
+    )
+    summary.distribution_json = [{'equipment_type': d.equipment_type, 'count': d.count} for d in distribution]
+    summary.save(update_fields=['distribution_json'])
+    return summary
+
+
+class QueryBudgetTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        report_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(report_dir.cleanup)
+        patcher = mock.patch.object(report_cache, 'directory', report_dir.name)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user('budget-user')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def assertBudget(self, name, method, url, **kwargs):
+        with self.assertNumQueries(QUERY_BUDGETS[name]):
+            response = getattr(self.client, method)(url, **kwargs)
+        return response
+
+    def test_summary(self):
+        for _ in range(5):
+            make_summary(self.user, types=20)
+        response = self.assertBudget('summary', 'get', '/api/summary/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data['type_distribution']), 20)
+
+        self.assertBudget('summary_cached', 'get', '/api/summary/')
+        response = self.assertBudget('summary_not_modified', 'get', '/api/summary/',
+                                     HTTP_IF_NONE_MATCH=response['ETag'])
+        self.assertEqual(response.status_code, 304)
+
+    def test_history_does_not_scale_with_summaries(self):
+        for _ in range(5):
+            make_summary(self.user, types=10)
+        response = self.assertBudget('history', 'get', '/api/history/')
+        self.assertEqual(len(response.data), 5)
+        self.assertTrue(all(len(item['type_distribution']) == 10 for item in response.data))
+
+    def test_generate_pdf(self):
+        make_summary(self.user, types=50)
+        response = self.assertBudget('generate_pdf', 'post', '/api/generate-pdf/')
+        self.assertEqual(response.status_code, 200)
+        response.close()
+
+    def test_upload_response_uses_denormalized_distribution(self):
+        csv = b'Equipment Name,Type,Flowrate,Pressure,Temperature\nP1,Pump,1,2,3\nV1,Valve,4,5,6\n'
+        response = self.client.post('/api/upload/', {'file': SimpleUploadedFile('a.csv', csv)}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        summary = EquipmentSummary.objects.get(pk=response.data['id'])
+        self.assertEqual(summary.distribution_json, response.data['type_distribution'])
+
+
+class ResponseCacheTests(TestCase):
+    CSV = b'Equipment Name,Type,Flowrate,Pressure,Temperature\nP1,Pump,1,2,3\n'
+
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user('cache-user')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, data):
+        response = self.client.post('/api/upload/', {'file': SimpleUploadedFile('a.csv', data)}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        return response.data['id']
+
+    def test_an_upload_replaces_cached_responses_and_etags(self):
+        first_id = self.upload(self.CSV)
+        summary = self.client.get('/api/summary/')
+        history = self.client.get('/api/history/')
+        self.assertEqual(summary.data['id'], first_id)
+
+        second_id = self.upload(self.CSV + b'V1,Valve,4,5,6\n')
+        # The old ETag no longer matches, and neither cached body is served again
+        response = self.client.get('/api/summary/', HTTP_IF_NONE_MATCH=summary['ETag'])
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], summary['ETag'])
+        self.assertEqual(response.data['id'], second_id)
+        response = self.client.get('/api/history/', HTTP_IF_NONE_MATCH=history['ETag'])
+        self.assertEqual([item['id'] for item in response.data], [second_id, first_id])
+
+        # Another user's poll never sees this user's cached entries
+        other = APIClient()
+        other.force_authenticate(User.objects.create_user('other-user'))
+        self.assertEqual(other.get('/api/history/').data, [])
+
+
+class StreamingUploadTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user('streaming-user')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def upload(self, name, data):
+        return self.client.post('/api/upload/', {'file': SimpleUploadedFile(name, data)}, format='multipart')
+
+    def test_chunked_parse_matches_single_chunk(self):
+        csv = (b'Equipment Name,Type,Flowrate,Pressure,Temperature\n'
+               b'P1,Pump,1,2,3\nV1,Valve,4,5,\nP2,Pump,3,6,9\nH1,Heater,8,1,2\nV2,Valve,5,5,5\n')
+        fields = ['total_count', 'avg_flowrate', 'avg_pressure', 'avg_temperature', 'type_distribution']
+        with override_settings(INGEST_CHUNK_ROWS=2):
+            chunked = self.upload('a.csv', csv).data
+        whole = self.upload('b.csv', csv + b'\n').data
+        self.assertEqual({f: chunked[f] for f in fields}, {f: whole[f] for f in fields})
+        self.assertEqual(EquipmentSummary.objects.get(pk=chunked['id']).equipment.count(), 5)
+
+    def test_bad_header_is_a_400_and_saves_nothing(self):
+        response = self.upload('a.csv', b'Name,Kind\nP1,Pump\n')
+        self.assertEqual(response.status_code, 400)
+        self.assertIn('Missing columns', response.data['error'])
+        response = self.upload('a.csv', b'Equipment Name,Type,Flowrate,Pressure,Temperature\nP1,Pump,high,2,3\n')
+        self.assertEqual(response.status_code, 400)
+        self.assertFalse(EquipmentSummary.objects.exists())
+
+
+class ColumnWriterTests(TestCase):
+    def test_empty_strings_and_nulls_round_trip(self):
+        summary = new_summary(User.objects.create_user('writer-user'))
+        chunk = pd.DataFrame({
+            'Equipment Name': ['', 'P1', None], 'Type': ['Pump', '', 'Pump'],
+            'Flowrate': [1.0, np.nan, 2.0], 'Pressure': [1.0, 2.0, 3.0], 'Temperature': [np.nan] * 3,
+        })
+        rows, _ = write_columns(EquipmentRecord, record_columns(chunk), constants={'summary_id': summary.pk},
+                                batch_size=2)
+        self.assertEqual(rows, 3)
+        stored = EquipmentRecord.objects.filter(summary=summary).order_by('id')
+        self.assertEqual(list(stored.values_list('name', 'equipment_type', 'flowrate', 'temperature')),
+                         [('', 'Pump', 1.0, None), ('P1', '', None, None), ('', 'Pump', 2.0, None)])
+
+    def test_copy_keeps_empty_strings_apart_from_nulls(self):
+        # What PostgreSQL's COPY is sent, checked whatever backend the suite runs on
+        fields = [EquipmentRecord._meta.get_field(name) for name in ('name', 'flowrate')]
+        sql = _copy_sql(EquipmentRecord, fields)
+        self.assertIn("NULL '\\N'", sql)
+        self.assertIn('FORCE_NOT_NULL ("name")', sql)
+        data = _copy_data(pd.DataFrame({'name': ['', '\\N'], 'flowrate': [None, 1.5]}, dtype=object))
+        self.assertEqual(data, ',\\N\n\\N,1.5\n')
+
+
+class ReportCacheTests(TestCase):
+    def setUp(self):
+        report_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(report_dir.cleanup)
+        self.directory = report_dir.name
+        patcher = mock.patch.object(report_cache, 'directory', self.directory)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.user = User.objects.create_user('report-user')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_rendered_once_and_revalidated_without_the_file(self):
+        make_summary(self.user, types=5)
+        with mock.patch.object(report_cache, 'render', wraps=report_cache.render) as render:
+            first = self.client.get('/api/generate-pdf/')
+            self.assertTrue(b''.join(first.streaming_content).startswith(b'%PDF'))
+            second = self.client.get('/api/generate-pdf/')
+            second.close()
+            self.assertEqual(second['ETag'], first['ETag'])
+            self.assertEqual(render.call_count, 1)
+
+            # A matching If-None-Match is answered from the key alone, even once the file is evicted
+            for name in os.listdir(self.directory):
+                os.remove(os.path.join(self.directory, name))
+            response = self.client.get('/api/generate-pdf/', HTTP_IF_NONE_MATCH=first['ETag'])
+            self.assertEqual(response.status_code, 304)
+            self.assertEqual(render.call_count, 1)
+
+    def test_least_recently_used_report_is_evicted(self):
+        old, new = make_summary(self.user), make_summary(self.user, types=4)
+        old_path = report_cache.path(report_cache.render(old))
+        os.utime(old_path, (1, 1))
+        with mock.patch.object(report_cache, 'max_bytes', os.path.getsize(old_path) * 1.5):
+            new_path = report_cache.path(report_cache.render(new))
+        self.assertFalse(os.path.exists(old_path))
+        self.assertTrue(os.path.exists(new_path))
+
+    @override_settings(REPORT_MAX_DETAIL_ROWS=3)
+    def test_detail_table_is_capped(self):
+        summary = make_summary(self.user)
+        write_columns(EquipmentRecord, {
+            'name': [f'EQ-{i}' for i in range(6)], 'equipment_type': ['Pump'] * 6,
+            'flowrate': [1.0] * 6, 'pressure': [2.0] * 6, 'temperature': [3.0] * 6,
+        }, constants={'summary_id': summary.pk})
+        real_row, real_text = ReportWriter.table_row, ReportWriter.text
+        with mock.patch.object(ReportWriter, 'table_row', autospec=True, side_effect=real_row) as row, \
+                mock.patch.object(ReportWriter, 'text', autospec=True, side_effect=real_text) as text:
+            report_cache.render(summary)
+        self.assertEqual(sum(call.args[1] is EQUIPMENT_COLUMNS for call in row.call_args_list), 3)
+        self.assertIn('Showing the first 3 of 6 equipment rows.', [call.args[1] for call in text.call_args_list])
+
+    def test_pages_are_written_as_they_are_finished(self):
+        summary = make_summary(self.user)
+        out = io.BytesIO()
+        written = []
+
+        def rows():
+            for i in range(3000):
+                if i % 1000 == 0:
+                    written.append(out.tell())
+                yield (f'EQ-{i}', 'Pump (big)', 1.0, None, 3.0)
+
+        # Uncapped by default: every row is drawn
+        self.assertEqual(render_summary_pdf(summary, out, equipment_rows=rows()), 3000)
+        self.assertTrue(written[0] < written[1] < written[2])
+
+        # Every cross-reference entry points at its object, and the page tree lists every page
+        data = out.getvalue()
+        xref = int(data.rsplit(b'startxref\n', 1)[1].split()[0])
+        lines = data[xref:].split(b'\n')
+        count = int(lines[1].split()[1])
+        for number, line in enumerate(lines[2:2 + count]):
+            if number:
+                self.assertTrue(data[int(line[:10]):].startswith(b'%d 0 obj' % number))
+        pages = data.count(b'/Type /Page ')
+        self.assertGreater(pages, 3000 // 60)
+        self.assertIn(b'/Count %d' % pages, data)
+
+    def test_report_evicted_while_opening_is_still_served(self):
+        summary = make_summary(self.user)
+        key = report_cache.render(summary)
+        with mock.patch('equipment.reports.os.utime', side_effect=FileNotFoundError):
+            with report_cache.open(summary, key) as f:
+                self.assertEqual(f.read(4), b'%PDF')
+
+
+class UploadJobTests(TestCase):
+    CSV = b'Equipment Name,Type,Flowrate,Pressure,Temperature\n' + b'P1,Pump,1,2,3\n' * 5
+
+    def setUp(self):
+        spool = tempfile.TemporaryDirectory()
+        self.addCleanup(spool.cleanup)
+        self.spool_dir = spool.name
+        self.settings_override = override_settings(UPLOAD_SPOOL_DIR=spool.name, INGEST_CHUNK_ROWS=2,
+                                                   UPLOAD_JOB_LEASE_SECONDS=60, UPLOAD_JOB_MAX_ATTEMPTS=2)
+        self.settings_override.enable()
+        self.addCleanup(self.settings_override.disable)
+        self.user = User.objects.create_user('job-user')
+
+    def queue(self, name='a.csv', data=CSV):
+        return jobs.spool_upload(SimpleUploadedFile(name, data), self.user)
+
+    def test_jobs_are_claimed_oldest_first_and_once(self):
+        first, second = self.queue(), self.queue()
+        self.assertEqual(jobs.claim_next_job().pk, first.pk)
+        claimed = jobs.claim_next_job()
+        self.assertEqual((claimed.pk, claimed.status, claimed.attempts), (second.pk, UploadJob.RUNNING, 1))
+        self.assertIsNone(jobs.claim_next_job())
+
+    def test_async_upload_runs_and_reports_progress(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.post('/api/upload/?async=true', {'file': SimpleUploadedFile('a.csv', self.CSV)},
+                               format='multipart')
+        self.assertEqual(response.status_code, 202)
+
+        job = jobs.claim_next_job()
+        with mock.patch.object(jobs, 'write_progress', wraps=jobs.write_progress) as progress:
+            jobs.run_job(job)
+        self.assertEqual([call.args[1] for call in progress.call_args_list], [0, 2, 4, 5])
+        status = client.get(response.data['status_url']).data
+        self.assertEqual((status['status'], status['progress'], status['rows_processed']), ('done', 100.0, 5))
+        self.assertFalse(os.listdir(self.spool_dir))
+
+    @unittest.skipIf(pa is None, 'pyarrow is not installed')
+    def test_memory_mapped_input_reports_progress_by_rows(self):
+        parquet = io.BytesIO()
+        pd.read_csv(io.BytesIO(self.CSV)).to_parquet(parquet, row_group_size=2)
+        job = self.queue('a.parquet', parquet.getvalue())
+        job = jobs.claim_next_job()
+        with mock.patch.object(jobs, 'write_progress', wraps=jobs.write_progress) as progress:
+            jobs.run_job(job)
+        self.assertEqual([call.args[2] for call in progress.call_args_list], [0.0, 0.4, 0.8, 1.0])
+
+    def test_summary_commits_only_with_the_job_that_reports_it(self):
+        job = self.queue()
+        job = jobs.claim_next_job()
+
+        def reclaimed_meanwhile(*args, **kwargs):
+            summary = process_upload(*args, **kwargs)
+            UploadJob.objects.filter(pk=job.pk).update(attempts=F('attempts') + 1)
+            return summary
+
+        with mock.patch.object(jobs, 'process_upload', reclaimed_meanwhile):
+            jobs.run_job(job)
+        self.assertFalse(EquipmentSummary.objects.filter(owner=self.user).exists())
+        self.assertEqual(UploadJob.objects.get(pk=job.pk).status, UploadJob.RUNNING)
+        # The reclaiming worker still has the spooled file to start over from
+        self.assertTrue(os.path.exists(job.file_path))
+
+    def test_jobs_of_dead_workers_are_requeued_then_failed(self):
+        job = self.queue()
+        jobs.claim_next_job()
+        jobs.write_progress(job, 2, 0.4)
+        # The worker claimed the job long ago and its heartbeat stopped
+        UploadJob.objects.filter(pk=job.pk).update(started_at=timezone.now() - timedelta(minutes=5))
+        os.utime(jobs.progress_path(job), (time.time() - 120, time.time() - 120))
+
+        reclaimed = jobs.claim_next_job()
+        self.assertEqual((reclaimed.pk, reclaimed.attempts), (job.pk, 2))
+        self.assertFalse(os.path.exists(jobs.progress_path(job)))
+
+        # A recent heartbeat keeps a long-running job with its worker
+        UploadJob.objects.filter(pk=job.pk).update(started_at=timezone.now() - timedelta(minutes=5))
+        jobs.write_progress(job, 2, 0.4)
+        self.assertEqual(jobs.reclaim_stale_jobs(), 0)
+
+        os.utime(jobs.progress_path(job), (time.time() - 120, time.time() - 120))
+        self.assertIsNone(jobs.claim_next_job())
+        job.refresh_from_db()
+        self.assertEqual(job.status, UploadJob.FAILED)
+        self.assertFalse(os.path.exists(job.file_path))
+
+
+class EquipmentRecordListTests(TestCase):
+    def setUp(self):
+        owner = User.objects.create_user('records')
+        self.client = APIClient()
+        self.client.force_authenticate(owner)
+        self.summary = make_summary(owner, types=2)
+        # Ties and nulls in every sortable column, so pages break inside runs of equal values
+        EquipmentRecord.objects.bulk_create(
+            EquipmentRecord(summary=self.summary, name=f'P{i % 3}', equipment_type=f'Type-{i % 2}',
+                            flowrate=None if i % 4 == 0 else float(i % 3), pressure=float(i), temperature=None)
+            for i in range(11)
+        )
+        EquipmentSummary.objects.filter(pk=self.summary.pk).update(total_count=11)
+        for equipment_type, count in (('Type-0', 6), ('Type-1', 5)):
+            self.summary.type_distribution.filter(equipment_type=equipment_type).update(count=count)
+        self.url = f'/api/summaries/{self.summary.pk}/equipment/'
+
+    def walk(self, **params):
+        pages, url = [], self.url
+        response = self.client.get(url, params)
+        while True:
+            self.assertEqual(response.status_code, 200)
+            pages.append(response.data)
+            if not response.data['next']:
+                return pages
+            response = self.client.get(response.data['next'])
+
+    def expected(self, ordering, rows=None):
+        field = ordering.lstrip('-')
+        descending = ordering.startswith('-')
+        rows = rows if rows is not None else EquipmentRecord.objects.filter(summary=self.summary)
+        # Nulls last ascending and first descending, ties broken by id in the same direction
+        def key(row):
+            value = getattr(row, field)
+            return (value is None, value if value is not None else 0, row.pk)
+        return [row.pk for row in sorted(rows, key=key, reverse=descending)]
+
+    def test_cursor_pages_cover_every_row_once_in_order(self):
+        for field in EquipmentRecordListView.ordering_fields:
+            for ordering in (field, f'-{field}'):
+                with self.subTest(ordering=ordering):
+                    pages = self.walk(ordering=ordering, limit=3)
+                    ids = [row['id'] for page in pages for row in page['results']]
+                    self.assertEqual(ids, self.expected(ordering))
+                    self.assertEqual(pages[0]['count'], 11)
+
+    def test_filters_and_counts(self):
+        pages = self.walk(type='Type-1', name='P1', ordering='-flowrate', limit=2)
+        rows = EquipmentRecord.objects.filter(summary=self.summary, equipment_type='Type-1', name='P1')
+        self.assertEqual([row['id'] for page in pages for row in page['results']], self.expected('-flowrate', rows))
+        self.assertEqual(pages[0]['count'], len(rows))
+        # The name filter is counted on the first page only
+        self.assertTrue(all(page['count'] is None for page in pages[1:]))
+
+        # Without a name filter the count comes from the distribution, not a COUNT query
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(self.url, {'type': 'Type-0'})
+        self.assertEqual(response.data['count'], 6)
+        self.assertFalse(any('COUNT(' in query['sql'] for query in queries.captured_queries))
+
+    def test_offset_jumps_and_bad_cursors(self):
+        response = self.client.get(self.url, {'ordering': 'pressure', 'offset': 4, 'limit': 3})
+        self.assertEqual([row['pressure'] for row in response.data['results']], [4.0, 5.0, 6.0])
+        following = self.client.get(response.data['next'])
+        self.assertEqual([row['pressure'] for row in following.data['results']], [7.0, 8.0, 9.0])
+
+        self.assertEqual(self.client.get(self.url, {'cursor': 'not-a-cursor'}).status_code, 404)
+        self.assertEqual(self.client.get(self.url, {'ordering': 'owner'}).status_code, 400)
+
+
+class OwnershipTests(TestCase):
+    def test_pruning_and_reads_are_per_user(self):
+        alice = User.objects.create_user('alice')
+        bob = User.objects.create_user('bob')
+        for _ in range(3):
+            make_summary(bob)
+        for _ in range(7):
+            make_summary(alice)
+
+        prune_history(alice)
+
+        self.assertEqual(EquipmentSummary.objects.owned_by(alice).count(), 5)
+        self.assertEqual(EquipmentSummary.objects.owned_by(bob).count(), 3)
+
+        client = APIClient()
+        client.force_authenticate(bob)
+        self.assertEqual(len(client.get('/api/history/').data), 3)
+
+
+class PersistBudgetTests(TestCase):
+    def save(self, owner, types):
+        stats = SummaryAccumulator()
+        stats.update(pd.DataFrame({
+            'Equipment Name': [f'EQ-{i}' for i in range(types)],
+            'Type': [f'Type-{i}' for i in range(types)],
+            'Flowrate': np.ones(types), 'Pressure': np.ones(types), 'Temperature': np.ones(types),
+        }))
+        with CaptureQueriesContext(connection) as queries:
+            save_summary(new_summary(owner), stats)
+        return len(queries)
+
+    def test_statements_do_not_grow_with_types(self):
+        owner = User.objects.create_user('persist-user')
+        for _ in range(6):
+            make_summary(owner)
+        small, large = self.save(owner, 10), self.save(owner, 1000)
+
+        # Only extra batches forced by the backend's bound-parameter limit
+        # (distribution: 12 per row, rollups: 18 per row at two granularities)
+        def batches(params_per_row, rows):
+            max_params = connection.features.max_query_params
+            return math.ceil(rows / (max_params // params_per_row)) if max_params else 1
+        extra = sum(batches(params, rows) - batches(params, small_rows)
+                    for params, rows, small_rows in ((12, 1000, 10), (18, 1001, 11), (18, 1001, 11)))
+        self.assertEqual(large - small, extra)
+        self.assertEqual(SummaryRollup.objects.filter(owner=owner, granularity=SummaryRollup.DAY).count(), 1001)
+
+
+class RetentionTests(TestCase):
+    @override_settings(SUMMARY_RETENTION=2)
+    def test_pruned_uploads_survive_in_rollups(self):
+        user = User.objects.create_user('carol')
+        client = APIClient()
+        client.force_authenticate(user)
+        for flowrate in (1, 2, 3, 6):
+            csv = f'Equipment Name,Type,Flowrate,Pressure,Temperature\nP1,Pump,{flowrate},2,3\n'.encode()
+            client.post('/api/upload/', {'file': SimpleUploadedFile('a.csv', csv)}, format='multipart')
+
+        self.assertEqual(EquipmentSummary.objects.owned_by(user).count(), 2)
+        daily = client.get('/api/trends/').data
+        self.assertEqual(len(daily), 1)
+        self.assertEqual(daily[0]['uploads'], 4)
+        self.assertEqual(daily[0]['flowrate_mean'], 3.0)
+        self.assertEqual((daily[0]['flowrate_min'], daily[0]['flowrate_max']), (1.0, 6.0))
+        pumps = client.get('/api/trends/?granularity=hour&type=Pump').data
+        self.assertEqual(pumps[0]['count'], 4)
+        self.assertEqual(SummaryRollup.objects.filter(owner=user).count(), 4)
+
+
+class RollupWeightTests(TestCase):
+    def test_means_are_weighted_by_readings_not_rows(self):
+        user = User.objects.create_user('rollup-user')
+        client = APIClient()
+        client.force_authenticate(user)
+        header = 'Equipment Name,Type,Flowrate,Pressure,Temperature\n'
+        # One flowrate reading among ten rows, then ten readings of zero
+        sparse = header + 'P0,Pump,100,1,1\n' + ''.join(f'P{i},Pump,,1,1\n' for i in range(1, 10))
+        dense = header + ''.join(f'P{i},Pump,0,1,1\n' for i in range(10))
+        for csv in (sparse, dense):
+            client.post('/api/upload/', {'file': SimpleUploadedFile('a.csv', csv.encode())}, format='multipart')
+
+        for query in ('/api/trends/', '/api/trends/?type=Pump'):
+            with self.subTest(query=query):
+                bucket = client.get(query).data[0]
+                self.assertEqual((bucket['count'], bucket['flowrate_n'], bucket['pressure_n']), (20, 11, 20))
+                self.assertAlmostEqual(bucket['flowrate_mean'], 100 / 11)
+                self.assertEqual(bucket['pressure_mean'], 1.0)
+
+
+class DuplicateUploadTests(TestCase):
+    def test_same_file_returns_existing_summary(self):
+        user = User.objects.create_user('erin')
+        client = APIClient()
+        client.force_authenticate(user)
+        csv = b'Equipment Name,Type,Flowrate,Pressure,Temperature\nP1,Pump,1,2,3\n'
+        first = client.post('/api/upload/', {'file': SimpleUploadedFile('a.csv', csv)}, format='multipart')
+
+        with self.assertNumQueries(1):
+            again = client.post('/api/upload/', {'file': SimpleUploadedFile('b.csv', csv)}, format='multipart')
+        self.assertEqual((first.status_code, again.status_code), (201, 200))
+        self.assertEqual(again.data['id'], first.data['id'])
+        self.assertEqual(len(first.data['content_hash']), 64)
+
+        changed = client.post('/api/upload/', {'file': SimpleUploadedFile('a.csv', csv + b'P2,Pump,1,2,3\n')},
+                              format='multipart')
+        self.assertEqual(changed.status_code, 201)
+        self.assertEqual(EquipmentSummary.objects.owned_by(user).count(), 2)
+
+    def test_upload_that_lost_the_race_returns_the_winners_summary(self):
+        user = User.objects.create_user('erin')
+        client = APIClient()
+        client.force_authenticate(user)
+        csv = b'Equipment Name,Type,Flowrate,Pressure,Temperature\nP1,Pump,1,2,3\n'
+        first = client.post('/api/upload/', {'file': SimpleUploadedFile('a.csv', csv)}, format='multipart')
+
+        # The other upload committed after this one checked for a duplicate
+        with mock.patch('equipment.views.find_duplicate', return_value=None):
+            again = client.post('/api/upload/', {'file': SimpleUploadedFile('b.csv', csv)}, format='multipart')
+        self.assertEqual(again.status_code, 200)
+        self.assertEqual(again.data['id'], first.data['id'])
+        self.assertEqual(EquipmentSummary.objects.owned_by(user).count(), 1)
+        self.assertEqual(EquipmentRecord.objects.filter(summary__owner=user).count(), 1)
+
+    def test_batch_skips_files_already_uploaded(self):
+        user = User.objects.create_user('erin')
+        client = APIClient()
+        client.force_authenticate(user)
+        csv = b'Equipment Name,Type,Flowrate,Pressure,Temperature\nP1,Pump,1,2,3\n'
+        other = csv + b'P2,Pump,4,5,6\n'
+        first = client.post('/api/upload/', {'file': SimpleUploadedFile('a.csv', csv)}, format='multipart')
+
+        response = client.post('/api/upload/batch/?combined=true', {'files': [
+            SimpleUploadedFile('a.csv', csv), SimpleUploadedFile('b.csv', other), SimpleUploadedFile('c.csv', other),
+        ]}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        files = response.data['files']
+        self.assertEqual([(f['duplicate'], f['rows']) for f in files], [(True, 0), (False, 2), (True, 0)])
+        self.assertEqual([files[0]['summary'], files[2]['summary']], [first.data['id'], files[1]['summary']])
+        # The combined totals still cover every file
+        self.assertEqual(response.data['combined']['total_count'], 5)
+        self.assertEqual(EquipmentRecord.objects.filter(summary__owner=user).count(), 3)
+
+
+class ChunkedUploadTests(TestCase):
+    @override_settings(CHUNKED_UPLOAD_CHUNK_BYTES=64)
+    def test_resume_after_missing_and_corrupt_chunks(self):
+        user = User.objects.create_user('grace')
+        client = APIClient()
+        client.force_authenticate(user)
+        body = b'Equipment Name,Type,Flowrate,Pressure,Temperature\n' + b'P1,Pump,1,2,3\n' * 20
+        upload = client.post('/api/upload/chunked/', {'file_name': 'big.csv', 'file_size': len(body)}, format='json').data
+        chunks = [body[i:i + 64] for i in range(0, len(body), 64)]
+
+        def put(index, data):
+            return client.put(f'/api/upload/chunked/{upload["id"]}/chunks/{index}/', data,
+                              content_type='application/octet-stream',
+                              HTTP_X_CHUNK_SHA256=hashlib.sha256(chunks[index]).hexdigest())
+
+        self.assertEqual(put(0, chunks[0][:-1] + b'x').status_code, 400)
+        for index in range(1, len(chunks)):
+            put(index, chunks[index])
+        self.assertEqual(client.post(f'/api/upload/chunked/{upload["id"]}/complete/').status_code, 400)
+        self.assertEqual(client.get(f'/api/upload/chunked/{upload["id"]}/').data['missing'], [0])
+
+        put(0, chunks[0])
+        response = client.post(f'/api/upload/chunked/{upload["id"]}/complete/')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.data['total_count'], 20)
+        self.assertEqual(response.data['content_hash'], hashlib.sha256(body).hexdigest())
+
+    def start(self, client, size):
+        return client.post('/api/upload/chunked/', {'file_name': 'big.csv', 'file_size': size}, format='json')
+
+    @override_settings(CHUNKED_UPLOAD_MAX_OPEN_PER_USER=2, CHUNKED_UPLOAD_MAX_OPEN_BYTES_PER_USER=100)
+    def test_open_uploads_are_capped_per_user(self):
+        spool = tempfile.TemporaryDirectory()
+        self.addCleanup(spool.cleanup)
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('grace'))
+        with override_settings(UPLOAD_SPOOL_DIR=spool.name):
+            first = self.start(client, 60)
+            self.assertIn('100 bytes in total', self.start(client, 50).data['error'])
+            self.assertEqual(self.start(client, 40).status_code, 201)
+            self.assertIn('At most 2', self.start(client, 1).data['error'])
+
+            # Finishing or deleting one frees its place
+            client.delete(f'/api/upload/chunked/{first.data["id"]}/')
+            self.assertEqual(self.start(client, 60).status_code, 201)
+
+    def test_idle_uploads_of_every_user_are_expired_by_the_workers(self):
+        spool = tempfile.TemporaryDirectory()
+        self.addCleanup(spool.cleanup)
+        client = APIClient()
+        with override_settings(UPLOAD_SPOOL_DIR=spool.name):
+            for name in ('grace', 'heidi', 'ivan'):
+                client.force_authenticate(User.objects.create_user(name))
+                self.start(client, 10)
+            ChunkedUpload.objects.exclude(owner__username='ivan').update(updated_at=timezone.now() - timedelta(days=2))
+
+            jobs.worker_loop(once=True)
+        self.assertEqual(list(ChunkedUpload.objects.values_list('owner__username', flat=True)), ['ivan'])
+        self.assertEqual(len(os.listdir(spool.name)), 1)
+
+
+class SummaryIngestTests(TestCase):
+    def test_client_state_matches_file_upload(self):
+        csv = (b'Equipment Name,Type,Flowrate,Pressure,Temperature\n'
+               b'P1,Pump,1,2,3\nV1,Valve,4,5,\nP2,Pump,3,6,9\n')
+        uploader, aggregator = User.objects.create_user('heidi'), User.objects.create_user('ivan')
+        client = APIClient()
+        client.force_authenticate(uploader)
+        uploaded = client.post('/api/upload/', {'file': SimpleUploadedFile('a.csv', csv)}, format='multipart').data
+
+        stats = SummaryAccumulator()
+        for chunk in iter_csv_chunks(io.BytesIO(csv)):
+            stats.update(chunk)
+        client.force_authenticate(aggregator)
+        payload = {'content_hash': hashlib.sha256(csv).hexdigest(), 'state': stats.to_state()}
+        response = client.post('/api/upload/summary/', payload, format='json')
+
+        self.assertEqual(response.status_code, 201)
+        for field in ('total_count', 'avg_flowrate', 'stats', 'type_distribution', 'content_hash'):
+            self.assertEqual(response.data[field], uploaded[field])
+        self.assertEqual(client.post('/api/upload/summary/', payload, format='json').status_code, 200)
+        payload['state']['columns']['Flowrate']['digest']['weights'] = [-1]
+        payload['content_hash'] = '0' * 64
+        self.assertEqual(client.post('/api/upload/summary/', payload, format='json').status_code, 400)
+
+    def test_desktop_and_server_build_the_same_state(self):
+        spec = importlib.util.spec_from_file_location('aggregate', settings.BASE_DIR.parent / 'desktop' / 'aggregate.py')
+        desktop = importlib.util.module_from_spec(spec)
+        spec.loader.exec_module(desktop)
+
+        rng = np.random.default_rng(0)
+        frame = pd.DataFrame({
+            'Equipment Name': [f'EQ-{i}' for i in range(500)],
+            'Type': rng.choice(['Pump', 'Valve', 'Reactor'], 500),
+            'Flowrate': rng.uniform(0, 300, 500).round(2),
+            'Pressure': rng.uniform(1, 20, 500).round(2),
+            'Temperature': rng.uniform(20, 400, 500).round(2),
+        })
+        frame.loc[::7, 'Flowrate'] = None
+        with tempfile.NamedTemporaryFile(suffix='.csv') as f:
+            frame.to_csv(f.name, index=False)
+            state, digest = desktop.aggregate_csv(f.name, chunk_rows=64)
+            server = SummaryAccumulator()
+            for chunk in iter_csv_chunks(f, chunk_size=64, engine='c'):
+                server.update(chunk)
+            f.seek(0)
+            self.assertEqual(digest, hashlib.sha256(f.read()).hexdigest())
+        self.assertEqual(state, server.to_state())
+        self.assertEqual(SummaryAccumulator.from_state(state).describe(), server.describe())
+
+    def test_state_from_an_incompatible_client_is_rejected(self):
+        client = APIClient()
+        client.force_authenticate(User.objects.create_user('judy'))
+        stats = SummaryAccumulator()
+        stats.update(next(iter_csv_chunks(io.BytesIO(b'Equipment Name,Type,Flowrate,Pressure,Temperature\nP1,Pump,1,2,3\n'))))
+
+        for field, value in (('version', SUMMARY_STATE_VERSION + 1), ('compression', 100), ('version', None)):
+            with self.subTest(field=field, value=value):
+                state = {**stats.to_state(), field: value}
+                response = client.post('/api/upload/summary/', {'content_hash': '0' * 64, 'state': state}, format='json')
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('update the client', response.data['error'])
+        self.assertFalse(EquipmentSummary.objects.exists())
+
+        # Failures other than bad input still answer with a JSON error
+        with mock.patch('equipment.views.ingest_summary', side_effect=RuntimeError('database unavailable')):
+            response = client.post('/api/upload/summary/', {'content_hash': '0' * 64, 'state': stats.to_state()},
+                                   format='json')
+        self.assertEqual(response.status_code, 500)
+        self.assertEqual(response.data['error'], 'database unavailable')
+
+
+class BatchUploadTests(TestCase):
+    def test_batch_is_all_or_nothing(self):
+        user = User.objects.create_user('dave')
+        client = APIClient()
+        client.force_authenticate(user)
+        good = b'Equipment Name,Type,Flowrate,Pressure,Temperature\nP1,Pump,1,2,3\nV1,Valve,4,5,6\n'
+        archive = io.BytesIO()
+        with zipfile.ZipFile(archive, 'w') as z:
+            z.writestr('shift/a.csv', good + b'A1,Pump,1,2,3\n')
+            z.writestr('shift/b.csv', good + b'B1,Pump,1,2,3\n')
+
+        response = client.post('/api/upload/batch/?combined=true', {'files': [
+            SimpleUploadedFile('one.csv', good), SimpleUploadedFile('shift.zip', archive.getvalue()),
+        ]}, format='multipart')
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual([f['name'] for f in response.data['files']],
+                         ['one.csv', 'shift.zip/shift/a.csv', 'shift.zip/shift/b.csv'])
+        self.assertEqual(response.data['combined']['total_count'], 8)
+        self.assertEqual(EquipmentSummary.objects.owned_by(user).count(), 4)
+
+        response = client.post('/api/upload/batch/', {'files': [
+            SimpleUploadedFile('ok.csv', good), SimpleUploadedFile('bad.csv', b'a,b\n1,2\n'),
+        ]}, format='multipart')
+        self.assertEqual(response.status_code, 400)
+        self.assertTrue(response.data['error'].startswith('bad.csv'))
+        self.assertEqual(EquipmentSummary.objects.owned_by(user).count(), 4)
+
+    def test_workers_hand_back_chunks_on_disk(self):
+        csv = b'Equipment Name,Type,Flowrate,Pressure,Temperature\n' + b'P1,Pump,1,2,3\n' * 5
+        with tempfile.TemporaryDirectory() as directory:
+            path = os.path.join(directory, '0')
+            with open(path, 'wb') as f:
+                f.write(csv)
+            stats, chunks_path, _ = parse_file(path, 'csv', 2)
+            self.assertEqual(stats.count, 5)
+            self.assertEqual([len(chunk) for chunk in iter_parsed_chunks(chunks_path)], [2, 2, 1])
+
+            user = User.objects.create_user('erin')
+            client = APIClient()
+            client.force_authenticate(user)
+            with override_settings(UPLOAD_SPOOL_DIR=directory, INGEST_CHUNK_ROWS=2):
+                response = client.post('/api/upload/batch/', {'files': [
+                    SimpleUploadedFile('a.csv', csv), SimpleUploadedFile('b.csv', csv.replace(b'P1', b'P2')),
+                ]}, format='multipart')
+            self.assertEqual(response.status_code, 201)
+            self.assertEqual([f['rows'] for f in response.data['files']], [5, 5])
+            self.assertEqual(EquipmentRecord.objects.filter(summary__owner=user).count(), 10)
+            # The spooled files and their chunks are gone once the batch is written
+            self.assertEqual(sorted(os.listdir(directory)), ['0', '0.chunks'])
+
+    def test_failed_batch_waits_for_running_parses_before_cleaning_up(self):
+        finished = []
+
+        def slow_parse(path, fmt, chunk_size):
+            if path.endswith('1'):
+                time.sleep(0.2)
+            finished.append(os.path.exists(path))
+            return parse_file(path, fmt, chunk_size)
+
+        good = b'Equipment Name,Type,Flowrate,Pressure,Temperature\nP1,Pump,1,2,3\n'
+        pool = ThreadPoolExecutor(max_workers=2)
+        self.addCleanup(pool.shutdown)
+        with mock.patch('equipment.batch.parse_pool', return_value=pool), \
+                mock.patch('equipment.batch.parse_file', slow_parse):
+            with self.assertRaises(MissingColumnsError):
+                process_batch([SimpleUploadedFile('bad.csv', b'a,b\n1,2\n'), SimpleUploadedFile('ok.csv', good)],
+                              User.objects.create_user('fay'))
+        # The slow file was parsed in full before its directory was removed
+        self.assertEqual(finished, [True, True])
+
+
+@unittest.skipIf(pa is None, 'pyarrow is not installed')
+class ColumnarUploadTests(TestCase):
+    def test_parquet_matches_csv(self):
+        user = User.objects.create_user('erin')
+        client = APIClient()
+        client.force_authenticate(user)
+        csv = b'Equipment Name,Type,Flowrate,Pressure,Temperature,Site\nP1,Pump,1,2,3,A\nV1,Valve,4,,6,B\nP2,Pump,7,8,9,C\n'
+        parquet = io.BytesIO()
+        pd.read_csv(io.BytesIO(csv)).astype({'Type': 'category'}).to_parquet(parquet)
+
+        fields = ['total_count', 'avg_flowrate', 'avg_pressure', 'avg_temperature', 'type_distribution']
+        results = []
+        for name, data in (('a.csv', csv), ('a.parquet', parquet.getvalue())):
+            response = client.post('/api/upload/', {'file': SimpleUploadedFile(name, data)}, format='multipart')
+            self.assertEqual(response.status_code, 201)
+            results.append({field: response.data[field] for field in fields})
+        self.assertEqual(results[0], results[1])
+
+
+class CsvSchemaTests(TestCase):
+    def test_projection_and_pinned_dtypes(self):
+        csv = io.BytesIO(b'Site,Equipment Name,Type,Flowrate,Pressure,Temperature,Notes\nA,007,Pump,1,2,3,x\n')
+        chunk = next(iter_csv_chunks(csv, schema=EQUIPMENT_SCHEMA, engine='c'))
+        self.assertEqual(sorted(chunk.columns), sorted(EQUIPMENT_SCHEMA.columns))
+        self.assertEqual(chunk['Equipment Name'][0], '007')
+        self.assertEqual(chunk['Flowrate'].dtype, 'float64')
+        self.assertIsInstance(chunk['Type'].dtype, pd.CategoricalDtype)
+
+    def test_bad_header_is_rejected_before_the_body(self):
+        csv = mock.MagicMock(wraps=io.BytesIO(b'a,b\n' + b'1,2\n' * 10_000))
+        with self.assertRaises(MissingColumnsError):
+            next(iter_csv_chunks(csv))
+        csv.read.assert_not_called()
+
+
+class StatsKernelTests(TestCase):
+    def test_merged_chunks_match_a_full_scan(self):
+        values = np.random.default_rng(0).lognormal(3, 1, 200_000) + 1e6
+        left, right = ColumnStats(), ColumnStats()
+        for i, chunk in enumerate(np.array_split(values, 8)):
+            (left if i % 2 else right).update(chunk)
+        left.merge(right)
+        stats = left.describe()
+
+        self.assertEqual(stats['count'], len(values))
+        self.assertAlmostEqual(stats['mean'], values.mean(), places=6)
+        self.assertAlmostEqual(stats['variance'] / values.var(ddof=1), 1, places=9)
+        self.assertEqual((stats['min'], stats['max']), (values.min(), values.max()))
+        for p in PERCENTILES:
+            rank = (values <= stats[f'p{p}']).mean() * 100
+            self.assertLess(abs(rank - p), 0.1)
+
+    def test_missing_readings_are_skipped(self):
+        stats = ColumnStats()
+        stats.update(np.array([np.nan, 2.0, np.nan, 4.0]))
+        self.assertEqual(stats.describe()['count'], 2)
+        self.assertEqual(stats.describe()['p50'], 3.0)
+        self.assertIsNone(ColumnStats().describe()['mean'])
+
+
+class TypeBreakdownTests(TestCase):
+    def test_distribution_carries_per_type_parameters(self):
+        user = User.objects.create_user('frank')
+        client = APIClient()
+        client.force_authenticate(user)
+        csv = (b'Equipment Name,Type,Flowrate,Pressure,Temperature\n'
+               b'P1,Pump,1,2,3\nV1,Valve,4,5,\nP2,Pump,3,6,9\n')
+        response = client.post('/api/upload/', {'file': SimpleUploadedFile('a.csv', csv)}, format='multipart')
+
+        pump, valve = response.data['type_distribution']
+        self.assertEqual((pump['equipment_type'], pump['count']), ('Pump', 2))
+        self.assertEqual((pump['avg_flowrate'], pump['min_flowrate'], pump['max_flowrate']), (2.0, 1.0, 3.0))
+        self.assertEqual(pump['avg_temperature'], 6.0)
+        self.assertEqual(valve['avg_pressure'], 5.0)
+        self.assertIsNone(valve['avg_temperature'])
+        stored = EquipmentTypeDistribution.objects.get(summary_id=response.data['id'], equipment_type='Pump')
+        self.assertEqual(stored.max_pressure, 6.0)
@@ -0,0 +1,51 @@
+import hashlib
+
+from django.core.files.uploadhandler import MemoryFileUploadHandler, TemporaryFileUploadHandler
+
+# Digest recorded for every upload; the hex form is stored on summaries
+CONTENT_HASH = 'sha256'
+
+
+class ContentHashMixin:
+    """Hash each uploaded file while it streams in and set ``content_hash`` on the result.
+
+    Only chunks this handler keeps are hashed: Django hands a chunk on to the
+    next handler when this one returns it, so a file is never hashed twice.
+    """
+
+    def new_file(self, *args, **kwargs):
+        # Before super(): the memory handler ends new_file by raising StopFutureHandlers
+        self.hasher = hashlib.new(CONTENT_HASH)
+        super().new_file(*args, **kwargs)
+
+    def receive_data_chunk(self, raw_data, start):
+        passed_on = super().receive_data_chunk(raw_data, start)
+        if passed_on is None:
+            self.hasher.update(raw_data)
+        return passed_on
+
+    def file_complete(self, file_size):
+        file_obj = super().file_complete(file_size)
+        if file_obj is not None:
+            file_obj.content_hash = self.hasher.hexdigest()
+        return file_obj
+
+
+class HashingMemoryFileUploadHandler(ContentHashMixin, MemoryFileUploadHandler):
+    pass
+
+
+class HashingTemporaryFileUploadHandler(ContentHashMixin, TemporaryFileUploadHandler):
+    pass
+
+
+def content_hash(file_obj):
+    """Hex digest of an uploaded file: the one taken while it streamed in, else read now."""
+    digest = getattr(file_obj, 'content_hash', None)
+    if digest:
+        return digest
+    hasher = hashlib.new(CONTENT_HASH)
+    for chunk in file_obj.chunks():
+        hasher.update(chunk)
+    file_obj.seek(0)
+    return hasher.hexdigest()
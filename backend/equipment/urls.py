@@ -1,10 +1,22 @@
 from django.urls import path
-from .views import UploadView, SummaryView, HistoryView, GeneratePDFView, RegisterView
+from .views import (UploadView, SummaryView, HistoryView, GeneratePDFView, RegisterView, UploadJobView,
+                    EquipmentRecordListView, TrendView, BatchUploadView, ChunkedUploadView,
+                    ChunkedUploadDetailView, ChunkedUploadChunkView, ChunkedUploadCompleteView,
+                    SummaryIngestView)
 
 urlpatterns = [
     path('register/', RegisterView.as_view(), name='register'),
     path('upload/', UploadView.as_view(), name='upload'),
+    path('upload/batch/', BatchUploadView.as_view(), name='upload-batch'),
+    path('upload/summary/', SummaryIngestView.as_view(), name='upload-summary'),
+    path('upload/chunked/', ChunkedUploadView.as_view(), name='upload-chunked'),
+    path('upload/chunked/<uuid:pk>/', ChunkedUploadDetailView.as_view(), name='upload-chunked-detail'),
+    path('upload/chunked/<uuid:pk>/chunks/<int:index>/', ChunkedUploadChunkView.as_view(), name='upload-chunk'),
+    path('upload/chunked/<uuid:pk>/complete/', ChunkedUploadCompleteView.as_view(), name='upload-chunked-complete'),
     path('summary/', SummaryView.as_view(), name='summary'),
     path('history/', HistoryView.as_view(), name='history'),
+    path('trends/', TrendView.as_view(), name='trends'),
+    path('summaries/<int:pk>/equipment/', EquipmentRecordListView.as_view(), name='summary-equipment'),
+    path('jobs/<uuid:pk>/', UploadJobView.as_view(), name='upload-job'),
     path('generate-pdf/', GeneratePDFView.as_view(), name='generate-pdf'),
 ]
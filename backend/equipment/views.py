@@ -1,14 +1,37 @@
-import pandas as pd
 from rest_framework.views import APIView
 from rest_framework.response import Response
 from rest_framework.parsers import MultiPartParser, FormParser
 from rest_framework import status, permissions, generics
-from django.http import HttpResponse
-from .models import EquipmentSummary, EquipmentTypeDistribution
-from .serializers import EquipmentSummarySerializer, UserSerializer
-from reportlab.pdfgen import canvas
-from reportlab.lib.pagesizes import letter
-import io
+from rest_framework.reverse import reverse
+from rest_framework.utils.urls import remove_query_param, replace_query_param
+from django.conf import settings
+from django.db import transaction
+from django.http import FileResponse, HttpResponseNotModified
+from django.utils import timezone
+from datetime import timedelta
+import re
+from .models import ChunkedUpload, EquipmentRecord, EquipmentSummary, SummaryRollup, UploadJob
+from .serializers import (ChunkedUploadSerializer, EquipmentRecordSerializer, EquipmentSummarySerializer,
+                          SummaryRollupSerializer, UploadJobSerializer, UserSerializer)
+from .caching import cached_response, invalidate_summary_cache
+from .ingest import IngestError, SummaryAccumulator, upload_format
+from .batch import process_batch
+from .chunked import CHUNK_CHECKSUM_HEADER, discard_upload, finish_upload, start_upload, write_chunk
+from .jobs import load_live_progress, queue_spooled, spool_upload
+from .pagination import after_cursor, encode_cursor
+from .pipeline import DuplicateUploadError, find_duplicate, ingest_summary, process_upload
+from .reports import report_cache, report_key
+from .uploadhandlers import content_hash
+
+def wants_async(request):
+    return request.query_params.get('async', str(settings.UPLOAD_ASYNC)).lower() in ('1', 'true')
+
+def job_accepted(request, job):
+    return Response({
+        'job_id': str(job.id),
+        'status': job.status,
+        'status_url': reverse('upload-job', args=[job.id], request=request),
+    }, status=status.HTTP_202_ACCEPTED)
 
 class RegisterView(generics.CreateAPIView):
     permission_classes = [permissions.AllowAny]
@@ -22,55 +45,194 @@ class UploadView(APIView):
         file_obj = request.FILES.get('file')
         if not file_obj:
             return Response({'error': 'No file provided'}, status=status.HTTP_400_BAD_REQUEST)
-        if not file_obj.name.endswith('.csv'):
-            return Response({'error': 'File must be CSV'}, status=status.HTTP_400_BAD_REQUEST)
+        fmt = upload_format(file_obj.name)
+        if not fmt:
+            return Response({'error': 'File must be CSV, Parquet, Arrow IPC or Feather'}, status=status.HTTP_400_BAD_REQUEST)
+
+        # The same file again: answer with the summary it already produced, unparsed
+        digest = content_hash(file_obj)
+        duplicate = find_duplicate(request.user, digest)
+        if duplicate:
+            return Response(EquipmentSummarySerializer(duplicate).data, status=status.HTTP_200_OK)
         
+        if wants_async(request):
+            # Hand the file to the background workers and return straight away
+            return job_accepted(request, spool_upload(file_obj, request.user, digest))
+
         try:
-            df = pd.read_csv(file_obj)
-            # Expected columns: Equipment Name, Type, Flowrate, Pressure, Temperature
-            required_cols = ['Equipment Name', 'Type', 'Flowrate', 'Pressure', 'Temperature']
-            if not all(col in df.columns for col in required_cols):
-                 return Response({'error': f'Missing columns. Required: {required_cols}'}, status=status.HTTP_400_BAD_REQUEST)
-
-            # Calculate stats
-            total_count = len(df)
-            avg_flowrate = df['Flowrate'].mean()
-            avg_pressure = df['Pressure'].mean()
-            avg_temperature = df['Temperature'].mean()
-            type_counts = df['Type'].value_counts()
-
-            # Save Summary
-            summary = EquipmentSummary.objects.create(
-                total_count=total_count,
-                avg_flowrate=avg_flowrate,
-                avg_pressure=avg_pressure,
-                avg_temperature=avg_temperature
-            )
-
-            # Save Distribution
-            for dtype, count in type_counts.items():
-                EquipmentTypeDistribution.objects.create(
-                    summary=summary,
-                    equipment_type=dtype,
-                    count=count
-                )
-            
-            # Delete old records, keep only last 5
-            # We want to keep the 5 most recent summaries
-            recent_ids = EquipmentSummary.objects.order_by('-created_at').values_list('id', flat=True)[:5]
-            EquipmentSummary.objects.exclude(id__in=recent_ids).delete()
-            
-            serializer = EquipmentSummarySerializer(summary)
-            return Response(serializer.data, status=status.HTTP_201_CREATED)
+            summary = process_upload(file_obj, request.user, fmt=fmt, content_hash=digest)
+            invalidate_summary_cache(request.user)
+        except DuplicateUploadError as e:
+            # A concurrent upload of the same file was saved first
+            return Response(EquipmentSummarySerializer(e.summary).data, status=status.HTTP_200_OK)
+        except IngestError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+
+        serializer = EquipmentSummarySerializer(summary)
+        return Response(serializer.data, status=status.HTTP_201_CREATED)
 
+class BatchUploadView(APIView):
+    """Many data files and/or ZIPs of them in one request, parsed in parallel and committed together."""
+    parser_classes = (MultiPartParser, FormParser)
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, *args, **kwargs):
+        uploads = request.FILES.getlist('files') + request.FILES.getlist('file')
+        if not uploads:
+            return Response({'error': 'No files provided'}, status=status.HTTP_400_BAD_REQUEST)
+        bad = [f.name for f in uploads if not (upload_format(f.name) or f.name.lower().endswith('.zip'))]
+        if bad:
+            return Response({'error': f'Files must be CSV, Parquet, Arrow IPC, Feather or ZIP: {bad}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        combined = request.query_params.get('combined', 'false').lower() in ('1', 'true')
+
+        try:
+            files, combined_summary, seconds = process_batch(uploads, request.user, combined)
+            invalidate_summary_cache(request.user)
+        except IngestError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
         except Exception as e:
             return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
 
+        rows = sum(f['rows'] for f in files)
+        return Response({
+            'files': files,
+            'combined': EquipmentSummarySerializer(combined_summary).data if combined_summary else None,
+            'rows': rows,
+            'seconds': round(seconds, 4),
+            'rows_per_sec': int(rows / seconds) if seconds else None,
+        }, status=status.HTTP_201_CREATED)
+
+class SummaryIngestView(APIView):
+    """A summary the client aggregated locally (``SummaryAccumulator.to_state()``), instead of the file.
+
+    Saved like an upload's, so it gets the same stats, distribution, rollups
+    and retention; the raw rows never reach the server.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        digest = str(request.data.get('content_hash', '')).lower()
+        if not re.fullmatch('[0-9a-f]{64}', digest):
+            return Response({'error': 'content_hash must be the hex SHA-256 of the file'}, status=status.HTTP_400_BAD_REQUEST)
+        duplicate = find_duplicate(request.user, digest)
+        if duplicate:
+            return Response(EquipmentSummarySerializer(duplicate).data, status=status.HTTP_200_OK)
+        try:
+            stats = SummaryAccumulator.from_state(request.data.get('state') or {})
+            summary = ingest_summary(stats, request.user, digest)
+            invalidate_summary_cache(request.user)
+        except DuplicateUploadError as e:
+            return Response(EquipmentSummarySerializer(e.summary).data, status=status.HTTP_200_OK)
+        except IngestError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        return Response(EquipmentSummarySerializer(summary).data, status=status.HTTP_201_CREATED)
+
+class ChunkedUploadView(APIView):
+    """Start a resumable upload: the client then PUTs each chunk and POSTs complete."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request):
+        file_name = str(request.data.get('file_name', ''))
+        if not upload_format(file_name):
+            return Response({'error': 'File must be CSV, Parquet, Arrow IPC or Feather'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            file_size = int(request.data.get('file_size', 0))
+        except ValueError:
+            return Response({'error': 'file_size must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+        try:
+            upload = start_upload(request.user, file_name, file_size)
+        except IngestError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(ChunkedUploadSerializer(upload).data, status=status.HTTP_201_CREATED)
+
+class ChunkedUploadDetailView(APIView):
+    """Which chunks are still missing (to resume after a dropped connection), or abandon the upload."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk):
+        upload = ChunkedUpload.objects.filter(pk=pk, owner=request.user).first()
+        if not upload:
+            return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(ChunkedUploadSerializer(upload).data)
+
+    def delete(self, request, pk):
+        upload = ChunkedUpload.objects.filter(pk=pk, owner=request.user).first()
+        if not upload:
+            return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+        discard_upload(upload)
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+class ChunkedUploadChunkView(APIView):
+    """Raw bytes of one chunk, with its SHA-256 in the X-Chunk-SHA256 header."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def put(self, request, pk, index):
+        upload = ChunkedUpload.objects.filter(pk=pk, owner=request.user).first()
+        if not upload:
+            return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+        try:
+            # Read straight from the request stream; request.data would try to parse it
+            upload = write_chunk(upload, index, request.stream, request.headers.get(CHUNK_CHECKSUM_HEADER))
+        except IngestError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(ChunkedUploadSerializer(upload).data)
+
+class ChunkedUploadCompleteView(APIView):
+    """Process an upload whose chunks have all arrived, as UploadView would."""
+    permission_classes = [permissions.IsAuthenticated]
+
+    def post(self, request, pk):
+        # Locked until the upload is processed or handed to a job, so a repeated
+        # complete (or expiry) waits and then finds it gone
+        with transaction.atomic():
+            upload = ChunkedUpload.objects.select_for_update().filter(pk=pk, owner=request.user).first()
+            if not upload:
+                return Response({'error': 'Upload not found'}, status=status.HTTP_404_NOT_FOUND)
+            return self.complete(request, upload)
+
+    def complete(self, request, upload):
+        try:
+            digest = finish_upload(upload)
+        except IngestError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+
+        duplicate = find_duplicate(request.user, digest)
+        if duplicate:
+            discard_upload(upload)
+            return Response(EquipmentSummarySerializer(duplicate).data, status=status.HTTP_200_OK)
+        if wants_async(request):
+            # The assembled file is already in the spool directory; the job takes it over
+            job = queue_spooled(request.user, upload.file_name, upload.file_path, upload.file_size, digest)
+            discard_upload(upload, keep_file=True)
+            return job_accepted(request, job)
+
+        try:
+            with open(upload.file_path, 'rb') as f:
+                summary = process_upload(f, request.user, fmt=upload_format(upload.file_name), content_hash=digest)
+            invalidate_summary_cache(request.user)
+        except DuplicateUploadError as e:
+            return Response(EquipmentSummarySerializer(e.summary).data, status=status.HTTP_200_OK)
+        except IngestError as e:
+            return Response({'error': str(e)}, status=status.HTTP_400_BAD_REQUEST)
+        except Exception as e:
+            return Response({'error': str(e)}, status=status.HTTP_500_INTERNAL_SERVER_ERROR)
+        finally:
+            discard_upload(upload)
+        return Response(EquipmentSummarySerializer(summary).data, status=status.HTTP_201_CREATED)
+
 class SummaryView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        summary = EquipmentSummary.objects.order_by('-created_at').first()
+        return cached_response(request, 'summary', lambda: self.build(request))
+
+    def build(self, request):
+        summary = EquipmentSummary.objects.denormalized().owned_by(request.user).newest_first().first()
         if not summary:
              return Response({'message': 'No data available'}, status=status.HTTP_404_NOT_FOUND)
         serializer = EquipmentSummarySerializer(summary)
@@ -80,45 +242,131 @@ class HistoryView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
     def get(self, request):
-        summaries = EquipmentSummary.objects.order_by('-created_at')[:5]
+        return cached_response(request, 'history', lambda: self.build(request))
+
+    def build(self, request):
+        summaries = EquipmentSummary.objects.owned_by(request.user).newest_first()[:settings.SUMMARY_RETENTION]
         serializer = EquipmentSummarySerializer(summaries, many=True)
         return Response(serializer.data)
 
+class EquipmentRecordListView(APIView):
+    """Filtered, sorted raw rows of one upload, paged by keyset cursor.
+
+    ``next`` seeks from the last row of the page on (field, id), so deep pages
+    cost no more than the first; in id order, whole or filtered by type, the
+    seek is an index range scan. ``offset`` is still accepted for jumping
+    straight to a row.
+    """
+    permission_classes = [permissions.IsAuthenticated]
+    ordering_fields = ['id', 'name', 'equipment_type', 'flowrate', 'pressure', 'temperature']
+    default_limit = 100
+    max_limit = 1000
+
+    def get(self, request, pk):
+        summary = EquipmentSummary.objects.denormalized().owned_by(request.user).filter(pk=pk).first()
+        if not summary:
+            return Response({'error': 'Summary not found'}, status=status.HTTP_404_NOT_FOUND)
+
+        cursor = request.query_params.get('cursor')
+        try:
+            offset = 0 if cursor else max(int(request.query_params.get('offset', 0)), 0)
+            limit = min(max(int(request.query_params.get('limit', self.default_limit)), 1), self.max_limit)
+        except ValueError:
+            return Response({'error': 'offset and limit must be integers'}, status=status.HTTP_400_BAD_REQUEST)
+        ordering = request.query_params.get('ordering', 'id')
+        field = ordering.lstrip('-')
+        if field not in self.ordering_fields:
+            return Response({'error': f'ordering must be one of {self.ordering_fields}'}, status=status.HTTP_400_BAD_REQUEST)
+
+        records = EquipmentRecord.objects.filter(summary=summary)
+        # Totals come from the summary and its distribution where possible
+        # so paging doesn't need a COUNT over the whole upload
+        count = summary.total_count
+        equipment_type = request.query_params.get('type')
+        if equipment_type:
+            records = records.filter(equipment_type=equipment_type)
+            dist = summary.type_distribution.filter(equipment_type=equipment_type).first()
+            count = dist.count if dist else 0
+        name = request.query_params.get('name')
+        if name:
+            records = records.filter(name__startswith=name)
+            # Counted once, on the first page; cursor pages already know the total
+            count = None if cursor else records.count()
+
+        # Fetch one extra row to know whether another page exists
+        rows = list(after_cursor(records, ordering, cursor)[offset:offset + limit + 1])
+        page = rows[:limit]
+        next_url = None
+        if len(rows) > limit:
+            last = page[-1]
+            url = remove_query_param(request.build_absolute_uri(), 'offset')
+            next_url = replace_query_param(url, 'cursor', encode_cursor(getattr(last, field), last.pk))
+
+        return Response({
+            'count': count,
+            'offset': offset,
+            'limit': limit,
+            'next': next_url,
+            'results': EquipmentRecordSerializer(page, many=True).data,
+        })
+
+class TrendView(APIView):
+    """Hourly or daily rollups of the user's uploads, including ones pruned from history."""
+    permission_classes = [permissions.IsAuthenticated]
+    default_days = {SummaryRollup.HOUR: 2, SummaryRollup.DAY: 365}
+
+    def get(self, request):
+        granularity = request.query_params.get('granularity', SummaryRollup.DAY)
+        if granularity not in self.default_days:
+            return Response({'error': f'granularity must be one of {list(self.default_days)}'},
+                            status=status.HTTP_400_BAD_REQUEST)
+        try:
+            days = max(int(request.query_params.get('days', self.default_days[granularity])), 1)
+        except ValueError:
+            return Response({'error': 'days must be an integer'}, status=status.HTTP_400_BAD_REQUEST)
+
+        rollups = SummaryRollup.objects.filter(
+            owner=request.user,
+            granularity=granularity,
+            equipment_type=request.query_params.get('type', ''),
+            bucket_start__gte=timezone.now() - timedelta(days=days),
+        ).order_by('bucket_start')
+        return Response(SummaryRollupSerializer(rollups, many=True).data)
+
+class UploadJobView(APIView):
+    permission_classes = [permissions.IsAuthenticated]
+
+    def get(self, request, pk):
+        job = UploadJob.objects.filter(pk=pk, owner=request.user).first()
+        if not job:
+            return Response({'error': 'Job not found'}, status=status.HTTP_404_NOT_FOUND)
+        return Response(UploadJobSerializer(load_live_progress(job)).data)
+
 class GeneratePDFView(APIView):
     permission_classes = [permissions.IsAuthenticated]
 
+    def get(self, request):
+        return self.report_response(request, conditional=True)
+
     def post(self, request):
+        return self.report_response(request)
+
+    def report_response(self, request, conditional=False):
         # Generate PDF based on latest summary
-        summary = EquipmentSummary.objects.order_by('-created_at').first()
+        summary = EquipmentSummary.objects.owned_by(request.user).newest_first().first()
         if not summary:
             return Response({'error': 'No data available to generate report'}, status=status.HTTP_404_NOT_FOUND)
 
-        buffer = io.BytesIO()
-        p = canvas.Canvas(buffer, pagesize=letter)
-        width, height = letter
-
-        # Header
-        p.setFont("Helvetica-Bold", 16)
-        p.drawString(50, height - 50, "Chemical Equipment Parameter Report")
-        
-        p.setFont("Helvetica", 12)
-        p.drawString(50, height - 80, f"Date: {summary.created_at.strftime('%Y-%m-%d %H:%M:%S')}")
-
-        # Stats
-        p.drawString(50, height - 120, f"Total Equipment Count: {summary.total_count}")
-        p.drawString(50, height - 140, f"Average Flowrate: {summary.avg_flowrate:.2f}")
-        p.drawString(50, height - 160, f"Average Pressure: {summary.avg_pressure:.2f}")
-        p.drawString(50, height - 180, f"Average Temperature: {summary.avg_temperature:.2f}")
-
-        # Distribution
-        p.drawString(50, height - 220, "Equipment Type Distribution:")
-        y = height - 240
-        for dist in summary.type_distribution.all():
-            p.drawString(70, y, f"- {dist.equipment_type}: {dist.count}")
-            y -= 20
-
-        p.showPage()
-        p.save()
-
-        buffer.seek(0)
-        return HttpResponse(buffer, content_type='application/pdf')
+        # Summaries never change once created, so each report is rendered once
+        # and served from the on-disk cache after that. The ETag is the cache
+        # key, so a revalidation is answered without touching the file
+        key = report_key(summary)
+        etag = f'"{key}"'
+        if conditional and etag in request.headers.get('If-None-Match', ''):
+            response = HttpResponseNotModified()
+        else:
+            response = FileResponse(report_cache.open(summary, key), content_type='application/pdf',
+                                    filename='equipment_report.pdf')
+        response['ETag'] = etag
+        response['Cache-Control'] = 'private, no-cache'
+        return response
@@ -0,0 +1,72 @@
+"""Local pre-aggregation: summarise a CSV on this machine and send only the result.
+
+Files are folded through the same chemflow_stats Accumulator the backend
+ingests uploads with, so the state sent (count, per-column moments and
+t-digest, per-type partial aggregates) is exactly the server's own
+``SummaryAccumulator.to_state()``. It carries its layout version and digest
+compression, which the server checks against its own.
+"""
+import hashlib
+import os
+import sys
+
+import pandas as pd
+
+# The statistics kernel is shared with the backend and lives beside both
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "shared"))
+
+from chemflow_stats import NUMERIC_COLUMNS, Accumulator
+
+REQUIRED_COLUMNS = ["Equipment Name", "Type", "Flowrate", "Pressure", "Temperature"]
+CHUNK_ROWS = 100_000
+
+
+class HashingReader:
+    """Binary file wrapper that hashes (SHA-256) and counts bytes as the CSV parser reads them."""
+
+    def __init__(self, f):
+        self.f = f
+        self.hasher = hashlib.sha256()
+        self.position = 0
+
+    def read(self, size=-1):
+        data = self.f.read(size)
+        self.hasher.update(data)
+        self.position += len(data)
+        return data
+
+    def readline(self, size=-1):
+        data = self.f.readline(size)
+        self.hasher.update(data)
+        self.position += len(data)
+        return data
+
+    def __iter__(self):
+        return iter(self.readline, b"")
+
+    def hexdigest(self):
+        # Whatever the parser left unread still belongs in the hash
+        for block in iter(lambda: self.read(1024 * 1024), b""):
+            pass
+        return self.hasher.hexdigest()
+
+
+def aggregate_csv(path, progress=None, chunk_rows=CHUNK_ROWS):
+    """Stream ``path`` and return ``(state, content_hash)`` for the summary-ingest endpoint.
+
+    ``progress`` is called with (bytes read, file size) after every chunk.
+    Raises ValueError if a required column is missing.
+    """
+    summary = Accumulator()
+    with open(path, "rb") as f:
+        size = f.seek(0, 2)
+        f.seek(0)
+        reader = HashingReader(f)
+        dtypes = {col: "float64" for col in NUMERIC_COLUMNS}
+        dtypes.update({"Type": "category", "Equipment Name": str})
+        chunks = pd.read_csv(reader, usecols=REQUIRED_COLUMNS, dtype=dtypes, chunksize=chunk_rows)
+        for chunk in chunks:
+            summary.update(chunk)
+            if progress:
+                progress(reader.position, size)
+        return summary.to_state(), reader.hexdigest()
@@ -0,0 +1,122 @@
+import base64
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import time
+
+# Per-account cache databases and cached report files live here
+CACHE_DIR = os.path.join(os.path.expanduser("~"), ".chemflow", "cache")
+# Last signed-in account's Firebase tokens, so the next launch opens straight onto its cache
+SESSION_PATH = os.path.join(os.path.expanduser("~"), ".chemflow", "session.json")
+
+
+def account_key(token):
+    """Stable per-account name from a Firebase ID token, so accounts never share a cache.
+
+    Only the (unverified) payload is read; the backend still checks the token.
+    """
+    try:
+        payload = token.split(".")[1]
+        claims = json.loads(base64.urlsafe_b64decode(payload + "=" * (-len(payload) % 4)))
+        subject = claims.get("user_id") or claims["sub"]
+    except (IndexError, KeyError, ValueError, AttributeError):
+        subject = "default"
+    return hashlib.sha256(subject.encode()).hexdigest()[:16]
+
+
+def load_session(path=SESSION_PATH):
+    """``{'id_token', 'refresh_token'}`` saved by the last sign-in, or None."""
+    try:
+        with open(path) as f:
+            session = json.load(f)
+        return session if session.get("id_token") and session.get("refresh_token") else None
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def save_session(id_token, refresh_token, path=SESSION_PATH):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    # Readable by this user only: the refresh token signs the account in
+    fd = os.open(path + ".tmp", os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+    with os.fdopen(fd, "w") as f:
+        json.dump({"id_token": id_token, "refresh_token": refresh_token}, f)
+    os.replace(path + ".tmp", path)
+
+
+def clear_session(path=SESSION_PATH):
+    try:
+        os.remove(path)
+    except FileNotFoundError:
+        pass
+
+
+class LocalCache:
+    """On-disk copy of API responses and reports, revalidated with their ETags.
+
+    JSON bodies are kept in SQLite keyed by request path; reports are kept
+    as files next to it. The app paints from here at startup and when the
+    backend can't be reached, and asks the backend only whether its copy is
+    still current (If-None-Match), so an unchanged dashboard costs a 304.
+    """
+
+    def __init__(self, account, directory=CACHE_DIR):
+        self.directory = os.path.join(directory, account)
+        os.makedirs(self.directory, exist_ok=True)
+        self.db = sqlite3.connect(os.path.join(self.directory, "cache.sqlite3"))
+        self.db.execute("PRAGMA journal_mode=WAL")
+        self.db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "path TEXT PRIMARY KEY, etag TEXT, body TEXT, file TEXT, fetched_at REAL)"
+        )
+        self.db.commit()
+
+    def get(self, path):
+        """``{'etag', 'data', 'file', 'fetched_at'}`` for a cached path, or None."""
+        row = self.db.execute("SELECT etag, body, file, fetched_at FROM responses WHERE path = ?", (path,)).fetchone()
+        if row is None:
+            return None
+        etag, body, file, fetched_at = row
+        if file and not os.path.exists(file):
+            return None
+        return {"etag": etag, "data": json.loads(body) if body else None, "file": file, "fetched_at": fetched_at}
+
+    def etag(self, path):
+        entry = self.get(path)
+        return entry["etag"] if entry else None
+
+    def conditional_headers(self, path):
+        etag = self.etag(path)
+        return {"If-None-Match": etag} if etag else {}
+
+    def put(self, path, etag, data=None, file=None):
+        """Store a response; ``file`` is copied into the cache directory."""
+        if file is not None:
+            cached_file = os.path.join(self.directory, hashlib.sha256(path.encode()).hexdigest()[:16] + os.path.splitext(file)[1])
+            if os.path.abspath(file) != os.path.abspath(cached_file):
+                shutil.copyfile(file, cached_file)
+            file = cached_file
+        self.db.execute(
+            "INSERT OR REPLACE INTO responses (path, etag, body, file, fetched_at) VALUES (?, ?, ?, ?, ?)",
+            (path, etag, json.dumps(data) if data is not None else None, file, time.time()),
+        )
+        self.db.commit()
+
+    def touch(self, path):
+        # A 304 confirmed the cached copy is current
+        self.db.execute("UPDATE responses SET fetched_at = ? WHERE path = ?", (time.time(), path))
+        self.db.commit()
+
+    def delete(self, path):
+        entry = self.get(path)
+        if entry and entry["file"]:
+            try:
+                os.remove(entry["file"])
+            except FileNotFoundError:
+                pass
+        self.db.execute("DELETE FROM responses WHERE path = ?", (path,))
+        self.db.commit()
+
+    def close(self):
+        self.db.close()
@@ -1,18 +1,25 @@
 import sys
 import os
 import json
+import shutil
+import time
 import requests
 import pandas as pd
 from PyQt5.QtWidgets import (QApplication, QMainWindow, QWidget, QVBoxLayout, 
                              QHBoxLayout, QLabel, QLineEdit, QPushButton, 
                              QTableWidget, QTableWidgetItem, QFileDialog, 
-                             QMessageBox, QTabWidget, QGroupBox, QHeaderView, QDialog)
-from PyQt5.QtCore import Qt
+                             QMessageBox, QTabWidget, QGroupBox, QHeaderView, QDialog,
+                             QProgressBar, QCheckBox, QTableView, QComboBox)
+from PyQt5.QtCore import Qt, QTimer
 from PyQt5.QtGui import QFont
 from matplotlib.backends.backend_qt5agg import FigureCanvasQTAgg as FigureCanvas
 from matplotlib.figure import Figure
 import matplotlib.pyplot as plt
 
+from cache import LocalCache, account_key, clear_session, load_session, save_session
+from network import CHUNKED_UPLOAD_THRESHOLD, ApiClient
+from table_model import EquipmentTableModel
+
 # Check for Google Auth Library
 try:
     from google_auth_oauthlib.flow import InstalledAppFlow
@@ -23,6 +30,10 @@ except ImportError:
 
 # Configuration
 API_BASE_URL = "http://127.0.0.1:8000/api/"
+# How often a queued upload's job is polled until a worker finishes it
+JOB_POLL_INTERVAL_MS = 1000
+# Firebase ID tokens last an hour; the saved refresh token renews them before that
+TOKEN_REFRESH_INTERVAL_MS = 50 * 60 * 1000
 FIREBASE_API_KEY = os.getenv("FIREBASE_API_KEY")
 
 if not FIREBASE_API_KEY:
@@ -34,6 +45,7 @@ if not FIREBASE_API_KEY:
 FIREBASE_SIGNUP_URL = f"https://identitytoolkit.googleapis.com/v1/accounts:signUp?key={FIREBASE_API_KEY}"
 FIREBASE_SIGNIN_URL = f"https://identitytoolkit.googleapis.com/v1/accounts:signInWithPassword?key={FIREBASE_API_KEY}"
 FIREBASE_IDP_URL = f"https://identitytoolkit.googleapis.com/v1/accounts:signInWithIdp?key={FIREBASE_API_KEY}"
+FIREBASE_REFRESH_URL = f"https://securetoken.googleapis.com/v1/token?key={FIREBASE_API_KEY}"
 
 class RegisterDialog(QDialog):
     def __init__(self, parent=None):
@@ -95,6 +107,7 @@ class LoginWindow(QWidget):
         self.setFixedSize(350, 350)
         self.init_ui()
         self.token = None
+        self.refresh_token = None
 
     def init_ui(self):
         layout = QVBoxLayout()
@@ -179,6 +192,7 @@ class LoginWindow(QWidget):
             if response.status_code == 200:
                 data = response.json()
                 self.token = data['idToken']
+                self.refresh_token = data['refreshToken']
                 self.close()
             else:
                 error_msg = response.json().get('error', {}).get('message', 'Login Failed')
@@ -234,6 +248,7 @@ class LoginWindow(QWidget):
                 if response.status_code == 200:
                     data = response.json()
                     self.token = data['idToken']
+                    self.refresh_token = data['refreshToken']
                     self.close()
                 else:
                     error_msg = response.json().get('error', {}).get('message', 'Google Auth Failed')
@@ -246,16 +261,32 @@ class LoginWindow(QWidget):
 
 
 class MainWindow(QMainWindow):
-    def __init__(self, token):
+    def __init__(self, token, refresh_token=None):
         super().__init__()
         self.token = token
+        self.refresh_token = refresh_token
+        # Set when the saved sign-in was revoked, so the app asks for a new one
+        self.session_expired = False
+        self.token_renewed = False
         # Create Auth header for Backend API
         self.headers = {"Authorization": f"Bearer {token}"}
+        # All backend calls run off the GUI thread over one keep-alive session
+        self.api = ApiClient(API_BASE_URL, self.headers, self)
+        # Last responses and report on disk, so the window paints before (or without) the backend
+        self.cache = LocalCache(account_key(token))
         
         self.setWindowTitle("Chemical Equipment Parameter Visualizer")
         self.resize(1200, 800)
         self.init_ui()
-        self.fetch_data()
+        self.show_cached()
+        if refresh_token:
+            # A saved token may have expired while the app was closed; renew it, then revalidate
+            self.refresh_session()
+            self.token_timer = QTimer(self)
+            self.token_timer.timeout.connect(self.refresh_session)
+            self.token_timer.start(TOKEN_REFRESH_INTERVAL_MS)
+        else:
+            self.fetch_data()
 
     def init_ui(self):
         # Main Layout
@@ -268,10 +299,15 @@ class MainWindow(QMainWindow):
         self.upload_btn = QPushButton("Upload CSV File")
         self.upload_btn.clicked.connect(self.upload_file)
         self.upload_btn.setStyleSheet("background-color: #10b981; color: white; padding: 8px; font-weight: bold;")
+        # Summary-only mode: CSVs are aggregated here and only the result is sent
+        self.local_aggregate_check = QCheckBox("Aggregate locally")
+        self.local_aggregate_check.setToolTip("Summarise CSV files on this computer and upload only the summary "
+                                              "(much less data; individual rows are not stored on the server)")
         self.refresh_btn = QPushButton("Refresh Data")
-        self.refresh_btn.clicked.connect(self.fetch_data)
+        self.refresh_btn.clicked.connect(self.refresh)
         
         toolbar_layout.addWidget(self.upload_btn)
+        toolbar_layout.addWidget(self.local_aggregate_check)
         toolbar_layout.addWidget(self.refresh_btn)
         
         self.download_btn = QPushButton("Download PDF")
@@ -297,6 +333,22 @@ class MainWindow(QMainWindow):
         self.init_table_tab()
         self.tabs.addTab(self.table_tab, "Data Table")
 
+        # Tab 3: Every row of the latest upload, paged in from the server
+        self.rows_tab = QWidget()
+        self.init_rows_tab()
+        self.tabs.addTab(self.rows_tab, "Equipment Rows")
+
+        # Tab 4: Recent uploads
+        self.history_tab = QWidget()
+        self.init_history_tab()
+        self.tabs.addTab(self.history_tab, "History")
+
+        # Upload / download progress
+        self.progress_bar = QProgressBar()
+        self.progress_bar.setMaximumWidth(300)
+        self.progress_bar.hide()
+        self.statusBar().addPermanentWidget(self.progress_bar)
+
     def init_dashboard_tab(self):
         layout = QVBoxLayout(self.dashboard_tab)
         
@@ -352,53 +404,273 @@ class MainWindow(QMainWindow):
         header.setSectionResizeMode(QHeaderView.Stretch)
         layout.addWidget(self.table)
 
+    def init_rows_tab(self):
+        layout = QVBoxLayout(self.rows_tab)
+        filters_layout = QHBoxLayout()
+        filters_layout.addWidget(QLabel("Type:"))
+        self.type_filter = QComboBox()
+        self.type_filter.addItem("All types", None)
+        self.type_filter.currentIndexChanged.connect(self.apply_row_filters)
+        filters_layout.addWidget(self.type_filter)
+        filters_layout.addWidget(QLabel("Name starts with:"))
+        self.name_filter = QLineEdit()
+        self.name_filter.editingFinished.connect(self.apply_row_filters)
+        filters_layout.addWidget(self.name_filter)
+        filters_layout.addStretch()
+        layout.addLayout(filters_layout)
+
+        self.rows_model = EquipmentTableModel(self.api, self)
+        self.rows_view = QTableView()
+        self.rows_view.setModel(self.rows_model)
+        # Fixed row heights let the view skip measuring rows it isn't showing
+        self.rows_view.verticalHeader().setSectionResizeMode(QHeaderView.Fixed)
+        self.rows_view.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        self.rows_view.horizontalHeader().setSortIndicator(-1, Qt.AscendingOrder)
+        self.rows_view.setSortingEnabled(True)
+        layout.addWidget(self.rows_view)
+
+    def init_history_tab(self):
+        layout = QVBoxLayout(self.history_tab)
+        self.history_table = QTableWidget()
+        self.history_table.setColumnCount(5)
+        self.history_table.setHorizontalHeaderLabels(
+            ["Uploaded", "Equipment", "Avg Flowrate", "Avg Pressure", "Avg Temperature"])
+        self.history_table.horizontalHeader().setSectionResizeMode(QHeaderView.Stretch)
+        layout.addWidget(self.history_table)
+
+    def apply_row_filters(self):
+        self.rows_model.set_filters(self.type_filter.currentData(), self.name_filter.text().strip())
+
+    def show_rows(self, data):
+        if data['id'] == self.rows_model.summary_id:
+            return
+        self.type_filter.blockSignals(True)
+        self.type_filter.clear()
+        self.type_filter.addItem("All types", None)
+        for row in data['type_distribution']:
+            self.type_filter.addItem(row['equipment_type'], row['equipment_type'])
+        self.type_filter.blockSignals(False)
+        self.rows_model.filters = {}
+        self.name_filter.clear()
+        self.rows_model.show_summary(data['id'])
+
     def upload_file(self):
         options = QFileDialog.Options()
-        file_name, _ = QFileDialog.getOpenFileName(self, "Open CSV File", "", "CSV Files (*.csv);;All Files (*)", options=options)
-        if file_name:
-            try:
-                with open(file_name, 'rb') as f:
-                    files = {'file': (file_name, f, 'text/csv')}
-                    response = requests.post(f"{API_BASE_URL}upload/", files=files, headers=self.headers)
-                
-                if response.status_code == 201:
-                    QMessageBox.information(self, "Success", "File uploaded successfully")
-                    self.fetch_data()
-                else:
-                    QMessageBox.warning(self, "Error", f"Upload failed: {response.text}")
-            except Exception as e:
-                QMessageBox.critical(self, "Error", f"Could not upload file: {str(e)}")
+        file_names, _ = QFileDialog.getOpenFileNames(self, "Open CSV Files", "", "Data Files (*.csv *.parquet *.arrow *.feather *.zip);;All Files (*)", options=options)
+        if not file_names:
+            return
+        if len(file_names) > 1 or file_names[0].lower().endswith('.zip'):
+            self.upload_batch(file_names)
+            return
+        file_name = file_names[0]
+        self.upload_btn.setEnabled(False)
+        self.statusBar().showMessage(f"Uploading {os.path.basename(file_name)}...")
+        if self.local_aggregate_check.isChecked() and file_name.lower().endswith('.csv'):
+            self.api.upload_summary(file_name, on_done=self.upload_finished, on_error=self.upload_failed,
+                                    on_progress=self.show_progress)
+        elif os.path.getsize(file_name) > CHUNKED_UPLOAD_THRESHOLD:
+            # Large exports go up in checksummed chunks and resume after a dropped connection
+            self.api.upload_chunked(file_name, on_done=self.upload_finished, on_error=self.upload_failed,
+                                    on_progress=self.show_progress)
+        else:
+            self.api.post("upload/", upload=[("file", file_name)],
+                          on_done=self.upload_finished, on_error=self.upload_failed, on_progress=self.show_progress)
+
+    def upload_finished(self, response):
+        if response.status_code == 202:
+            # Queued for the background workers; follow the job until it settles
+            self.statusBar().showMessage("Processing upload...")
+            self.poll_job(response.json()["job_id"])
+            return
+        self.upload_btn.setEnabled(True)
+        self.hide_progress()
+        if response.status_code in (200, 201):
+            # 200: the same file was uploaded before and its summary is returned
+            message = "File uploaded successfully" if response.status_code == 201 else "File was already uploaded"
+            QMessageBox.information(self, "Success", message)
+            self.fetch_data()
+        else:
+            QMessageBox.warning(self, "Error", f"Upload failed: {response.text}")
+
+    def poll_job(self, job_id):
+        self.api.get(f"jobs/{job_id}/", key=f"job:{job_id}",
+                     on_done=lambda response: self.job_polled(job_id, response), on_error=self.upload_failed)
+
+    def job_polled(self, job_id, response):
+        if response.status_code != 200:
+            self.upload_finished(response)
+            return
+        job = response.json()
+        if job["status"] in ("queued", "running"):
+            self.show_progress(job["progress"], 100)
+            QTimer.singleShot(JOB_POLL_INTERVAL_MS, lambda: self.poll_job(job_id))
+            return
+        self.upload_btn.setEnabled(True)
+        self.hide_progress()
+        if job["status"] == "done":
+            QMessageBox.information(self, "Success", f"File uploaded successfully ({job['rows_processed']} rows)")
+            self.fetch_data()
+        else:
+            QMessageBox.warning(self, "Error", f"Upload failed: {job['error']}")
+
+    def upload_failed(self, message):
+        self.upload_btn.setEnabled(True)
+        self.hide_progress()
+        QMessageBox.critical(self, "Error", f"Could not upload file: {message}\n\nLarge files resume where they stopped when uploaded again.")
+
+    def upload_batch(self, file_names):
+        # Several CSVs (or ZIPs of CSVs) go up in one request and are committed together
+        self.upload_btn.setEnabled(False)
+        self.statusBar().showMessage(f"Uploading {len(file_names)} files...")
+        self.api.post("upload/batch/?combined=true", upload=[("files", name) for name in file_names],
+                      on_done=self.batch_finished, on_error=self.upload_failed, on_progress=self.show_progress)
+
+    def batch_finished(self, response):
+        self.upload_btn.setEnabled(True)
+        self.hide_progress()
+        if response.status_code == 201:
+            data = response.json()
+            QMessageBox.information(self, "Success", f"Uploaded {len(data['files'])} files ({data['rows']} rows) in {data['seconds']:.1f}s")
+            self.fetch_data()
+        else:
+            QMessageBox.warning(self, "Error", f"Upload failed: {response.text}")
 
     def download_pdf(self):
         options = QFileDialog.Options()
         file_path, _ = QFileDialog.getSaveFileName(self, "Save PDF Report", "chemical_equipment_report.pdf", "PDF Files (*.pdf);;All Files (*)", options=options)
         
         if file_path:
-            try:
-                response = requests.post(f"{API_BASE_URL}generate-pdf/", headers=self.headers)
-                
-                if response.status_code == 200:
-                    with open(file_path, 'wb') as f:
-                        f.write(response.content)
-                    QMessageBox.information(self, "Success", "PDF Report downloaded successfully")
-                else:
-                    QMessageBox.warning(self, "Error", f"Failed to generate PDF: {response.status_code}")
-            except Exception as e:
-                QMessageBox.critical(self, "Error", f"Could not download PDF: {str(e)}")
+            self.download_btn.setEnabled(False)
+            self.statusBar().showMessage("Downloading report...")
+            # Conditional GET: an unchanged report is copied from the cache instead of downloaded
+            self.api.get("generate-pdf/", save_to=file_path, headers=self.cache.conditional_headers("generate-pdf/"),
+                         on_done=lambda response: self.download_finished(response, file_path),
+                         on_error=lambda message: self.download_failed(message, file_path),
+                         on_progress=self.show_progress)
+
+    def download_finished(self, response, file_path):
+        self.download_btn.setEnabled(True)
+        self.hide_progress()
+        if response.status_code == 200:
+            self.cache.put("generate-pdf/", response.headers.get("ETag"), file=file_path)
+            QMessageBox.information(self, "Success", "PDF Report downloaded successfully")
+        elif response.status_code == 304 and self.copy_cached_report(file_path):
+            QMessageBox.information(self, "Success", "PDF Report saved (unchanged since the last download)")
+        else:
+            QMessageBox.warning(self, "Error", f"Failed to generate PDF: {response.status_code}")
+
+    def download_failed(self, message, file_path):
+        self.download_btn.setEnabled(True)
+        self.hide_progress()
+        if self.copy_cached_report(file_path):
+            QMessageBox.information(self, "Offline", "The server could not be reached; saved the last downloaded report instead")
+        else:
+            QMessageBox.critical(self, "Error", f"Could not download PDF: {message}")
+
+    def copy_cached_report(self, file_path):
+        entry = self.cache.get("generate-pdf/")
+        if not entry:
+            return False
+        shutil.copyfile(entry["file"], file_path)
+        return True
+
+    def show_progress(self, done, total):
+        self.progress_bar.show()
+        if total:
+            # Percent, so multi-GB byte counts stay within the bar's int range
+            self.progress_bar.setRange(0, 100)
+            self.progress_bar.setValue(int(done * 100 / total))
+        else:
+            self.progress_bar.setRange(0, 0)
+
+    def hide_progress(self):
+        self.progress_bar.hide()
+        self.statusBar().clearMessage()
+
+    def show_cached(self):
+        history = self.cache.get("history/")
+        if history and history["data"] is not None:
+            self.update_history(history["data"])
+        entry = self.cache.get("summary/")
+        if entry and entry["data"]:
+            self.update_ui(entry["data"])
+            self.statusBar().showMessage(f"Showing data cached at {self.cached_time(entry)}; refreshing...")
+
+    def cached_time(self, entry):
+        return time.strftime("%Y-%m-%d %H:%M", time.localtime(entry["fetched_at"]))
+
+    def refresh_session(self):
+        # Sent to Firebase, so without the backend's Authorization header
+        self.api.post(FIREBASE_REFRESH_URL, data={"grant_type": "refresh_token", "refresh_token": self.refresh_token},
+                      headers={"Authorization": None}, key="session",
+                      on_done=self.session_refreshed, on_error=self.fetch_failed)
+
+    def session_refreshed(self, response):
+        if response.status_code == 200:
+            data = response.json()
+            self.token, self.refresh_token = data["id_token"], data["refresh_token"]
+            self.token_renewed = True
+            self.api.session.headers["Authorization"] = f"Bearer {self.token}"
+            save_session(self.token, self.refresh_token)
+            self.fetch_data()
+        elif response.status_code in (400, 401, 403):
+            # The sign-in was revoked (password changed, account disabled): forget it and ask again
+            clear_session()
+            self.session_expired = True
+            QMessageBox.information(self, "Signed out", "Your session has expired. Please sign in again.")
+            self.close()
+        else:
+            self.fetch_failed(f"HTTP {response.status_code}")
 
     def fetch_data(self):
-        try:
-            response = requests.get(f"{API_BASE_URL}summary/", headers=self.headers)
-            if response.status_code == 200:
-                data = response.json()
-                self.update_ui(data)
-            elif response.status_code == 404:
-                # No data available
-                pass
-            else:
-                print(f"Failed to fetch data: {response.status_code}")
-        except Exception as e:
-            print(f"Error fetching data: {e}")
+        # Revalidates the cached summary and history; repeated refreshes while one is in flight share its response
+        self.api.get_cached("summary/", self.cache, key="summary", on_data=self.summary_loaded,
+                            on_error=self.fetch_failed, on_missing=self.clear_ui)
+        self.api.get_cached("history/", self.cache, key="history", on_data=self.history_loaded)
+
+    def refresh(self):
+        # Offline at startup, the saved token was never renewed and may have expired since
+        if self.refresh_token and not self.token_renewed:
+            self.refresh_session()
+        else:
+            self.fetch_data()
+
+    def history_loaded(self, data, changed):
+        if changed:
+            self.update_history(data)
+
+    def summary_loaded(self, data, changed):
+        # A 304 leaves what is already painted alone
+        if changed:
+            self.update_ui(data)
+        self.statusBar().clearMessage()
+
+    def fetch_failed(self, message):
+        entry = self.cache.get("summary/")
+        if entry:
+            self.statusBar().showMessage(f"Offline: showing data cached at {self.cached_time(entry)}")
+        else:
+            print(f"Error fetching data: {message}")
+
+    def closeEvent(self, event):
+        self.cache.close()
+        super().closeEvent(event)
+
+    def clear_ui(self):
+        # The server has no summary any more (nothing uploaded, or all pruned): don't keep showing the old one
+        for card in (self.card_total, self.card_flow, self.card_press, self.card_temp):
+            self.update_card(card, "No data")
+        self.pie_figure.clear()
+        self.pie_canvas.draw()
+        self.bar_figure.clear()
+        self.bar_canvas.draw()
+        self.update_table([])
+        self.type_filter.blockSignals(True)
+        self.type_filter.clear()
+        self.type_filter.addItem("All types", None)
+        self.type_filter.blockSignals(False)
+        self.rows_model.show_summary(None)
+        self.statusBar().showMessage("No data uploaded yet")
 
     def update_ui(self, data):
         # Update Cards
@@ -412,6 +684,7 @@ class MainWindow(QMainWindow):
 
         # Update Table
         self.update_table(data['type_distribution'])
+        self.show_rows(data)
 
     def update_charts(self, data):
         # Pie Chart
@@ -442,19 +715,40 @@ class MainWindow(QMainWindow):
             self.table.setItem(i, 0, QTableWidgetItem(row['equipment_type']))
             self.table.setItem(i, 1, QTableWidgetItem(str(row['count'])))
 
+    def update_history(self, summaries):
+        self.history_table.setRowCount(len(summaries))
+        for i, summary in enumerate(summaries):
+            uploaded = summary['created_at'][:16].replace('T', ' ')
+            values = [uploaded, str(summary['total_count'])] + [
+                f"{summary[field]:.2f}" for field in ('avg_flowrate', 'avg_pressure', 'avg_temperature')]
+            for column, value in enumerate(values):
+                self.history_table.setItem(i, column, QTableWidgetItem(value))
+
+def run(app):
+    """Open the dashboard for the saved sign-in, or ask for one; again whenever a saved one is revoked."""
+    session = load_session()
+    while True:
+        if session is None:
+            login = LoginWindow()
+            login.show()
+            # Block until login window closes
+            app.exec_()
+            if not login.token:
+                return 0
+            session = {"id_token": login.token, "refresh_token": login.refresh_token}
+            save_session(login.token, login.refresh_token)
+        # Painted from the account's cache straight away; the token is renewed in the background
+        window = MainWindow(session["id_token"], session["refresh_token"])
+        window.show()
+        code = app.exec_()
+        if not window.session_expired:
+            return code
+        session = None
+
 if __name__ == '__main__':
     app = QApplication(sys.argv)
     
     # Apply Fusion style for better look
     app.setStyle('Fusion')
     
-    login = LoginWindow()
-    login.show()
-    
-    # Block until login window closes
-    app.exec_()
-    
-    if login.token:
-        window = MainWindow(login.token)
-        window.show()
-        sys.exit(app.exec_())
+    sys.exit(run(app))
@@ -0,0 +1,368 @@
+import hashlib
+import json
+import os
+import time
+import uuid
+
+import requests
+from requests.adapters import HTTPAdapter
+from PyQt5.QtCore import QObject, QRunnable, QThreadPool, pyqtSignal
+
+from aggregate import aggregate_csv
+
+# Worker threads for API calls; uploads, downloads and refreshes can overlap
+NETWORK_THREADS = 4
+# Bytes read per step when streaming request and response bodies
+STREAM_CHUNK_SIZE = 256 * 1024
+# Files larger than this go up as resumable chunks rather than one multipart body
+CHUNKED_UPLOAD_THRESHOLD = 32 * 1024 * 1024
+# Attempts per chunk before a chunked upload gives up (it can still be resumed later)
+CHUNK_RETRIES = 5
+# Server-side ids of unfinished chunked uploads, so a restarted app resumes them
+RESUME_STATE_PATH = os.path.join(os.path.expanduser("~"), ".chemflow", "chunked_uploads.json")
+
+
+class MultipartBody:
+    """multipart/form-data body that reads files from disk as it is sent.
+
+    requests streams any object with ``read`` and ``__len__`` (with a
+    Content-Length), so nothing is held in memory beyond one chunk, and
+    ``progress`` is called with (bytes sent, total) as the server takes it.
+    """
+
+    def __init__(self, files, progress=None):
+        # files: [(field name, path)]
+        self.boundary = uuid.uuid4().hex
+        self.progress = progress
+        self.parts = []
+        for field, path in files:
+            head = (f'--{self.boundary}\r\n'
+                    f'Content-Disposition: form-data; name="{field}"; filename="{os.path.basename(path)}"\r\n'
+                    f'Content-Type: application/octet-stream\r\n\r\n').encode()
+            self.parts += [head, path, b"\r\n"]
+        self.parts.append(f"--{self.boundary}--\r\n".encode())
+        self.total = sum(len(p) if isinstance(p, bytes) else os.path.getsize(p) for p in self.parts)
+        self.sent = 0
+        self.current = None
+
+    @property
+    def content_type(self):
+        return f"multipart/form-data; boundary={self.boundary}"
+
+    def __len__(self):
+        return self.total
+
+    def read(self, size=-1):
+        size = STREAM_CHUNK_SIZE if size is None or size < 0 else size
+        while self.parts or self.current:
+            if self.current is None:
+                part = self.parts.pop(0)
+                if isinstance(part, bytes):
+                    return self._advance(part)
+                self.current = open(part, "rb")
+            data = self.current.read(size)
+            if data:
+                return self._advance(data)
+            self.current.close()
+            self.current = None
+        return b""
+
+    def _advance(self, data):
+        # http.client reads 8 KiB at a time; report about once per STREAM_CHUNK_SIZE
+        before, self.sent = self.sent, self.sent + len(data)
+        if self.progress and (self.sent // STREAM_CHUNK_SIZE != before // STREAM_CHUNK_SIZE or self.sent == self.total):
+            self.progress(self.sent, self.total)
+        return data
+
+    def close(self):
+        if self.current:
+            self.current.close()
+            self.current = None
+
+
+class RequestSignals(QObject):
+    # Created on the GUI thread, so slots run there even though the worker emits
+    finished = pyqtSignal(object)
+    failed = pyqtSignal(str)
+    # object, not int: byte counts of multi-GB files overflow a C int
+    progress = pyqtSignal(object, object)
+
+
+class ApiRequest(QRunnable):
+    """One HTTP call on a pool thread; the response (body already read) comes back via ``signals.finished``."""
+
+    def __init__(self, session, method, url, save_to=None, upload=None, **kwargs):
+        super().__init__()
+        self.session = session
+        self.method = method
+        self.url = url
+        self.save_to = save_to
+        self.upload = upload
+        self.kwargs = kwargs
+        self.signals = RequestSignals()
+
+    def run(self):
+        try:
+            if self.upload:
+                body = MultipartBody(self.upload, self.signals.progress.emit)
+                headers = dict(self.kwargs.pop("headers", {}), **{"Content-Type": body.content_type})
+                try:
+                    response = self.session.request(self.method, self.url, data=body, headers=headers, **self.kwargs)
+                finally:
+                    body.close()
+            elif self.save_to:
+                response = self.download()
+            else:
+                response = self.session.request(self.method, self.url, **self.kwargs)
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+            return
+        self.signals.finished.emit(response)
+
+    def download(self):
+        # Streamed to disk so a large report never sits in memory whole
+        response = self.session.request(self.method, self.url, stream=True, **self.kwargs)
+        with response:
+            if response.status_code != 200:
+                # Load the error body before the connection goes back to the pool
+                response.content
+                return response
+            total = int(response.headers.get("Content-Length") or 0)
+            received = 0
+            with open(self.save_to, "wb") as f:
+                for chunk in response.iter_content(STREAM_CHUNK_SIZE):
+                    f.write(chunk)
+                    received += len(chunk)
+                    self.signals.progress.emit(received, total)
+        return response
+
+
+def load_resume_state():
+    try:
+        with open(RESUME_STATE_PATH) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_resume_state(key, upload_id):
+    state = load_resume_state()
+    if upload_id is None:
+        state.pop(key, None)
+    else:
+        state[key] = upload_id
+    os.makedirs(os.path.dirname(RESUME_STATE_PATH), exist_ok=True)
+    with open(RESUME_STATE_PATH, "w") as f:
+        json.dump(state, f)
+
+
+class ChunkedUploadTask(QRunnable):
+    """Send a large file through the resumable chunk endpoints, then process it.
+
+    Only chunks the server hasn't acknowledged are sent, so a retry (or a
+    later run of the app on the same unchanged file) picks up where the
+    last one stopped. The assembled file is queued for the background
+    workers rather than processed inside the request, so ``finished``
+    carries the ``complete`` response (a 202 with the job to poll), or the
+    first error response.
+    """
+
+    def __init__(self, session, base_url, path):
+        super().__init__()
+        self.session = session
+        self.base_url = f"{base_url}upload/chunked/"
+        self.path = path
+        self.signals = RequestSignals()
+
+    def run(self):
+        try:
+            response = self.upload()
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+            return
+        self.signals.finished.emit(response)
+
+    def upload(self):
+        size = os.path.getsize(self.path)
+        key = f"{os.path.abspath(self.path)}|{size}|{int(os.path.getmtime(self.path))}"
+        status = None
+        upload_id = load_resume_state().get(key)
+        if upload_id:
+            response = self.session.get(f"{self.base_url}{upload_id}/")
+            if response.status_code == 200:
+                status = response.json()
+        if status is None:
+            response = self.session.post(self.base_url, json={"file_name": os.path.basename(self.path), "file_size": size})
+            if response.status_code != 201:
+                return response
+            status = response.json()
+            save_resume_state(key, status["id"])
+
+        url = f"{self.base_url}{status['id']}/"
+        chunk_size = status["chunk_size"]
+        missing = status["missing"]
+        sent = size - sum(min(chunk_size, size - index * chunk_size) for index in missing)
+        self.signals.progress.emit(sent, size)
+        with open(self.path, "rb") as f:
+            for index in missing:
+                f.seek(index * chunk_size)
+                data = f.read(chunk_size)
+                response = self.put_chunk(f"{url}chunks/{index}/", data)
+                if response.status_code != 200:
+                    return response
+                sent += len(data)
+                self.signals.progress.emit(sent, size)
+
+        # A file this large could outlast the request timeout if processed inline
+        response = self.session.post(f"{url}complete/", params={"async": "true"})
+        if response.status_code < 500:
+            # Queued, rejected or gone: nothing left to resume
+            save_resume_state(key, None)
+        return response
+
+    def put_chunk(self, url, data):
+        headers = {"Content-Type": "application/octet-stream", "X-Chunk-SHA256": hashlib.sha256(data).hexdigest()}
+        for attempt in range(CHUNK_RETRIES):
+            last = attempt == CHUNK_RETRIES - 1
+            try:
+                response = self.session.put(url, data=data, headers=headers)
+            except (requests.ConnectionError, requests.Timeout):
+                if last:
+                    raise
+            else:
+                # 400 means the chunk arrived damaged; send it again like a dropped one
+                retry = response.status_code == 400 or response.status_code >= 500
+                if not retry or last:
+                    return response
+            time.sleep(2 ** attempt)
+
+
+class SummaryUploadTask(QRunnable):
+    """Aggregate a CSV locally and post just the summary state; progress is bytes parsed."""
+
+    def __init__(self, session, base_url, path):
+        super().__init__()
+        self.session = session
+        self.url = f"{base_url}upload/summary/"
+        self.path = path
+        self.signals = RequestSignals()
+
+    def run(self):
+        try:
+            state, content_hash = aggregate_csv(self.path, self.signals.progress.emit)
+            response = self.session.post(self.url, json={
+                "file_name": os.path.basename(self.path), "content_hash": content_hash, "state": state,
+            })
+        except Exception as e:
+            self.signals.failed.emit(str(e))
+            return
+        self.signals.finished.emit(response)
+
+
+class ApiClient(QObject):
+    """Runs backend calls on a thread pool over one keep-alive ``requests.Session``.
+
+    Callbacks are invoked on the GUI thread. Calls made with a ``key`` while
+    an earlier call with the same key is still in flight don't go out again:
+    they are answered by that call's response.
+    """
+
+    def __init__(self, base_url, headers=None, parent=None):
+        super().__init__(parent)
+        self.base_url = base_url
+        self.session = requests.Session()
+        adapter = HTTPAdapter(pool_connections=1, pool_maxsize=NETWORK_THREADS)
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+        self.session.headers.update(headers or {})
+        self.pool = QThreadPool(self)
+        self.pool.setMaxThreadCount(NETWORK_THREADS)
+        self.in_flight = {}
+        # Signal objects of running calls, kept alive until their queued results are delivered
+        self.running = set()
+
+    def request(self, method, path, on_done=None, on_error=None, on_progress=None, key=None, **kwargs):
+        if key is not None and key in self.in_flight:
+            self.in_flight[key].append((on_done, on_error, on_progress))
+            return
+        url = path if path.startswith("http") else f"{self.base_url}{path}"
+        self.start(ApiRequest(self.session, method, url, **kwargs), (on_done, on_error, on_progress), key)
+
+    def get_cached(self, path, cache, on_data=None, on_error=None, on_missing=None, key=None):
+        """GET ``path``, revalidating ``cache``'s copy with If-None-Match.
+
+        ``on_data(data, changed)`` gets the fresh body (and stores it) after
+        a 200, or the cached body with ``changed=False`` after a 304. A 404
+        drops the cached copy and calls ``on_missing()``, so whatever was
+        painted from it can be cleared; other failures go to ``on_error``.
+        """
+        def done(response):
+            if response.status_code == 304:
+                cache.touch(path)
+                entry = cache.get(path)
+                if on_data and entry:
+                    on_data(entry["data"], False)
+            elif response.status_code == 200:
+                data = response.json()
+                cache.put(path, response.headers.get("ETag"), data)
+                if on_data:
+                    on_data(data, True)
+            elif response.status_code == 404:
+                cache.delete(path)
+                if on_missing:
+                    on_missing()
+            elif on_error:
+                on_error(f"HTTP {response.status_code}")
+
+        self.get(path, headers=cache.conditional_headers(path), key=key, on_done=done, on_error=on_error)
+
+    def upload_chunked(self, path, on_done=None, on_error=None, on_progress=None):
+        """Upload ``path`` through the resumable chunk endpoints."""
+        self.start(ChunkedUploadTask(self.session, self.base_url, path), (on_done, on_error, on_progress))
+
+    def upload_summary(self, path, on_done=None, on_error=None, on_progress=None):
+        """Summarise the CSV at ``path`` on this machine and upload only the summary."""
+        self.start(SummaryUploadTask(self.session, self.base_url, path), (on_done, on_error, on_progress))
+
+    def start(self, task, callbacks, key=None):
+        signals = task.signals
+        waiting = [callbacks]
+        if key is not None:
+            self.in_flight[key] = waiting
+
+        def settle():
+            self.running.discard(signals)
+            if key is not None:
+                self.in_flight.pop(key, None)
+
+        def done(response):
+            settle()
+            for on_done, _, _ in waiting:
+                if on_done:
+                    on_done(response)
+
+        def failed(message):
+            settle()
+            for _, on_error, _ in waiting:
+                if on_error:
+                    on_error(message)
+
+        def progress(sent, total):
+            for _, _, on_progress in waiting:
+                if on_progress:
+                    on_progress(sent, total)
+
+        signals.finished.connect(done)
+        signals.failed.connect(failed)
+        signals.progress.connect(progress)
+        self.running.add(signals)
+        self.pool.start(task)
+
+    def get(self, path, **kwargs):
+        self.request("GET", path, **kwargs)
+
+    def post(self, path, **kwargs):
+        self.request("POST", path, **kwargs)
+
+    def busy(self, key):
+        return key in self.in_flight
@@ -0,0 +1,170 @@
+from collections import OrderedDict
+
+from PyQt5.QtCore import QAbstractTableModel, QModelIndex, Qt, QTimer
+
+# Rows per request to summaries/<pk>/equipment/ (the server allows up to 1000)
+PAGE_SIZE = 500
+# Pages held in memory; older ones are dropped and refetched if scrolled back to
+MAX_CACHED_PAGES = 40
+# Wait before asking again for a page whose request failed, doubling per failure up to the maximum
+PAGE_RETRY_MS = 1000
+MAX_PAGE_RETRY_MS = 30_000
+
+
+class EquipmentTableModel(QAbstractTableModel):
+    """Rows of one upload, fetched a page at a time as the view scrolls to them.
+
+    Only the row count is known up front. A page is requested the first time
+    any of its rows is painted, kept as column lists, and evicted once more
+    than MAX_CACHED_PAGES are held, so memory stays flat however many rows
+    the upload has. Sorting and filtering are done by the server. Scrolling
+    on follows each page's ``next`` cursor; a jump to an unseen page falls
+    back to an offset. A page that fails to load shows placeholders and is
+    asked for again after a backoff, if its rows are still on screen.
+    """
+    COLUMNS = [
+        ("name", "Equipment Name"),
+        ("equipment_type", "Type"),
+        ("flowrate", "Flowrate"),
+        ("pressure", "Pressure"),
+        ("temperature", "Temperature"),
+    ]
+
+    def __init__(self, api, parent=None):
+        super().__init__(parent)
+        self.api = api
+        self.summary_id = None
+        self.row_count = 0
+        self.ordering = "id"
+        self.filters = {}
+        self.pages = OrderedDict()
+        # Cursor URL of each page, from the ``next`` link of the page before it
+        self.next_urls = {}
+        # Failures so far of pages waiting out their retry delay
+        self.failures = {}
+        self.retrying = set()
+        # Bumped on every reset so replies to superseded queries are ignored
+        self.generation = 0
+
+    def rowCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else self.row_count
+
+    def columnCount(self, parent=QModelIndex()):
+        return 0 if parent.isValid() else len(self.COLUMNS)
+
+    def headerData(self, section, orientation, role=Qt.DisplayRole):
+        if role != Qt.DisplayRole:
+            return None
+        if orientation == Qt.Horizontal:
+            return self.COLUMNS[section][1]
+        return section + 1
+
+    def data(self, index, role=Qt.DisplayRole):
+        if not index.isValid() or role not in (Qt.DisplayRole, Qt.TextAlignmentRole):
+            return None
+        field = self.COLUMNS[index.column()][0]
+        if role == Qt.TextAlignmentRole:
+            return int(Qt.AlignLeft if field in ("name", "equipment_type") else Qt.AlignRight) | int(Qt.AlignVCenter)
+        page_number, offset = divmod(index.row(), PAGE_SIZE)
+        page = self.pages.get(page_number)
+        if page is None:
+            if page_number not in self.retrying:
+                self.fetch_page(page_number)
+            return "…"
+        self.pages.move_to_end(page_number)
+        values = page[field]
+        if offset >= len(values):
+            return None
+        value = values[offset]
+        if value is None:
+            return ""
+        return f"{value:.2f}" if isinstance(value, float) else str(value)
+
+    def sort(self, column, order=Qt.AscendingOrder):
+        # column is -1 when the view clears its sort indicator: back to upload order
+        field = self.COLUMNS[column][0] if column >= 0 else "id"
+        self.ordering = field if order == Qt.AscendingOrder else f"-{field}"
+        self.reload()
+
+    def show_summary(self, summary_id):
+        self.summary_id = summary_id
+        self.reload()
+
+    def set_filters(self, equipment_type=None, name=None):
+        self.filters = {key: value for key, value in (("type", equipment_type), ("name", name)) if value}
+        self.reload()
+
+    def reload(self):
+        """Drop cached pages and refetch the first one, which also brings the new row count."""
+        self.beginResetModel()
+        self.generation += 1
+        self.pages.clear()
+        self.next_urls.clear()
+        self.failures.clear()
+        self.retrying.clear()
+        self.row_count = 0
+        self.endResetModel()
+        if self.summary_id is not None:
+            self.fetch_page(0)
+
+    def fetch_page(self, page_number):
+        generation = self.generation
+        url = self.next_urls.get(page_number)
+        params = None
+        if url is None:
+            url = f"summaries/{self.summary_id}/equipment/"
+            params = dict(self.filters, offset=page_number * PAGE_SIZE, limit=PAGE_SIZE, ordering=self.ordering)
+        # Keyed per page, so repaints while a page is in flight don't request it again
+        self.api.get(url, params=params,
+                     key=f"equipment:{generation}:{page_number}",
+                     on_done=lambda response: self.page_loaded(generation, page_number, response),
+                     on_error=lambda message: self.page_loaded(generation, page_number, None))
+
+    def page_loaded(self, generation, page_number, response):
+        if generation != self.generation:
+            return
+        if response is None or response.status_code != 200:
+            # Not cached, so it loads once the server is back; repaints meanwhile don't re-request it
+            failures = self.failures[page_number] = self.failures.get(page_number, 0) + 1
+            self.retrying.add(page_number)
+            delay = min(PAGE_RETRY_MS * 2 ** (failures - 1), MAX_PAGE_RETRY_MS)
+            QTimer.singleShot(delay, lambda: self.retry_page(generation, page_number))
+            return
+        self.failures.pop(page_number, None)
+        data = response.json()
+        rows = data["results"]
+        self.pages[page_number] = {field: [row[field] for row in rows] for field, _ in self.COLUMNS}
+        while len(self.pages) > MAX_CACHED_PAGES:
+            self.pages.popitem(last=False)
+        if data.get("next"):
+            self.next_urls[page_number + 1] = data["next"]
+
+        # Cursor pages of a name-filtered query don't repeat the count
+        count = data["count"] if data["count"] is not None else self.row_count
+        if len(rows) < PAGE_SIZE:
+            # A short page is the last one (summaries aggregated on the client have no rows at all)
+            count = min(count, page_number * PAGE_SIZE + len(rows))
+        if count != self.row_count:
+            # First page of a query (or the upload's count changed): resize the view
+            self.beginResetModel()
+            self.row_count = count
+            self.endResetModel()
+            return
+        first = page_number * PAGE_SIZE
+        last = min(first + len(rows), self.row_count) - 1
+        if last >= first:
+            self.dataChanged.emit(self.index(first, 0), self.index(last, len(self.COLUMNS) - 1))
+
+    def retry_page(self, generation, page_number):
+        if generation != self.generation:
+            return
+        self.retrying.discard(page_number)
+        if not self.row_count:
+            # The first page brings the row count; until then there are no rows to repaint
+            self.fetch_page(page_number)
+            return
+        # Repainting the rows asks for the page again, but only if they are still in view
+        first = page_number * PAGE_SIZE
+        last = min(first + PAGE_SIZE, self.row_count) - 1
+        if last >= first:
+            self.dataChanged.emit(self.index(first, 0), self.index(last, len(self.COLUMNS) - 1))
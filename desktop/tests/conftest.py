@@ -0,0 +1,70 @@
+import os
+import sys
+import time
+
+import pytest
+
+# The client's modules are imported the way main.py imports them, from the desktop directory
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+
+
+@pytest.fixture
+def qapp():
+    QtCore = pytest.importorskip("PyQt5.QtCore")
+    return QtCore.QCoreApplication.instance() or QtCore.QCoreApplication([])
+
+
+@pytest.fixture
+def wait_for(qapp):
+    """Process Qt events until ``condition()`` holds, so queued signals from worker threads are delivered."""
+    def wait(condition, timeout=5.0):
+        deadline = time.monotonic() + timeout
+        while not condition():
+            assert time.monotonic() < deadline, "timed out waiting for the event loop"
+            qapp.processEvents()
+            time.sleep(0.005)
+    return wait
+
+
+class FakeResponse:
+    def __init__(self, status_code, data=None, headers=None):
+        self.status_code = status_code
+        self.data = data
+        self.headers = headers or {}
+
+    def json(self):
+        return self.data
+
+
+class FakeSession:
+    """Stands in for ``requests.Session.request``: records each call and answers with the next queued reply.
+
+    A reply is ``(status, data, headers)``, or an exception to raise as a
+    connection failure would. ``gate``, when set, holds every call until it
+    is released, to keep requests in flight.
+    """
+
+    def __init__(self):
+        self.replies = []
+        self.calls = []
+        self.gate = None
+
+    def reply(self, status, data=None, headers=None):
+        self.replies.append((status, data, headers))
+
+    def fail(self, error):
+        self.replies.append(error)
+
+    def request(self, method, url, **kwargs):
+        self.calls.append((method, url, kwargs))
+        if self.gate is not None:
+            self.gate.wait(5)
+        reply = self.replies.pop(0)
+        if isinstance(reply, Exception):
+            raise reply
+        return FakeResponse(*reply)
+
+
+@pytest.fixture
+def fake_session():
+    return FakeSession()
@@ -0,0 +1,76 @@
+import base64
+import json
+import os
+import stat
+
+from cache import LocalCache, account_key, clear_session, load_session, save_session
+
+
+def make_token(claims):
+    payload = base64.urlsafe_b64encode(json.dumps(claims).encode()).decode().rstrip("=")
+    return f"header.{payload}.signature"
+
+
+def test_responses_are_revalidated_with_their_etag(tmp_path, monkeypatch):
+    cache = LocalCache("account", directory=str(tmp_path))
+    assert cache.get("summary/") is None
+    assert cache.conditional_headers("summary/") == {}
+
+    monkeypatch.setattr("cache.time.time", lambda: 100.0)
+    cache.put("summary/", '"v1"', {"total_count": 3})
+    assert cache.conditional_headers("summary/") == {"If-None-Match": '"v1"'}
+    assert cache.get("summary/") == {"etag": '"v1"', "data": {"total_count": 3}, "file": None, "fetched_at": 100.0}
+
+    # A 304 only marks the copy as current again
+    monkeypatch.setattr("cache.time.time", lambda: 200.0)
+    cache.touch("summary/")
+    assert cache.get("summary/")["fetched_at"] == 200.0
+
+    cache.put("summary/", '"v2"', {"total_count": 4})
+    assert cache.get("summary/")["data"] == {"total_count": 4}
+    cache.delete("summary/")
+    assert cache.conditional_headers("summary/") == {}
+    cache.close()
+
+
+def test_entries_survive_a_restart_and_lost_report_files_are_dropped(tmp_path):
+    report = tmp_path / "report.pdf"
+    report.write_bytes(b"%PDF")
+    cache = LocalCache("account", directory=str(tmp_path))
+    cache.put("generate-pdf/", '"r1"', file=str(report))
+    cache.put("history/", '"h1"', [])
+    cache.close()
+
+    cache = LocalCache("account", directory=str(tmp_path))
+    cached_file = cache.get("generate-pdf/")["file"]
+    assert open(cached_file, "rb").read() == b"%PDF"
+    # An empty history is still a cached answer
+    assert cache.get("history/")["data"] == []
+
+    os.remove(cached_file)
+    assert cache.get("generate-pdf/") is None
+    cache.close()
+
+
+def test_accounts_get_separate_caches():
+    first = account_key(make_token({"user_id": "alice"}))
+    assert first == account_key(make_token({"sub": "alice", "iat": 1}))
+    assert first != account_key(make_token({"user_id": "bob"}))
+    assert account_key("not a token") == account_key("")
+
+
+def test_session_is_saved_privately_and_cleared(tmp_path):
+    path = str(tmp_path / "session.json")
+    assert load_session(path) is None
+
+    save_session("id", "refresh", path)
+    assert load_session(path) == {"id_token": "id", "refresh_token": "refresh"}
+    assert stat.S_IMODE(os.stat(path).st_mode) == 0o600
+
+    clear_session(path)
+    assert load_session(path) is None
+    clear_session(path)
+
+    with open(path, "w") as f:
+        f.write("{not json")
+    assert load_session(path) is None
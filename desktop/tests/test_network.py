@@ -0,0 +1,82 @@
+import threading
+
+import pytest
+
+pytest.importorskip("PyQt5")
+
+from cache import LocalCache
+from network import ApiClient
+
+
+@pytest.fixture
+def client(qapp, fake_session, monkeypatch):
+    client = ApiClient("http://backend/api/")
+    monkeypatch.setattr(client.session, "request", fake_session.request)
+    return client
+
+
+def test_cached_responses_are_revalidated_and_dropped_when_gone(client, fake_session, wait_for, tmp_path):
+    cache = LocalCache("account", directory=str(tmp_path))
+    seen, missing = [], []
+
+    def get():
+        client.get_cached("summary/", cache, on_data=lambda data, changed: seen.append((data, changed)),
+                          on_missing=lambda: missing.append(True))
+
+    fake_session.reply(200, {"total_count": 3}, {"ETag": '"v1"'})
+    get()
+    wait_for(lambda: seen)
+    assert seen.pop() == ({"total_count": 3}, True)
+    assert fake_session.calls[-1][2]["headers"] == {}
+
+    # Unchanged: the server only confirms the copy, which is handed back as is
+    fake_session.reply(304)
+    get()
+    wait_for(lambda: seen)
+    assert seen.pop() == ({"total_count": 3}, False)
+    assert fake_session.calls[-1][2]["headers"] == {"If-None-Match": '"v1"'}
+
+    # Gone on the server: the copy is dropped and whatever was painted from it is cleared
+    fake_session.reply(404)
+    get()
+    wait_for(lambda: missing)
+    assert cache.get("summary/") is None
+    assert not seen
+    cache.close()
+
+
+def test_failures_leave_the_cached_copy_for_offline_use(client, fake_session, wait_for, tmp_path):
+    cache = LocalCache("account", directory=str(tmp_path))
+    cache.put("history/", '"h1"', [{"id": 1}])
+    errors = []
+
+    fake_session.fail(ConnectionError("backend unreachable"))
+    client.get_cached("history/", cache, on_error=errors.append)
+    wait_for(lambda: errors)
+    assert errors == ["backend unreachable"]
+    assert cache.get("history/")["data"] == [{"id": 1}]
+    cache.close()
+
+
+def test_calls_with_the_same_key_share_one_request(client, fake_session, wait_for):
+    fake_session.gate = threading.Event()
+    fake_session.reply(200, {"total_count": 1})
+    fake_session.reply(200, {"total_count": 2})
+    first, second = [], []
+
+    client.get("summary/", key="summary", on_done=first.append)
+    wait_for(lambda: fake_session.calls)
+    # A second Refresh while the first is in flight waits for its answer
+    client.get("summary/", key="summary", on_done=second.append)
+    assert client.busy("summary")
+    fake_session.gate.set()
+    wait_for(lambda: first and second)
+    assert len(fake_session.calls) == 1
+    assert first[0] is second[0]
+    assert not client.busy("summary")
+
+    # Once it has settled, the next call goes out again
+    client.get("summary/", key="summary", on_done=first.append)
+    wait_for(lambda: len(first) == 2)
+    assert len(fake_session.calls) == 2
+    assert first[1].json() == {"total_count": 2}
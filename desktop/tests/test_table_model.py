@@ -0,0 +1,119 @@
+import pytest
+
+pytest.importorskip("PyQt5.QtCore")
+
+import table_model  # noqa: E402
+from table_model import PAGE_SIZE, EquipmentTableModel  # noqa: E402
+
+
+class FakeResponse:
+    def __init__(self, status_code, data=None):
+        self.status_code = status_code
+        self.data = data
+
+    def json(self):
+        return self.data
+
+
+class FakeApi:
+    """Records each ``get`` with its callbacks, so a test answers requests when it chooses."""
+
+    def __init__(self):
+        self.calls = []
+
+    def get(self, path, params=None, key=None, on_done=None, on_error=None):
+        self.calls.append({"path": path, "params": params, "key": key, "on_done": on_done, "on_error": on_error})
+
+    def answer(self, call, count, start=0, rows=PAGE_SIZE, next_url=None):
+        results = [
+            {"name": f"P-{i}", "equipment_type": "Pump", "flowrate": 1.0, "pressure": 2.0, "temperature": 3.0}
+            for i in range(start, start + rows)
+        ]
+        call["on_done"](FakeResponse(200, {"count": count, "next": next_url, "results": results}))
+
+
+@pytest.fixture
+def model(qapp):
+    api = FakeApi()
+    model = EquipmentTableModel(api)
+    model.show_summary(7)
+    return model
+
+
+def cell(model, row, column=0):
+    return model.data(model.index(row, column))
+
+
+def test_first_page_brings_the_row_count(model):
+    api = model.api
+    assert len(api.calls) == 1
+    assert api.calls[0]["path"] == "summaries/7/equipment/"
+    assert api.calls[0]["params"]["offset"] == 0
+    api.answer(api.calls[0], count=PAGE_SIZE * 3)
+
+    assert model.rowCount() == PAGE_SIZE * 3
+    assert cell(model, 0) == "P-0"
+    assert cell(model, 0, 2) == "1.00"
+
+
+def test_unseen_page_is_fetched_once_however_often_it_is_painted(model):
+    api = model.api
+    api.answer(api.calls[0], count=PAGE_SIZE * 3, next_url="summaries/7/equipment/?cursor=abc")
+
+    assert cell(model, PAGE_SIZE) == "…"
+    assert cell(model, PAGE_SIZE + 1) == "…"
+    # The api coalesces by key, so repaints of an in-flight page don't go out again
+    assert {call["key"] for call in api.calls[1:]} == {f"equipment:{model.generation}:1"}
+    assert api.calls[1]["path"] == "summaries/7/equipment/?cursor=abc"
+
+    api.answer(api.calls[1], count=PAGE_SIZE * 3, start=PAGE_SIZE)
+    calls = len(api.calls)
+    assert cell(model, PAGE_SIZE + 1) == f"P-{PAGE_SIZE + 1}"
+    assert len(api.calls) == calls
+
+
+def test_failed_page_is_requested_again_after_the_retry_delay(model, monkeypatch):
+    monkeypatch.setattr(table_model, "PAGE_RETRY_MS", 60_000)
+    api = model.api
+    api.answer(api.calls[0], count=PAGE_SIZE * 2)
+    cell(model, PAGE_SIZE)
+    api.calls[1]["on_error"]("Connection refused")
+
+    # Not cached as empty: the rows stay placeholders and aren't asked for until the retry
+    assert 1 not in model.pages
+    assert cell(model, PAGE_SIZE) == "…"
+    assert len(api.calls) == 2
+
+    repainted = []
+    model.dataChanged.connect(lambda first, last: repainted.append((first.row(), last.row())))
+    model.retry_page(model.generation, 1)
+    assert repainted == [(PAGE_SIZE, PAGE_SIZE * 2 - 1)]
+    assert cell(model, PAGE_SIZE) == "…"
+    assert len(api.calls) == 3
+
+    api.answer(api.calls[2], count=PAGE_SIZE * 2, start=PAGE_SIZE)
+    assert cell(model, PAGE_SIZE) == f"P-{PAGE_SIZE}"
+    assert model.failures == {}
+
+
+def test_failed_first_page_is_retried_by_the_timer(model, monkeypatch, wait_for):
+    monkeypatch.setattr(table_model, "PAGE_RETRY_MS", 10)
+    api = model.api
+    api.calls[0]["on_done"](FakeResponse(503))
+    assert model.rowCount() == 0
+
+    wait_for(lambda: len(api.calls) == 2)
+    assert api.calls[1]["params"]["offset"] == 0
+    api.answer(api.calls[1], count=10, rows=10)
+    assert model.rowCount() == 10
+
+
+def test_retry_scheduled_before_a_reload_is_dropped(model):
+    api = model.api
+    api.calls[0]["on_error"]("Connection refused")
+    stale = model.generation
+    model.reload()
+    calls = len(api.calls)
+
+    model.retry_page(stale, 0)
+    assert len(api.calls) == calls
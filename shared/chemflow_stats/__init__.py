@@ -0,0 +1,8 @@
+"""Summary statistics kernel shared by the backend's ingest and the desktop's local pre-aggregation.
+
+Both sides fold a file through the same Accumulator, so a state the desktop
+sends is exactly what the server would have built from the file itself.
+Depends only on NumPy and pandas.
+"""
+from .sketches import DIGEST_COMPRESSION, PERCENTILES, ColumnStats, Moments, TDigest
+from .summary import NUMERIC_COLUMNS, STATE_VERSION, TYPE_AGGREGATES, Accumulator, type_aggregates
@@ -0,0 +1,189 @@
+import math
+
+import numpy as np
+
+# Percentiles reported for every numeric column
+PERCENTILES = [1, 5, 25, 50, 75, 95, 99]
+# t-digest compression: roughly the number of centroids kept (more = more accurate)
+DIGEST_COMPRESSION = 200
+
+
+class Moments:
+    """Count, mean, M2 (sum of squared deviations), min and max of a stream.
+
+    Each chunk's moments are computed with NumPy and combined with the
+    running totals using Chan et al.'s pairwise update, so the variance
+    stays accurate where the naive sum-of-squares formula cancels out.
+    """
+
+    def __init__(self):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = math.inf
+        self.max = -math.inf
+
+    def update(self, values):
+        if not len(values):
+            return
+        chunk = Moments()
+        chunk.count = len(values)
+        chunk.mean = float(values.mean())
+        chunk.m2 = float(np.square(values - chunk.mean).sum())
+        chunk.min = float(values.min())
+        chunk.max = float(values.max())
+        self.merge(chunk)
+
+    def merge(self, other):
+        if not other.count:
+            return
+        count = self.count + other.count
+        delta = other.mean - self.mean
+        self.mean += delta * other.count / count
+        self.m2 += other.m2 + delta * delta * self.count * other.count / count
+        self.count = count
+        self.min = min(self.min, other.min)
+        self.max = max(self.max, other.max)
+
+    def variance(self):
+        # Sample variance, as pandas' Series.var()
+        return self.m2 / (self.count - 1) if self.count > 1 else None
+
+    def to_state(self):
+        empty = not self.count
+        return {'count': self.count, 'mean': self.mean, 'm2': self.m2,
+                'min': None if empty else self.min, 'max': None if empty else self.max}
+
+    @classmethod
+    def from_state(cls, state):
+        moments = cls()
+        moments.count = int(state['count'])
+        if moments.count < 0:
+            raise ValueError('count must not be negative')
+        if moments.count:
+            moments.mean = float(state['mean'])
+            moments.m2 = float(state['m2'])
+            moments.min = float(state['min'])
+            moments.max = float(state['max'])
+        return moments
+
+
+class TDigest:
+    """Mergeable percentile sketch (a merging t-digest).
+
+    Values and centroids are sorted together and merged into groups whose
+    width in quantile space follows the arcsine scale function, so the
+    tails stay sharp while the size stays near ``compression`` centroids.
+    Compression is a vectorized group-by rather than a per-centroid loop.
+    """
+
+    def __init__(self, compression=DIGEST_COMPRESSION):
+        self.compression = compression
+        self.means = np.empty(0)
+        self.weights = np.empty(0)
+
+    @property
+    def count(self):
+        return float(self.weights.sum())
+
+    def update(self, values):
+        if not len(values):
+            return
+        # Sorting raw values is cheaper than an argsort of values + centroids;
+        # the few existing centroids are then slotted in by binary search
+        values = np.sort(values)
+        positions = np.searchsorted(values, self.means)
+        self._compress(np.insert(values, positions, self.means),
+                       np.insert(np.ones(len(values)), positions, self.weights))
+
+    def merge(self, other):
+        if len(other.means):
+            means = np.concatenate([self.means, other.means])
+            order = np.argsort(means, kind='stable')
+            self._compress(means[order], np.concatenate([self.weights, other.weights])[order])
+
+    def _compress(self, means, weights):
+        # ``means`` must be sorted
+        total = weights.sum()
+        # Quantile at each centroid's left edge, mapped onto the k scale
+        left = (np.cumsum(weights) - weights) / total
+        k = self.compression * (np.arcsin(2 * left - 1) / math.pi + 0.5)
+        groups = np.floor(k)
+        starts = np.flatnonzero(np.diff(groups, prepend=-1))
+        merged = np.add.reduceat(weights, starts)
+        self.means = np.add.reduceat(means * weights, starts) / merged
+        self.weights = merged
+
+    def to_state(self):
+        return {'means': self.means.tolist(), 'weights': self.weights.tolist()}
+
+    @classmethod
+    def from_state(cls, state, compression=DIGEST_COMPRESSION):
+        digest = cls(compression)
+        means = np.asarray(state['means'], dtype='float64')
+        weights = np.asarray(state['weights'], dtype='float64')
+        if means.ndim != 1 or means.shape != weights.shape or not np.isfinite(means).all() or (weights <= 0).any():
+            raise ValueError('digest needs equal-length finite means and positive weights')
+        if len(means):
+            # Re-compressed, so a digest built elsewhere ends up sorted and within this size
+            order = np.argsort(means, kind='stable')
+            digest._compress(means[order], weights[order])
+        return digest
+
+    def quantile(self, q, low=None, high=None):
+        """Approximate ``q`` quantile; ``low``/``high`` are the exact extremes if known."""
+        if not len(self.means):
+            return None
+        # Interpolate between centroid centres, and out to the extremes at the ends
+        centres = np.cumsum(self.weights) - self.weights / 2
+        means = self.means
+        if low is not None:
+            centres, means = np.concatenate([[0], centres]), np.concatenate([[low], means])
+        if high is not None:
+            centres, means = np.concatenate([centres, [self.count]]), np.concatenate([means, [high]])
+        return float(np.interp(q * self.count, centres, means))
+
+
+class ColumnStats:
+    """Moments plus percentile sketch for one numeric column."""
+
+    def __init__(self):
+        self.moments = Moments()
+        self.digest = TDigest()
+
+    def update(self, values):
+        values = values[~np.isnan(values)]
+        self.moments.update(values)
+        self.digest.update(values)
+
+    def merge(self, other):
+        self.moments.merge(other.moments)
+        self.digest.merge(other.digest)
+
+    def to_state(self):
+        """JSON-ready mergeable state, e.g. for a client that aggregated the file itself."""
+        return {'moments': self.moments.to_state(), 'digest': self.digest.to_state()}
+
+    @classmethod
+    def from_state(cls, state):
+        stats = cls()
+        stats.moments = Moments.from_state(state['moments'])
+        stats.digest = TDigest.from_state(state['digest'])
+        return stats
+
+    def describe(self):
+        """JSON-ready metrics; ``None`` everywhere for a column with no readings."""
+        moments = self.moments
+        variance = moments.variance()
+        empty = not moments.count
+        result = {
+            'count': moments.count,
+            'mean': None if empty else moments.mean,
+            'variance': variance,
+            'stddev': None if variance is None else math.sqrt(variance),
+            'min': None if empty else moments.min,
+            'max': None if empty else moments.max,
+        }
+        for p in PERCENTILES:
+            result[f'p{p}'] = None if empty else self.digest.quantile(p / 100, moments.min, moments.max)
+        return result
@@ -0,0 +1,95 @@
+import numpy as np
+import pandas as pd
+
+from .sketches import DIGEST_COMPRESSION, ColumnStats
+
+NUMERIC_COLUMNS = ['Flowrate', 'Pressure', 'Temperature']
+# Layout of Accumulator.to_state(); every state carries it (and the digest
+# compression), and a server expecting another layout rejects the state
+STATE_VERSION = 1
+
+# How per-type partial aggregates combine across chunks and files
+TYPE_AGGREGATES = {'count': 'sum'}
+for _col in NUMERIC_COLUMNS:
+    TYPE_AGGREGATES.update({f'{_col}_sum': 'sum', f'{_col}_n': 'sum', f'{_col}_min': 'min', f'{_col}_max': 'max'})
+
+
+def type_aggregates(chunk, numeric):
+    """Per-Type row count and per-column sum / non-null count / min / max in one groupby."""
+    grouped = numeric.groupby(chunk['Type'], observed=True, sort=False)
+    frame = grouped.agg(['sum', 'count', 'min', 'max'])
+    frame.columns = [f'{col}_{stat}' for col, stat in frame.columns]
+    frame = frame.rename(columns={f'{col}_count': f'{col}_n' for col in NUMERIC_COLUMNS})
+    frame.insert(0, 'count', grouped.size())
+    # Categorical chunks give a CategoricalIndex; plain labels concat cleanly
+    frame.index = frame.index.astype(object)
+    return frame
+
+
+class Accumulator:
+    """Running count / per-column sums and stats / per-Type aggregates folded chunk by chunk."""
+
+    def __init__(self):
+        self.count = 0
+        self.sums = {col: 0.0 for col in NUMERIC_COLUMNS}
+        self.non_null = {col: 0 for col in NUMERIC_COLUMNS}
+        self.column_stats = {col: ColumnStats() for col in NUMERIC_COLUMNS}
+        # One row per Type in order of first appearance, columns as TYPE_AGGREGATES
+        self.by_type = None
+
+    def update(self, chunk):
+        self.count += len(chunk)
+        # Sum float32 (or integer) columns at full precision
+        numeric = chunk[NUMERIC_COLUMNS].astype('float64')
+        for col in NUMERIC_COLUMNS:
+            values = numeric[col]
+            self.sums[col] += float(values.sum())
+            self.non_null[col] += int(values.count())
+            self.column_stats[col].update(values.to_numpy(na_value=np.nan))
+        self._fold_types(type_aggregates(chunk, numeric))
+
+    def merge(self, other):
+        """Fold another accumulator (e.g. one built in a worker process) into this one."""
+        self.count += other.count
+        for col in NUMERIC_COLUMNS:
+            self.sums[col] += other.sums[col]
+            self.non_null[col] += other.non_null[col]
+            self.column_stats[col].merge(other.column_stats[col])
+        if other.by_type is not None:
+            self._fold_types(other.by_type)
+
+    def to_state(self):
+        """JSON-ready state; what a pre-aggregating client sends instead of the file."""
+        types = []
+        if self.by_type is not None:
+            frame = self.by_type.astype(object)
+            frame = frame.where(frame.notna(), None)
+            types = [{'equipment_type': equipment_type, **row}
+                     for equipment_type, row in zip(frame.index, frame.to_dict('records'))]
+        return {
+            'version': STATE_VERSION,
+            'compression': DIGEST_COMPRESSION,
+            'count': self.count,
+            'columns': {
+                col: {'sum': self.sums[col], 'non_null': self.non_null[col], **self.column_stats[col].to_state()}
+                for col in NUMERIC_COLUMNS
+            },
+            'types': types,
+        }
+
+    def _fold_types(self, frame):
+        if self.by_type is None:
+            self.by_type = frame
+        else:
+            self.by_type = pd.concat([self.by_type, frame]).groupby(level=0, sort=False).agg(TYPE_AGGREGATES)
+
+    @property
+    def type_counts(self):
+        if self.by_type is None:
+            return {}
+        return dict(zip(self.by_type.index, self.by_type['count'].tolist()))
+
+    def mean(self, col):
+        if not self.non_null[col]:
+            return float('nan')
+        return self.sums[col] / self.non_null[col]